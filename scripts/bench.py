@@ -0,0 +1,376 @@
+# scripts/bench.py
+"""
+Mikro-benchmark paketi: sıcak yollar sentetik filo verisinde (scripts/simulate_fleet.py,
+tohumlu) farklı boyutlarda ölçülür; sonuçlar commit'ler arası karşılaştırılabilsin diye
+JSON'a yazılır.
+
+Durumlar (case):
+  haversine_scalar / haversine_vec       locate.utils.geo
+  geofence_check / geofence_check_many   DebouncedGeofence (olay zamanı sırasıyla)
+  features_online                        OnlineFeatureState.add_and_features
+  build_features                         offline vektörel özellikler
+  score_one / score_many                 ModelScorer (model yoksa sentetik veride eğitilir)
+  prepare_dbra24                         prepare_frame + kayıt üretimi (I/O hariç)
+
+Nokta nokta çalışan (Python döngülü) durumlar en fazla --online-cap noktayla ölçülür;
+raporlanan 'items' gerçek işlenen nokta sayısıdır. Her durum --repeat kez çalışır,
+en iyi süre ve medyan kaydedilir.
+
+    PYTHONPATH=src python -m scripts.bench --sizes 1e3,1e4,1e5,1e6 --out out/bench/base.json
+    PYTHONPATH=src python -m scripts.bench --sizes 1e3,1e4,1e5,1e6,1e7 \
+        --compare out/bench/base.json --max-regress 0.15
+
+--compare: aynı (case, n) çiftlerinde nokta başına süre oranını yazdırır; --max-regress
+eşiğini aşan yavaşlama varsa çıkış kodu 1'dir.
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from collections.abc import Callable
+from datetime import UTC, datetime
+from pathlib import Path
+from statistics import median
+
+import numpy as np
+import pandas as pd
+import sklearn
+from sklearn.ensemble import IsolationForest
+from sklearn.preprocessing import StandardScaler
+
+from locate.core.geofence import DebouncedGeofence, GeofenceParams
+from locate.ml.features import FEATURE_NAMES, OnlineFeatureState, build_features
+from locate.ml.scorer import ModelScorer, load_scorer
+from locate.utils.geo import haversine_m, haversine_m_vec
+from scripts.prepare_dbra24 import iter_records, prepare_frame
+from scripts.simulate_fleet import simulate_fleet, to_dbra24
+
+# case -> hazırlık(ctx, n) -> (ölçülecek fonksiyon, işlenen nokta sayısı)
+Setup = Callable[[dict, int], tuple[Callable[[], object], int]]
+CASES: dict[str, Setup] = {}
+
+
+def case(name: str):
+    def deco(fn: Setup) -> Setup:
+        CASES[name] = fn
+        return fn
+
+    return deco
+
+
+def _online(ctx: dict, n: int) -> pd.DataFrame:
+    """Nokta nokta durumlar için ilk min(n, cap) nokta, global olay zamanı sırasıyla."""
+    df = ctx["data"]
+    df = df.sort_values("timestamp", kind="stable")
+    return df.head(min(n, ctx["online_cap"]))
+
+
+@case("haversine_scalar")
+def _haversine_scalar(ctx, n):
+    g = ctx["gf"]
+    df = _online(ctx, n)
+    pts = list(zip(df["lat"].tolist(), df["lon"].tolist(), strict=True))
+
+    def run():
+        for la, lo in pts:
+            haversine_m(g.lat0, g.lon0, la, lo)
+
+    return run, len(pts)
+
+
+@case("haversine_vec")
+def _haversine_vec(ctx, n):
+    g = ctx["gf"]
+    lat, lon = ctx["data"]["lat"].to_numpy(), ctx["data"]["lon"].to_numpy()
+    return (lambda: haversine_m_vec(g.lat0, g.lon0, lat, lon)), len(lat)
+
+
+@case("geofence_check")
+def _geofence_check(ctx, n):
+    df = _online(ctx, n)
+    rows = list(
+        zip(df["device_id"], df["lat"].tolist(), df["lon"].tolist(), _epoch(df), strict=True)
+    )
+
+    def run():
+        gf = DebouncedGeofence(ctx["gf"])
+        for d, la, lo, t in rows:
+            gf.check(d, la, lo, t)
+
+    return run, len(rows)
+
+
+@case("geofence_check_many")
+def _geofence_check_many(ctx, n):
+    df = _online(ctx, n)
+    dev, lat, lon = df["device_id"].tolist(), df["lat"].to_numpy(), df["lon"].to_numpy()
+    ts = np.asarray(_epoch(df))
+    return (lambda: DebouncedGeofence(ctx["gf"]).check_many(dev, lat, lon, ts)), len(dev)
+
+
+@case("features_online")
+def _features_online(ctx, n):
+    g = ctx["gf"]
+    df = _online(ctx, n)
+    rows = list(
+        zip(
+            df["device_id"],
+            _epoch(df),
+            df["lat"].tolist(),
+            df["lon"].tolist(),
+            df["speed"].tolist(),
+            strict=True,
+        )
+    )
+
+    def run():
+        fs = OnlineFeatureState(g.lat0, g.lon0, window_sec=ctx["window_sec"])
+        for d, t, la, lo, sp in rows:
+            fs.add_and_features(d, t, la, lo, sp)
+
+    return run, len(rows)
+
+
+@case("build_features")
+def _build_features(ctx, n):
+    g, df = ctx["gf"], ctx["data"]
+    return (lambda: build_features(df, g.lat0, g.lon0, ctx["window_sec"])), len(df)
+
+
+@case("score_one")
+def _score_one(ctx, n):
+    scorer = ctx["scorer"]()
+    X = _features(ctx)[: ctx["online_cap"]].tolist()
+
+    def run():
+        for x in X:
+            scorer.score_one(x)
+
+    return run, len(X)
+
+
+@case("score_many")
+def _score_many(ctx, n):
+    scorer = ctx["scorer"]()
+    X = _features(ctx)
+    return (lambda: scorer.score_many(X)), len(X)
+
+
+@case("prepare_dbra24")
+def _prepare(ctx, n):
+    mp = ctx["mapping"]
+    raw = to_dbra24(ctx["data"], mp)
+    labels = mp.get("labels", {})
+
+    def run():
+        df = prepare_frame(raw.copy(), mp, ctx["max_kmh"])
+        for _ in iter_records(df, labels):
+            pass
+
+    return run, len(raw)
+
+
+def _epoch(df: pd.DataFrame) -> list[float]:
+    return ((df["timestamp"] - pd.Timestamp(0, tz="UTC")).dt.total_seconds()).tolist()
+
+
+def _features(ctx: dict) -> np.ndarray:
+    if "X" not in ctx:
+        g = ctx["gf"]
+        ctx["X"] = build_features(ctx["data"], g.lat0, g.lon0, ctx["window_sec"]).to_numpy(
+            dtype="float64"
+        )
+    return ctx["X"]
+
+
+def make_scorer(model: str | None, cfg: dict, seed: int) -> Callable[[], ModelScorer]:
+    """Verilen model artefaktı / paketi; yoksa sentetik veride küçük bir model (bir kez)."""
+    cache: dict = {}
+
+    def get() -> ModelScorer:
+        if "s" not in cache:
+            if model:
+                cache["s"] = load_scorer(model)
+            else:
+                g, mc = cfg["geofence"], cfg.get("model", {})
+                df = simulate_fleet(
+                    20, 1000, lat0=g["lat0"], lon0=g["lon0"], radius_m=g["radius_m"], seed=seed + 1
+                )
+                Xf = build_features(
+                    df, g["lat0"], g["lon0"], cfg.get("features", {}).get("window_sec", 0)
+                ).to_numpy(dtype="float64")
+                scaler = StandardScaler().fit(Xf)
+                Xs = scaler.transform(Xf)
+                m = IsolationForest(
+                    n_estimators=mc.get("n_estimators", 256),
+                    max_samples=mc.get("max_samples", 1024),
+                    random_state=mc.get("random_state", 42),
+                ).fit(Xs)
+                raw = -m.decision_function(Xs)
+                cache["s"] = ModelScorer.from_bundle(
+                    {
+                        "model": m,
+                        "scaler": scaler,
+                        "features": list(FEATURE_NAMES),
+                        "raw_min": float(raw.min()),
+                        "raw_max": float(raw.max()),
+                    }
+                )
+        return cache["s"]
+
+    return get
+
+
+def measure(fn: Callable[[], object], repeat: int) -> list[float]:
+    out = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn()
+        out.append(time.perf_counter() - t)
+    return out
+
+
+def git_info() -> dict:
+    def run(*a: str) -> str:
+        try:
+            return subprocess.run(["git", *a], capture_output=True, text=True, check=True).stdout
+        except (OSError, subprocess.CalledProcessError):
+            return ""
+
+    return {
+        "commit": run("rev-parse", "--short", "HEAD").strip() or None,
+        "dirty": bool(run("status", "--porcelain", "--untracked-files=no").strip()),
+    }
+
+
+def compare(base: dict, cur: dict, max_regress: float) -> int:
+    """Ortak (case, n) çiftlerinde ns/nokta oranını yazar; eşiği aşan yavaşlama sayısı."""
+    old = {(r["case"], r["n"]): r for r in base["results"]}
+    bad = 0
+    print(f"{'case':<22}{'n':>10}{'önce ns':>12}{'şimdi ns':>12}{'oran':>8}")
+    for r in cur["results"]:
+        b = old.get((r["case"], r["n"]))
+        if b is None:
+            continue
+        ratio = r["ns_per_item"] / b["ns_per_item"]
+        flag = ""
+        if ratio > 1.0 + max_regress:
+            flag, bad = "  [YAVAŞLAMA]", bad + 1
+        print(
+            f"{r['case']:<22}{r['n']:>10}{b['ns_per_item']:>12.1f}{r['ns_per_item']:>12.1f}"
+            f"{ratio:>8.2f}{flag}"
+        )
+    return bad
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument(
+        "--sizes", default="1e3,1e4,1e5,1e6", help="virgülle nokta sayıları (1e7 dahil)"
+    )
+    ap.add_argument("--cases", default=",".join(CASES), help="virgülle durum adları")
+    ap.add_argument("--points", type=int, default=1000, help="cihaz başına nokta (sentetik)")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--online-cap", type=int, default=200_000, help="nokta nokta durumlar için")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--config", default="configs/config.json")
+    ap.add_argument("--mapping", default="configs/mapping_dbra24.json")
+    ap.add_argument("--model", help="model artefaktı/paketi (verilmezse sentetik veride eğitilir)")
+    ap.add_argument("--out", help="varsayılan: out/bench/bench_<commit>.json")
+    ap.add_argument("--compare", help="önceki sonuç JSON'u")
+    ap.add_argument("--max-regress", type=float, default=0.15, help="izin verilen yavaşlama oranı")
+    args = ap.parse_args()
+
+    sizes = [int(float(s)) for s in args.sizes.split(",") if s.strip()]
+    names = [c.strip() for c in args.cases.split(",") if c.strip()]
+    unknown = [c for c in names if c not in CASES]
+    if unknown:
+        raise ValueError(f"Bilinmeyen durum(lar): {unknown} (mevcut: {list(CASES)})")
+    if any(n <= 0 for n in sizes):
+        raise ValueError("--sizes pozitif olmalı")
+
+    cfg = json.loads(Path(args.config).read_text(encoding="utf-8"))
+    g = cfg["geofence"]
+    ctx_base = {
+        "gf": GeofenceParams(g["lat0"], g["lon0"], g["radius_m"], g.get("debounce_sec", 10)),
+        "window_sec": cfg.get("features", {}).get("window_sec", 0),
+        "mapping": json.loads(Path(args.mapping).read_text(encoding="utf-8")),
+        "max_kmh": cfg.get("filters", {}).get("max_speed_kmh"),
+        "online_cap": args.online_cap,
+        "scorer": make_scorer(args.model, cfg, args.seed),
+    }
+
+    results = []
+    for n in sizes:
+        pts = min(args.points, n)
+        t = time.perf_counter()
+        data = simulate_fleet(
+            -(-n // pts),
+            pts,
+            lat0=g["lat0"],
+            lon0=g["lon0"],
+            radius_m=g["radius_m"],
+            seed=args.seed,
+        ).head(n)
+        print(f"[..] n={n}: veri {time.perf_counter() - t:.1f} s", file=sys.stderr)
+        ctx = {**ctx_base, "data": data}
+        for name in names:
+            fn, items = CASES[name](ctx, n)
+            times = measure(fn, args.repeat)
+            best = min(times)
+            res = {
+                "case": name,
+                "n": n,
+                "items": items,
+                "best_sec": best,
+                "median_sec": median(times),
+                "ns_per_item": best / items * 1e9,
+                "items_per_sec": items / best if best > 0 else None,
+            }
+            results.append(res)
+            print(
+                f"[..] {name:<22} n={n:<9} {res['ns_per_item']:>10.1f} ns/nokta "
+                f"({res['items_per_sec']:,.0f} nokta/s)",
+                file=sys.stderr,
+            )
+        del ctx, data
+
+    info = git_info()
+    doc = {
+        "meta": {
+            "created": datetime.now(UTC).isoformat(timespec="seconds"),
+            "git": info,
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "sklearn": sklearn.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "seed": args.seed,
+            "repeat": args.repeat,
+            "points_per_device": args.points,
+            "online_cap": args.online_cap,
+            "model": args.model or "synthetic",
+            "window_sec": ctx_base["window_sec"],
+        },
+        "results": results,
+    }
+    out = Path(args.out or f"out/bench/bench_{info['commit'] or 'nogit'}.json")
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(doc, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"[OK] -> {out} | {len(results)} ölçüm")
+
+    if args.compare:
+        base = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        bad = compare(base, doc, args.max_regress)
+        if bad:
+            print(f"[FAIL] {bad} ölçümde > %{args.max_regress * 100:.0f} yavaşlama")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+# scripts/check_affinity.py
+"""
+Cihaz afinitesini uçtan uca doğrular: 2 uvicorn worker'ı başlatılır, farklı worker'lara
+düşen iki cihazın noktaları yönlendirici üzerinden /detect, /detect/batch ve /detect/stream
+ile gönderilir; her worker'ın /health state'inde yalnız kendi cihazı olmalıdır.
+/detect/ws yönlendiricide reddedilmelidir.
+
+    PYTHONPATH=src python scripts/check_affinity.py
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+from datetime import UTC, datetime, timedelta
+
+import httpx
+
+from locate.api.affinity import AffinityRouter, worker_for
+
+N_WORKERS = 2
+
+
+def _devices() -> list[str]:
+    """Her worker'a düşen ilk cihaz kimliği (worker sırasıyla)."""
+    found: dict[int, str] = {}
+    i = 0
+    while len(found) < N_WORKERS:
+        found.setdefault(worker_for(f"dev-{i}", N_WORKERS), f"dev-{i}")
+        i += 1
+    return [found[w] for w in range(N_WORKERS)]
+
+
+def _point(device_id: str, k: int, speed: float = 10.0) -> dict:
+    t0 = datetime(2024, 1, 1, tzinfo=UTC)
+    return {
+        "device_id": device_id,
+        "timestamp": (t0 + timedelta(seconds=k)).isoformat(),
+        "lat": 39.98,
+        "lon": -89.96,
+        "speed": speed,
+    }
+
+
+async def _check(ports: list[int], devices: list[str]) -> bool:
+    router = AffinityRouter([("127.0.0.1", p) for p in ports])
+    transport = httpx.ASGITransport(app=router)
+    ok = True
+    async with httpx.AsyncClient(transport=transport, base_url="http://router") as client:
+        # worker'lar hazır olana dek bekle
+        for _ in range(100):
+            try:
+                if (await client.get("/health")).status_code == 200:
+                    break
+            except OSError:
+                pass
+            await asyncio.sleep(0.1)
+
+        dev_a, dev_b = devices
+        r = await client.post("/detect", json=_point(dev_a, 0))
+        ok &= r.status_code == 200
+        pts = [_point(d, k) for k in range(1, 4) for d in devices]
+        r = await client.post("/detect/batch", json={"points": pts})
+        ok &= r.status_code == 200 and r.json()["count"] == len(pts)
+        # dev_b aşırı hızlı (kural alarmı): alarmlar tek sayılı kayıtlarda, bozuk kayıt 8'de;
+        # her worker kendi alt akışını işler, seq yine giriş sırasıdır
+        body = "".join(
+            json.dumps(_point(d, k, 10.0 if d == dev_a else 100.0)) + "\n"
+            for k in range(4, 8)
+            for d in devices
+        )
+        r = await client.post("/detect/stream", content=body + "{bozuk\n")
+        seqs = [json.loads(ln)["seq"] for ln in r.text.splitlines()]
+        ok &= r.status_code == 200 and seqs == [1, 3, 5, 7, 8]
+        print(f"  /detect/stream seq: {seqs}")
+
+    async with httpx.AsyncClient() as direct:
+        for w, port in enumerate(ports):
+            st = (await direct.get(f"http://127.0.0.1:{port}/health")).json()["state"]
+            ok &= st["devices"] == 1
+            print(f"  worker {w} ({devices[w]}): cihaz sayısı = {st['devices']}")
+
+    # WebSocket el sıkışması reddedilmeli
+    msgs = iter([{"type": "websocket.connect"}])
+    sent: list[dict] = []
+
+    async def receive():
+        return next(msgs)
+
+    async def send(msg):
+        sent.append(msg)
+
+    await router({"type": "websocket", "path": "/detect/ws"}, receive, send)
+    ok &= [m["type"] for m in sent] == ["websocket.close"]
+    print(f"  /detect/ws: {sent}")
+    return ok
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--port", type=int, default=18101, help="ilk worker portu")
+    args = ap.parse_args()
+
+    devices = _devices()
+    ports = [args.port + i for i in range(N_WORKERS)]
+    procs = [
+        subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "locate.api.main:app", "--port", str(p)],
+            env={**os.environ, "GEOSENTINEL_WORKER": str(i)},
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        for i, p in enumerate(ports)
+    ]
+    try:
+        ok = asyncio.run(_check(ports, devices))
+    finally:
+        for pr in procs:
+            pr.terminate()
+        for pr in procs:
+            pr.wait()
+    print("[OK] cihaz state'i kendi worker'ında" if ok else "[FAIL] afinite ihlali")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
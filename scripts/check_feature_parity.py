@@ -0,0 +1,65 @@
+# scripts/check_feature_parity.py
+"""
+Online (API, nokta nokta) ve offline (build_features, toplu) özelliklerin aynı olduğunu
+doğrular. Noktalar API'ye gelir gibi zaman sırasıyla, cihazlar karışık beslenir.
+
+    PYTHONPATH=src python scripts/check_feature_parity.py --in data/processed/dbra24_test.jsonl
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from locate.ml.features import FEATURE_NAMES, OnlineFeatureState, build_features
+from locate.utils.io import read_dataset
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--in", dest="inp", required=True, help="JSONL ya da Parquet/Arrow")
+    ap.add_argument("--config", default="configs/config.json")
+    ap.add_argument("--limit", type=int, default=0, help=">0: ilk N satır")
+    ap.add_argument("--rtol", type=float, default=1e-5)
+    ap.add_argument("--atol", type=float, default=1e-4)
+    args = ap.parse_args()
+
+    cfg = json.loads(Path(args.config).read_text(encoding="utf-8"))
+    lat0, lon0 = cfg["geofence"]["lat0"], cfg["geofence"]["lon0"]
+    window_sec = cfg.get("features", {}).get("window_sec", 0)
+
+    df = read_dataset(args.inp, columns=["device_id", "timestamp", "lat", "lon", "speed"])
+    if args.limit > 0:
+        df = df.head(args.limit)
+    df = df.reset_index(drop=True)
+
+    offline = build_features(df, lat0, lon0, window_sec)
+
+    # online: global zaman sırası (cihazlar iç içe), API'deki gibi nokta nokta
+    ts = (pd.to_datetime(df["timestamp"], utc=True) - pd.Timestamp(0, tz="UTC")).dt.total_seconds()
+    order = np.lexsort((df.index.to_numpy(), ts.to_numpy()))
+    fs = OnlineFeatureState(lat0, lon0, window_sec=window_sec)
+    online = np.empty((len(df), len(FEATURE_NAMES)), dtype="float64")
+    dev = df["device_id"].astype(str).tolist()
+    lat, lon, spd, t = df["lat"].tolist(), df["lon"].tolist(), df["speed"].tolist(), ts.tolist()
+    for i in order.tolist():
+        online[i] = fs.add_and_features(dev[i], t[i], lat[i], lon[i], spd[i])
+
+    off = offline.sort_index().to_numpy(dtype="float64")
+    on = online.astype("float32").astype("float64")
+    ok = True
+    print(f"satır: {len(df)} | window_sec: {window_sec}")
+    for j, name in enumerate(FEATURE_NAMES):
+        diff = np.abs(off[:, j] - on[:, j])
+        bad = int((diff > args.atol + args.rtol * np.abs(off[:, j])).sum())
+        ok &= bad == 0
+        print(f"  {name:<16} maks |fark| = {diff.max():.3e} | tolerans dışı: {bad}")
+    print("[OK] online == offline" if ok else "[FAIL] online != offline")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,348 @@
+# scripts/eval.py
+"""
+Çevrimdışı tespit motoru (architecture.md §6): hazırlanmış veri setini API'nin tam tespit
+mantığıyla yeniden oynatır ve nokta bazlı confusion matrix üretir.
+
+- Geofence debounce olay zamanına göre (now_ts = timestamp), çoklu alan (config.fences),
+  online özellikler, model skoru ve hız/sıçrama kuralları (config.filters); öncelik
+  /detect ile aynı: GEOFENCE_EXIT > alan çıkışı > MODEL_ANOMALY > SPEED_ANOMALY >
+  ROUTE_JUMP (geofence alarmı olan nokta skorlanmaz).
+- Veri device_id'ye göre parçalara (shard) bölünür (crc32 % shard sayısı) ve süreç
+  havuzunda işlenir; bir cihazın tüm noktaları aynı parçadadır ve zaman sırasıyla işlenir.
+  Model her worker'da bir kez yüklenir.
+
+    PYTHONPATH=src python -m scripts.eval --test data/processed/dbra24_test.jsonl \
+        --model models/isoforest.flat --out_dir out/eval_replay --jobs 8
+
+Çıktı: <out_dir>/alarms.jsonl (/detect alarm JSON'u + is_true), metrics.json, report.md
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from locate.core.config import Config
+from locate.core.fences import MultiGeofence, fences_from_config
+from locate.core.geofence import DebouncedGeofence, GeofenceParams
+from locate.core.rules import SPEED_ANOMALY, rules_from_config, steps_many
+from locate.ml.features import build_features
+from locate.ml.scorer import ModelScorer, load_scorer, resolve_model_path
+from locate.ml.thresholds import Confusion
+from locate.utils.io import LABEL_COLUMNS, read_dataset
+
+_BASE_COLS = ["device_id", "timestamp", "lat", "lon", "speed"]
+_SOURCES = ("GEOFENCE", "FENCE", "MODEL", "SPEED", "ROUTE")
+
+# worker süreci başına: (config, kurallar, scorer)
+_WORKER: dict = {}
+
+
+def _init_worker(raw_cfg: dict, model_path: str | None) -> None:
+    _WORKER["cfg"] = Config(raw_cfg)
+    _WORKER["rules"] = rules_from_config(_WORKER["cfg"].filters)
+    _WORKER["scorer"] = load_scorer(model_path) if model_path else None
+
+
+def shard_of(device_ids: pd.Series, n_shards: int) -> np.ndarray:
+    """crc32(device_id) % n (locate.api.affinity.worker_for ile aynı); cihaz başına bir kez."""
+    codes, uniq = pd.factorize(device_ids.astype(str))
+    per_dev = np.fromiter(
+        (zlib.crc32(d.encode("utf-8")) % n_shards for d in uniq), dtype="int64", count=len(uniq)
+    )
+    return per_dev[codes]
+
+
+def run_shard(part: pd.DataFrame) -> dict:
+    """
+    Tek parça: geofence (olay zamanı) + alanlar + özellikler + model + kurallar. Giriş satır
+    indeksiyle hizalı alarm kaynağı/skor ve parça confusion sayıları döner.
+    """
+    cfg: Config = _WORKER["cfg"]
+    scorer: ModelScorer | None = _WORKER["scorer"]
+    rules = _WORKER["rules"]
+    t0 = time.perf_counter()
+    n = len(part)
+    dev = part["device_id"].astype(str).tolist()
+    ts = (
+        (pd.to_datetime(part["timestamp"], utc=True) - pd.Timestamp(0, tz="UTC"))
+        .dt.total_seconds()
+        .to_numpy()
+    )
+    lat = part["lat"].to_numpy(dtype="float64")
+    lon = part["lon"].to_numpy(dtype="float64")
+
+    gf = DebouncedGeofence(
+        GeofenceParams(cfg.gf_lat0, cfg.gf_lon0, cfg.gf_radius_m, cfg.gf_debounce_sec)
+    )
+    triggered, _ = gf.check_many(dev, lat, lon, ts)
+    source = np.where(triggered, "GEOFENCE", "").astype(object)
+    fence_id = np.full(n, None, dtype=object)
+    window = np.where(triggered, cfg.gf_debounce_sec, 0).astype(object)
+
+    if cfg.fences:
+        mgf = MultiGeofence(
+            fences_from_config(cfg.fences, cfg.gf_debounce_sec), cell_deg=cfg.fences_cell_deg
+        )
+        for i in np.argsort(ts, kind="stable").tolist():
+            exited = mgf.check(dev[i], lat[i], lon[i], ts[i])[1]
+            if exited and not source[i]:
+                source[i], fence_id[i], window[i] = "FENCE", exited[0].id, exited[0].debounce_sec
+
+    score = np.full(n, np.nan)
+    if scorer is not None or rules.enabled:
+        # float64: /detect/batch'teki online özelliklerle aynı değerler (float32'ye
+        # yuvarlanmış hız/ivme kural eşiklerinde farklı karar verebilir)
+        X = build_features(part, cfg.gf_lat0, cfg.gf_lon0, cfg.feat_window_sec, dtype="float64")
+        X = X.reindex(part.index).to_numpy()
+    if scorer is not None:
+        rows = np.flatnonzero(source == "")
+        if len(rows):
+            s, a = scorer.score_many(X[rows])
+            score[rows] = s
+            hit = rows[a]
+            source[hit] = "MODEL"
+            window[hit] = cfg.feat_window_sec
+    if rules.enabled:
+        # speed/accel özelliklerden (FEATURE_NAMES sırası), sıçrama önceki noktadan
+        rows = np.flatnonzero(source == "")
+        step, dt = steps_many(dev, ts, lat, lon)
+        label = rules.check_many(X[rows, 0], X[rows, 1], step[rows], dt[rows])
+        hit = pd.notna(label)
+        source[rows[hit]] = np.where(label[hit] == SPEED_ANOMALY, "SPEED", "ROUTE")
+        window[rows[hit]] = None
+
+    pred = source != ""
+    y = part["y"].to_numpy(dtype=bool)
+    counts = {
+        "tp": int((pred & y).sum()),
+        "fp": int((pred & ~y).sum()),
+        "fn": int((~pred & y).sum()),
+        "tn": int((~pred & ~y).sum()),
+    }
+    by_label = {
+        c: {"positives": int(part[c].sum()), "detected": int((pred & part[c].to_numpy()).sum())}
+        for c in part.columns
+        if c in LABEL_COLUMNS
+    }
+    by_source = {
+        s: {"alarms": int((source == s).sum()), "true": int(((source == s) & y).sum())}
+        for s in _SOURCES
+    }
+    alarms = pd.DataFrame(
+        {"source": source[pred], "fence_id": fence_id[pred], "window_sec": window[pred]},
+        index=part.index[pred],
+    )
+    alarms["score"] = score[pred]
+    return {
+        "n": n,
+        "devices": len(set(dev)),
+        "counts": counts,
+        "by_label": by_label,
+        "by_source": by_source,
+        "alarms": alarms,
+        "threshold": None if scorer is None else scorer.threshold,
+        "sec": time.perf_counter() - t0,
+    }
+
+
+def _merge(results: list[dict]) -> dict:
+    out = {"n": 0, "devices": 0, "counts": {}, "by_label": {}, "by_source": {}}
+    for r in results:
+        out["n"] += r["n"]
+        out["devices"] += r["devices"]
+        for k, v in r["counts"].items():
+            out["counts"][k] = out["counts"].get(k, 0) + v
+        for grp in ("by_label", "by_source"):
+            for k, d in r[grp].items():
+                acc = out[grp].setdefault(k, dict.fromkeys(d, 0))
+                for kk, vv in d.items():
+                    acc[kk] += vv
+    return out
+
+
+_ALARM = {
+    "GEOFENCE": (1000, "GEOFENCE_EXIT", "GEOFENCE"),
+    "FENCE": (1000, "GEOFENCE_EXIT", "GEOFENCE"),
+    "MODEL": (1200, "MODEL_ANOMALY", "MODEL"),
+    "SPEED": (1100, "SPEED_ANOMALY", "RULE"),
+    "ROUTE": (1101, "ROUTE_JUMP", "RULE"),
+}
+
+
+def write_alarms(path: Path, df: pd.DataFrame, alarms: pd.DataFrame, threshold) -> int:
+    """Alarmları /detect alarm JSON'u (§5.2) + is_true ile olay zamanı sırasıyla yazar."""
+    a = alarms.join(df[["device_id", "timestamp", "lat", "lon", "y"]], how="left")
+    a["timestamp"] = pd.to_datetime(a["timestamp"], utc=True)
+    a = a.sort_values(["timestamp", "device_id"], kind="stable")
+    ts = a["timestamp"].dt.strftime("%Y-%m-%dT%H:%M:%SZ").tolist()
+    cols = zip(
+        a["device_id"].astype(str),
+        ts,
+        a["lat"].tolist(),
+        a["lon"].tolist(),
+        a["source"],
+        a["fence_id"],
+        a["window_sec"],
+        a["score"].tolist(),
+        a["y"].tolist(),
+        strict=True,
+    )
+    with path.open("w", encoding="utf-8") as f:
+        for d, t, la, lo, src, fid, win, sc, y in cols:
+            code, label, source = _ALARM[src]
+            model = src == "MODEL"
+            rec = {
+                "device_id": d,
+                "timestamp": t,
+                "location": {"lat": la, "lon": lo},
+                "anomaly_reason": label,
+                "alarm": {
+                    "code": code,
+                    "label": label,
+                    "source": source,
+                    "window_sec": None if win is None else int(win),
+                    "score": sc if model else None,
+                    "threshold": threshold if model else None,
+                    "fence_id": fid,
+                },
+                "is_true": bool(y),
+            }
+            f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+    return len(a)
+
+
+def write_report(path: Path, res: dict) -> None:
+    cm = res["confusion"]
+    lines = [
+        "# Çevrimdışı Tespit (replay) — Sonuçlar",
+        "",
+        f"- Test: `{res['test']}` | nokta: {res['n']} | cihaz: {res['devices']}",
+        f"- Model: `{res['model']}`",
+        f"- Parça: {res['shards']} | süreç: {res['jobs']} | süre: {res['timing']['total_sec']:.1f} s "
+        f"({res['timing']['points_per_sec']:,.0f} nokta/s)",
+        "- Debounce olay zamanına göre; öncelik GEOFENCE_EXIT > alan çıkışı > MODEL_ANOMALY > "
+        "SPEED_ANOMALY > ROUTE_JUMP",
+        "",
+        "## Confusion matrix (nokta bazlı, etiket = herhangi bir label_*)",
+        "",
+        "| TP | FP | FN | TN | Recall | FAR | Precision |",
+        "|---|---|---|---|---|---|---|",
+        f"| {cm['tp']} | {cm['fp']} | {cm['fn']} | {cm['tn']} | {cm['recall']:.3f} | "
+        f"{cm['far']:.3f} | {cm['precision']:.3f} |",
+        "",
+        "## Etiket bazında yakalama (beklenen vs görülen)",
+        "",
+        "| etiket | pozitif | alarm verilen | oran |",
+        "|---|---|---|---|",
+    ]
+    for k, d in res["by_label"].items():
+        rate = d["detected"] / d["positives"] if d["positives"] else 0.0
+        lines.append(f"| {k} | {d['positives']} | {d['detected']} | {rate:.3f} |")
+    lines += ["", "## Kaynak bazında alarmlar", "", "| kaynak | alarm | doğru |", "|---|---|---|"]
+    for k, d in res["by_source"].items():
+        lines.append(f"| {k} | {d['alarms']} | {d['true']} |")
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--test", required=True, help="etiketli veri (JSONL/Parquet/Arrow)")
+    ap.add_argument("--config", default="configs/config.json")
+    ap.add_argument("--mapping", help="etiket kümesi (mapping 'labels'); verilmezse tüm label_*")
+    ap.add_argument("--model", help="model paketi (varsayılan config.model.path; yoksa kapalı)")
+    ap.add_argument("--out_dir", default="out/eval_replay")
+    ap.add_argument("--jobs", type=int, default=os.cpu_count() or 1)
+    ap.add_argument("--shards", type=int, default=0, help="0: 4 x jobs (yük dengesi için)")
+    args = ap.parse_args()
+
+    raw_cfg = json.loads(Path(args.config).read_text(encoding="utf-8"))
+    cfg = Config(raw_cfg)
+    # API ile aynı kural: .flat yoksa yanındaki .joblib paketi
+    model_path = str(resolve_model_path(args.model or cfg.model_path))
+    if not Path(model_path).exists():
+        if args.model:
+            raise ValueError(f"Model bulunamadı: {model_path}")
+        print(f"[..] model yok ({model_path}); yalnız geofence", file=sys.stderr)
+        model_path = None
+
+    labels = list(LABEL_COLUMNS)
+    if args.mapping:
+        mp = json.loads(Path(args.mapping).read_text(encoding="utf-8"))
+        labels = [f"label_{k}" for k in mp.get("labels", {})]
+
+    t0 = time.perf_counter()
+    df = read_dataset(args.test, columns=[*_BASE_COLS, *labels])
+    if df.empty:
+        raise ValueError(f"Boş veri seti: {args.test}")
+    df = df.reset_index(drop=True)
+    labels = [c for c in labels if c in df.columns]
+    for c in labels:
+        df[c] = df[c].fillna(False).astype(bool)
+    df["y"] = df[labels].any(axis=1) if labels else False
+    t_read = time.perf_counter() - t0
+
+    jobs = max(1, args.jobs)
+    n_shards = args.shards or 4 * jobs
+    shard = shard_of(df["device_id"], n_shards)
+    parts = [g for _, g in df.groupby(shard, sort=True)]
+    # büyük parçalar önce (havuz sonunda tek uzun görev kalmasın)
+    parts.sort(key=len, reverse=True)
+
+    t1 = time.perf_counter()
+    if jobs == 1:
+        _init_worker(raw_cfg, model_path)
+        results = [run_shard(p) for p in parts]
+    else:
+        with ProcessPoolExecutor(
+            max_workers=jobs, initializer=_init_worker, initargs=(raw_cfg, model_path)
+        ) as ex:
+            results = list(ex.map(run_shard, parts))
+    t_run = time.perf_counter() - t1
+
+    agg = _merge(results)
+    c = agg["counts"]
+    cm = Confusion(float("nan"), c["tp"], c["fp"], c["fn"], c["tn"]).to_dict()
+    del cm["threshold"]
+    out = Path(args.out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    alarms = pd.concat([r["alarms"] for r in results])
+    n_alarms = write_alarms(out / "alarms.jsonl", df, alarms, results[0]["threshold"])
+    total = time.perf_counter() - t0
+    res = {
+        "test": str(args.test),
+        "model": model_path,
+        "labels": labels,
+        "n": agg["n"],
+        "devices": agg["devices"],
+        "alarms": n_alarms,
+        "confusion": cm,
+        "by_label": agg["by_label"],
+        "by_source": agg["by_source"],
+        "shards": len(parts),
+        "jobs": jobs,
+        "timing": {
+            "read_sec": t_read,
+            "detect_sec": t_run,
+            "total_sec": total,
+            "points_per_sec": agg["n"] / t_run if t_run > 0 else None,
+            "max_shard_sec": max(r["sec"] for r in results),
+        },
+    }
+    (out / "metrics.json").write_text(json.dumps(res, ensure_ascii=False, indent=2), "utf-8")
+    write_report(out / "report.md", res)
+    print(
+        f"[OK] -> {out} | {agg['n']} nokta, {agg['devices']} cihaz, {len(parts)} parça | "
+        f"alarm {n_alarms} | Recall {cm['recall']:.3f} FAR {cm['far']:.3f} | {total:.1f} s"
+    )
+
+
+if __name__ == "__main__":
+    main()
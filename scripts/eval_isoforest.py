@@ -1,141 +1,212 @@
-# src/locate/ml/features.py
-from __future__ import annotations
+# scripts/eval_isoforest.py
+"""
+Isolation Forest eşik/contamination taraması (architecture.md §4.2).
 
-import numpy as np
-import pandas as pd
-
-# Var olan yardımcıyı kullan: geofence de aynı modülü kullanıyor
-from locate.utils.geo import haversine_m
-
-__all__ = ["build_features"]  # dışa açık semboller
-
-
-def _bearing_rad(lat1, lon1, lat2, lon2) -> np.ndarray:
-    """
-    Büyük daire (great-circle) başlık açısı (radyan).
-    Kaynak: standard arctan2 formülü.
-    """
-    # deg -> rad
-    lat1 = np.radians(lat1)
-    lat2 = np.radians(lat2)
-    dlon = np.radians(lon2 - lon1)
-    x = np.sin(dlon) * np.cos(lat2)
-    y = np.cos(lat1) * np.sin(lat2) - np.sin(lat1) * np.cos(lat2) * np.cos(dlon)
-    return np.arctan2(x, y)  # [-pi, pi]
-
-
-def _ang_diff(a2, a1) -> np.ndarray:
-    """Açı farkını (-pi, pi] aralığında normalize et."""
-    d = a2 - a1
-    return (d + np.pi) % (2 * np.pi) - np.pi
-
-
-def build_features(
-    df: pd.DataFrame,
-    lat0: float,
-    lon0: float,
-    window_sec: int | None = 5,
-) -> pd.DataFrame:
-    """
-    Giriş beklenen kolonlar: device_id, timestamp(ISO8601), lat, lon, speed(m/s).
-    Çıkış: yalnızca sayısal özelliklerden oluşan DataFrame.
-    """
-    if not {"device_id", "timestamp", "lat", "lon"}.issubset(df.columns):
-        raise ValueError("Eksik zorunlu kolon(lar): device_id/timestamp/lat/lon")
-
-    g = df.copy()
-
-    # tip & sıralama
-    g["timestamp"] = pd.to_datetime(g["timestamp"], utc=True)
-    g = g.sort_values(["device_id", "timestamp"], kind="stable")
-
-    # Eğer 'speed' yoksa 0 kabul (m/s). Varsa m/s olduğu projede garanti.
-    if "speed" not in g.columns:
-        g["speed"] = 0.0
-
-    # Grup bazında farklar
-    g["lat_prev"] = g.groupby("device_id")["lat"].shift(1)
-    g["lon_prev"] = g.groupby("device_id")["lon"].shift(1)
-    g["t_prev"] = g.groupby("device_id")["timestamp"].shift(1)
-
-    # dt (saniye)
-    dt = (g["timestamp"] - g["t_prev"]).dt.total_seconds().astype("float32")
-    dt = dt.replace([np.inf, -np.inf], np.nan)
-
-    # iki nokta arası mesafe (metre)
-    d_m = haversine_m(
-        g["lat_prev"].fillna(g["lat"]), g["lon_prev"].fillna(g["lon"]), g["lat"], g["lon"]
-    )
-    d_m = d_m.astype("float32")
+Test seti bir kez skorlanır; contamination ızgarası ve tüm aday eşikler sıralı skorlar +
+kümülatif etiket sayılarıyla tek geçişte değerlendirilir (locate.ml.thresholds).
+FAR ≤ --max-far olanlar arasından Recall'ı en yüksek eşik seçilir.
 
-    # speed_mps_kaynak: veriden (speed); ek olarak d/dt ile "gözlenen hız"
-    obs_speed = (d_m / dt).replace([np.inf, -np.inf], np.nan)
-    speed = g["speed"].astype("float32").fillna(obs_speed).fillna(0.0)
+    PYTHONPATH=src python scripts/eval_isoforest.py \
+        --model models/isoforest.joblib --test data/processed/dbra24_test.jsonl
 
-    # ivme (m/s^2)
-    speed_prev = g.groupby("device_id")["speed"].shift(1).astype("float32")
-    accel = ((speed - speed_prev) / dt).replace([np.inf, -np.inf], np.nan).fillna(0.0)
+Çıktı: out/eval/thresholds.json + out/eval/report.md
+--refit: ızgaradaki her contamination için modeli yeniden eğitip (süreç havuzunda)
+tek geçiş sonuçlarıyla karşılaştırır (--train gerekir).
+"""
 
-    # başlık açısı (radyan) ve dönüş hızı (rad/s)
-    bearing = _bearing_rad(
-        g["lat_prev"].fillna(g["lat"]), g["lon_prev"].fillna(g["lon"]), g["lat"], g["lon"]
-    )
-    bearing_prev = g.groupby("device_id")["lat"].shift(1)
-    # bearing_prev'ı tekrar hesaplamak yerine bir önceki bearing'i kaydır:
-    bearing_prev = pd.Series(bearing).shift(1)
-    turn_rate = (
-        (_ang_diff(bearing, bearing_prev) / dt)
-        .replace([np.inf, -np.inf], np.nan)
-        .fillna(0.0)
-        .astype("float32")
-    )
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
 
-    # merkeze uzaklık ve radyal hız
-    dist_center = haversine_m(lat0, lon0, g["lat"], g["lon"]).astype("float32")
-    dist_center_prev = dist_center.shift(1)
-    radial_speed = (
-        ((dist_center - dist_center_prev) / dt)
-        .replace([np.inf, -np.inf], np.nan)
-        .fillna(0.0)
-        .astype("float32")
+import numpy as np
+from joblib import load
+from sklearn.ensemble import IsolationForest
+
+# Özellik çıkarımı online/offline ortak motordadır: locate.ml.features
+from locate.ml.features import build_features
+from locate.ml.thresholds import Confusion, ThresholdSweep, select_threshold
+from locate.utils.io import LABEL_COLUMNS, read_dataset
+
+_BASE_COLS = ["device_id", "timestamp", "lat", "lon", "speed"]
+
+
+def parse_grid(spec: str) -> list[float]:
+    """'0.05:0.12:0.005' (başlangıç:bitiş:adım, bitiş dahil) ya da '0.05,0.08,0.1'."""
+    if ":" in spec:
+        a, b, step = (float(x) for x in spec.split(":"))
+        n = int(round((b - a) / step)) + 1
+        return [round(a + i * step, 10) for i in range(n)]
+    return [float(x) for x in spec.split(",") if x.strip()]
+
+
+def load_xy(path: str, cfg: dict, scaler) -> tuple[np.ndarray, np.ndarray]:
+    """Özellik matrisi (ölçeklenmiş) ve nokta bazlı etiket (herhangi bir label_* True)."""
+    df = read_dataset(path, columns=[*_BASE_COLS, *LABEL_COLUMNS])
+    X = build_features(
+        df,
+        cfg["geofence"]["lat0"],
+        cfg["geofence"]["lon0"],
+        cfg.get("features", {}).get("window_sec", 0),
+    )
+    labels = [c for c in LABEL_COLUMNS if c in df.columns]
+    y = df.loc[X.index, labels].fillna(False).astype(bool).any(axis=1).to_numpy()
+    Xv = X.to_numpy(dtype="float64")
+    return (scaler.transform(Xv) if scaler is not None else Xv), y
+
+
+def _refit_one(job: tuple[float, dict, np.ndarray, np.ndarray, np.ndarray]) -> dict:
+    c, mcfg, Xtr, Xte, y = job
+    model = IsolationForest(
+        n_estimators=mcfg.get("n_estimators", 256),
+        max_samples=mcfg.get("max_samples", 1024),
+        contamination=c,
+        random_state=mcfg.get("random_state", 42),
+    ).fit(Xtr)
+    pred = model.predict(Xte) == -1
+    tp = int((pred & y).sum())
+    fp = int((pred & ~y).sum())
+    cm = Confusion(float(-model.offset_), tp, fp, int(y.sum()) - tp, int((~y).sum()) - fp)
+    return {"contamination": c, **cm.to_dict()}
+
+
+def _fmt(c: dict) -> str:
+    return (
+        f"| {c.get('contamination', '-')} | {c['threshold']:.5f} | {c['tp']} | {c['fp']} | "
+        f"{c['fn']} | {c['tn']} | {c['recall']:.3f} | {c['far']:.3f} | {c['precision']:.3f} |"
     )
 
-    # Örnekleme ~adımı tahmini (medyan dt); pencere boyuna çevir
-    if window_sec and window_sec > 0:
-        dt_med = dt.median()
-        win = int(max(1, round(window_sec / dt_med))) if pd.notna(dt_med) and dt_med > 0 else 1
-    else:
-        win = 1
-
-    # rolling özellikler (cihaz bazında)
-    def roll_mean(s: pd.Series) -> pd.Series:
-        return (
-            s.groupby(g["device_id"])
-            .rolling(win, min_periods=1)
-            .mean()
-            .reset_index(level=0, drop=True)
-        )
 
-    speed_ma = roll_mean(speed)
-    accel_ma = roll_mean(accel)
-    radial_speed_ma = roll_mean(radial_speed)
-
-    features: pd.DataFrame = (
-        pd.DataFrame(
-            {
-                "speed": speed.values,
-                "accel": accel.values,
-                "turn_rate": turn_rate.values,
-                "dist_center": dist_center.values,
-                "radial_speed": radial_speed.values,
-                "speed_ma": speed_ma.values,
-                "accel_ma": accel_ma.values,
-                "radial_speed_ma": radial_speed_ma.values,
-            },
-            index=g.index,
+def write_report(path: Path, res: dict) -> None:
+    hdr = [
+        "| contamination | eşik | TP | FP | FN | TN | Recall | FAR | Precision |",
+        "|---|---|---|---|---|---|---|---|---|",
+    ]
+    lines = [
+        "# Isolation Forest — Eşik Taraması",
+        "",
+        f"- Model: `{res['model']}`",
+        f"- Test: `{res['test']}` | nokta: {res['n']} | anomali: {res['positives']}",
+        f"- Kural: önce FAR ≤ {res['max_far']}, sonra Recall maks. (alarm: -score_samples > eşik)",
+        f"- Skorlama: {res['timing']['score_sec']:.2f} s | tarama: {res['timing']['sweep_sec']:.3f} s",
+        "",
+        "## Contamination ızgarası",
+        "",
+        *hdr,
+        *(_fmt(c) for c in res["grid"]),
+        "",
+        "## Seçim",
+        "",
+    ]
+    for key, title in (("selected_grid", "Izgara"), ("selected_curve", "Tüm eşikler")):
+        sel = res[key]
+        if sel is None:
+            lines.append(f"- {title}: FAR ≤ {res['max_far']} sağlayan eşik yok")
+            continue
+        ok = sel["recall"] >= 0.80 and sel["far"] <= 0.10
+        lines.append(
+            f"- {title}: contamination≈{sel['contamination']} | eşik {sel['threshold']:.5f} "
+            f"(API skor eşiği {sel['api_threshold']:.4f}) | Recall {sel['recall']:.3f} | "
+            f"FAR {sel['far']:.3f} | Precision {sel['precision']:.3f} | "
+            f"hedefler (Recall ≥ 0.80, FAR ≤ 0.10): {'sağlandı' if ok else 'sağlanmadı'}"
         )
-        .replace([np.inf, -np.inf], 0.0)
-        .fillna(0.0)
+    if res.get("refit"):
+        lines += ["", "## Yeniden eğitim (karşılaştırma)", "", *hdr]
+        lines += [_fmt(c) for c in res["refit"]]
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--model", default="models/isoforest.joblib")
+    ap.add_argument("--test", required=True, help="etiketli test seti (JSONL/Parquet/Arrow)")
+    ap.add_argument("--config", default="configs/config.json")
+    ap.add_argument("--outdir", default="out/eval")
+    ap.add_argument("--grid", default="0.05:0.12:0.005", help="contamination ızgarası")
+    ap.add_argument("--max-far", type=float, default=0.10)
+    ap.add_argument("--refit", action="store_true", help="ızgarayı yeniden eğitimle de doğrula")
+    ap.add_argument("--train", help="--refit için eğitim seti")
+    ap.add_argument("--jobs", type=int, default=os.cpu_count() or 1)
+    args = ap.parse_args()
+    if args.refit and not args.train:
+        raise ValueError("--refit için --train verilmeli")
+
+    cfg = json.loads(Path(args.config).read_text(encoding="utf-8"))
+    bundle = load(args.model)
+    model, scaler = bundle["model"], bundle.get("scaler")
+    raw_min = bundle.get("raw_min", model.offset_)
+    span = (bundle.get("raw_max", model.offset_ + 1.0) - raw_min) or 1.0
+
+    t0 = time.perf_counter()
+    Xte, y = load_xy(args.test, cfg, scaler)
+    s = -model.score_samples(Xte)  # contamination'dan bağımsız; yüksek = anomal
+    t_score = time.perf_counter() - t0
+
+    # contamination c ↔ eğitim skorlarının (1 - c) kantili (sklearn offset_ tanımı)
+    q = bundle.get("score_quantiles")
+    if q is None:
+        print("[..] modelde score_quantiles yok; kantiller test skorlarından alınıyor")
+        q = np.quantile(s, np.linspace(0.0, 1.0, 1001))
+    q = np.asarray(q, dtype="float64")
+    probs = np.linspace(0.0, 1.0, len(q))
+
+    def contamination_of(thr: float) -> float:
+        return round(float(1.0 - np.interp(thr, q, probs)), 4)
+
+    def row(cm: Confusion, c: float | None = None) -> dict:
+        d = cm.to_dict()
+        d["contamination"] = contamination_of(cm.threshold) if c is None else c
+        # API'nin 0-1 ölçeğinde karşılığı: raw = s + offset_
+        d["api_threshold"] = float(np.clip((cm.threshold + model.offset_ - raw_min) / span, 0, 1))
+        return d
+
+    t1 = time.perf_counter()
+    sweep = ThresholdSweep(s, y)
+    grid = parse_grid(args.grid)
+    grid_cms = [sweep.at(float(np.interp(1.0 - c, probs, q))) for c in grid]
+    sel_grid = select_threshold(grid_cms, args.max_far)
+    sel_curve = sweep.best(args.max_far)
+    t_sweep = time.perf_counter() - t1
+
+    res = {
+        "model": str(args.model),
+        "test": str(args.test),
+        "n": sweep.n,
+        "positives": sweep.positives,
+        "max_far": args.max_far,
+        "grid": [row(cm, c) for c, cm in zip(grid, grid_cms, strict=True)],
+        "selected_grid": (
+            None if sel_grid is None else row(sel_grid, grid[grid_cms.index(sel_grid)])
+        ),
+        "selected_curve": None if sel_curve is None else row(sel_curve),
+        # PR eğrisi: en fazla 200 noktaya seyreltilir
+        "curve": [row(cm) for cm in sweep.curve(max_points=200)],
+        "timing": {"score_sec": t_score, "sweep_sec": t_sweep},
+    }
+
+    if args.refit:
+        t2 = time.perf_counter()
+        Xtr, _ = load_xy(args.train, cfg, scaler)
+        mcfg = cfg.get("model", {})
+        with ProcessPoolExecutor(max_workers=max(1, args.jobs)) as ex:
+            res["refit"] = list(ex.map(_refit_one, [(c, mcfg, Xtr, Xte, y) for c in grid]))
+        res["timing"]["refit_sec"] = time.perf_counter() - t2
+
+    out = Path(args.outdir)
+    out.mkdir(parents=True, exist_ok=True)
+    (out / "thresholds.json").write_text(
+        json.dumps(res, ensure_ascii=False, indent=2), encoding="utf-8"
     )
+    write_report(out / "report.md", res)
+    best = res["selected_curve"] or {}
+    print(
+        f"[OK] -> {out / 'thresholds.json'} | n={sweep.n} | ızgara {len(grid)} nokta, "
+        f"eğri {len(res['curve'])} nokta | {t_score + t_sweep:.2f} s | seçim: "
+        f"Recall {best.get('recall', float('nan')):.3f} FAR {best.get('far', float('nan')):.3f}"
+    )
+
 
-    return features.astype("float32")
+if __name__ == "__main__":
+    main()
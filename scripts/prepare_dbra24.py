@@ -1,12 +1,22 @@
 # scripts/prepare_dbra24.py
 import argparse
+import heapq
 import json
+import pickle
+import sys
+import tempfile
+import time
+from collections.abc import Iterable, Iterator
 from datetime import UTC  # <-- eklendi
 from pathlib import Path
 
+import numpy as np
 import pandas as pd
 from dateutil import parser as dtp
 
+from locate.utils.geo import R_EARTH_M
+from locate.utils.io import write_columnar
+
 
 def to_iso8601_utc(ts):
     """
@@ -20,20 +30,23 @@ def to_iso8601_utc(ts):
     return dt.astimezone(UTC).isoformat(timespec="seconds").replace("+00:00", "Z")
 
 
-def main():
-    ap = argparse.ArgumentParser()
-    ap.add_argument("--csv", required=True, help="DBRA24 kaynak dosya (CSV/Parquet)")
-    ap.add_argument("--mapping", default="configs/mapping_dbra24.json")
-    ap.add_argument("--config", default="configs/config.json")
-    ap.add_argument("--out", default="data/processed/dbra24_test.jsonl")
-    args = ap.parse_args()
-
-    cfg = json.loads(Path(args.config).read_text(encoding="utf-8"))
-    mp = json.loads(Path(args.mapping).read_text(encoding="utf-8"))
+def normalize_timestamps(s: pd.Series) -> pd.Series:
+    """
+    to_iso8601_utc'nin vektörel karşılığı (aynı çıktı): naive -> UTC, aware -> UTC'ye çevrilir,
+    saniye altı kesilir. Karışık formatlar 'mixed' ile, o da olmazsa satır satır çözülür.
+    """
+    try:
+        t = pd.to_datetime(s, utc=True)
+    except (ValueError, TypeError):
+        try:
+            t = pd.to_datetime(s, utc=True, format="mixed")
+        except (ValueError, TypeError):
+            return s.map(to_iso8601_utc)
+    return t.dt.strftime("%Y-%m-%dT%H:%M:%SZ")
 
-    src = Path(args.csv)
-    df = pd.read_parquet(src) if src.suffix.lower() == ".parquet" else pd.read_csv(src)
 
+def prepare_frame(df: pd.DataFrame, mp: dict, max_kmh: float | None) -> pd.DataFrame:
+    """Kolon eşleme, birim dönüşümü, temizlik, hız filtresi ve zaman normalizasyonu."""
     rename = {
         mp["timestamp"]: "timestamp",
         mp["lat"]: "lat",
@@ -58,42 +71,395 @@ def main():
     df = df.dropna(subset=["timestamp", "lat", "lon", "device_id"])
 
     # opsiyonel hız filtresi
-    max_kmh = cfg.get("filters", {}).get("max_speed_kmh", None)
     if max_kmh is not None:
         df = df[df["speed"] <= (max_kmh / 3.6)]
 
-    # Zamanı UTC-Z'ye normalle
-    df["timestamp"] = df["timestamp"].map(to_iso8601_utc)
-    df = df.sort_values(by=["device_id", "timestamp"], kind="stable")
+    # Zamanı UTC-Z'ye normalle (vektörel)
+    df = df.assign(timestamp=normalize_timestamps(df["timestamp"]))
+    return df.sort_values(by=["device_id", "timestamp"], kind="stable")
 
-    # etiketler (varsa)
-    labels = mp.get("labels", {})
+
+def output_columns(df: pd.DataFrame, labels: dict) -> list[str]:
     out_cols = ["device_id", "timestamp", "lat", "lon", "speed"]
     for k in ["geofence", "route", "event"]:
         col = labels.get(k)
         if col and col in df.columns:
             out_cols.append(col)
+    return out_cols
+
+
+def compress_frame(
+    df: pd.DataFrame,
+    labels: dict,
+    tol_m: float,
+    max_gap_sec: float | None = None,
+    neighbors: int = 1,
+) -> pd.DataFrame:
+    """
+    Cihaz başına yörünge sıkıştırma (zaman duyarlı Douglas–Peucker, TD-TR): bir nokta,
+    korunan iki komşu noktası arasında zamana göre doğrusal enterpolasyonla tahmin edilen
+    konuma (SED, senkron Öklid mesafesi) tol_m'den yakınsa atılır. Park halindeki (sabit
+    konum) ve sabit hızla düz giden diziler böylece uç noktalarına iner; hız değişimi konum-
+    zaman sapması olarak görüldüğünden korunur.
+      - Her zaman korunur: cihazın ilk/son noktası, etiketli (anomali) noktalar ve cihaz
+        içindeki ±neighbors komşuları.
+      - max_gap_sec: korunan ardışık iki nokta arası bundan uzunsa aradan nokta eklenir.
+    Girdi prepare_frame çıktısıdır ((device_id, timestamp) sıralı). Vektörel: DP tüm
+    cihazların segmentleri üzerinde seviye seviye ilerler (seviye başına bir NumPy geçişi).
+    Mesafeler cihazın ilk noktasına göre yerel düzlemde (equirectangular) ölçülür.
+    """
+    n = len(df)
+    if n < 3:
+        return df
+    dev = df["device_id"].to_numpy()
+    first = np.ones(n, dtype=bool)
+    first[1:] = dev[1:] != dev[:-1]
+    last = np.ones(n, dtype=bool)
+    last[:-1] = first[1:]
+    codes = np.cumsum(first)
+    # prepare_frame zamanları hep 'YYYY-MM-DDTHH:MM:SSZ': 'Z' kesilip NumPy ile çözülür
+    t = df["timestamp"].to_numpy().astype("U19").astype("datetime64[s]").astype("float64")
+    lat = np.radians(df["lat"].to_numpy(dtype="float64"))
+    lon = np.radians(df["lon"].to_numpy(dtype="float64"))
+    ref = np.maximum.accumulate(np.where(first, np.arange(n), 0))
+    x = R_EARTH_M * lon * np.cos(lat[ref])
+    y = R_EARTH_M * lat
+
+    keep = first | last
+    lab = np.zeros(n, dtype=bool)
+    for k in ("geofence", "route", "event"):
+        col = labels.get(k)
+        if col and col in df.columns:
+            lab |= df[col].fillna(0).astype(bool).to_numpy()
+    idx = np.flatnonzero(lab)
+    for d in range(-max(0, int(neighbors)), max(0, int(neighbors)) + 1):
+        j = np.clip(idx + d, 0, n - 1)
+        keep[j[codes[j] == codes[idx]]] = True
+
+    kept = np.flatnonzero(keep)
+    s, e = kept[:-1], kept[1:]
+    m = (e - s > 1) & (codes[s] == codes[e])
+    s, e = s[m], e[m]
+    while len(s):
+        cnt = e - s - 1
+        off = np.zeros(len(s), dtype="int64")
+        np.cumsum(cnt[:-1], out=off[1:])
+        seg = np.repeat(np.arange(len(s)), cnt)
+        i = np.arange(len(seg)) - off[seg] + s[seg] + 1
+        ss, ee = s[seg], e[seg]
+        span = t[ee] - t[ss]
+        r = np.divide(t[i] - t[ss], span, out=np.zeros(len(i)), where=span > 0)
+        dist = np.hypot(x[i] - x[ss] - r * (x[ee] - x[ss]), y[i] - y[ss] - r * (y[ee] - y[ss]))
+        del ss, ee, span, r
+        dmax = np.maximum.reduceat(dist, off)
+        hit = np.flatnonzero(dist == dmax[seg])
+        hit = hit[np.r_[True, seg[hit][1:] != seg[hit][:-1]]]  # segment başına ilk en uzak
+        split = dmax > tol_m
+        at = np.empty(len(s), dtype="int64")
+        at[seg[hit]] = i[hit]
+        if max_gap_sec is not None:
+            gap = ~split & (t[e] - t[s] > max_gap_sec)
+            at = np.where(gap, (s + e) // 2, at)
+            split |= gap
+        k = at[split]
+        keep[k] = True
+        s, e = np.concatenate([s[split], k]), np.concatenate([k, e[split]])
+        m = e - s > 1
+        s, e = s[m], e[m]
+    return df[keep]
+
+
+def iter_records(df: pd.DataFrame, labels: dict) -> Iterator[tuple[object, str, dict]]:
+    """(sıralama anahtarı device_id, timestamp, kayıt) üretir; iterrows yerine kolon listeleri."""
+    cols = output_columns(df, labels)
+    label_cols = [
+        (name, labels[k])
+        for k, name in [
+            ("geofence", "label_geofence"),
+            ("route", "label_route"),
+            ("event", "label_event"),
+        ]
+        if labels.get(k) in cols
+    ]
+    dev = df["device_id"].tolist()
+    ts = df["timestamp"].tolist()
+    lat = df["lat"].tolist()
+    lon = df["lon"].tolist()
+    spd = df["speed"].tolist()
+    lab = [(name, df[col].tolist()) for name, col in label_cols]
+    for i in range(len(dev)):
+        rec = {
+            "device_id": str(dev[i]),
+            "timestamp": ts[i],
+            "lat": float(lat[i]),
+            "lon": float(lon[i]),
+            "speed": float(spd[i]),
+        }
+        for name, vals in lab:
+            rec[name] = bool(vals[i])
+        yield dev[i], ts[i], rec
+
+
+def write_output(records: Iterable[dict], out: Path, fmt: str, partition_by: str | None) -> int:
+    """Kayıtları JSONL (varsayılan) ya da tipli Parquet/Arrow olarak yazar; kayıt sayısı döner."""
+    if fmt == "jsonl":
+        n = 0
+        with out.open("w", encoding="utf-8") as f:
+            for rec in records:
+                f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+                n += 1
+        return n
+    return write_columnar(records, out, "ipc" if fmt == "arrow" else fmt, partition_by)
+
+
+def _csv_device_dtype(src: Path, col: str, chunksize: int) -> str | None:
+    """
+    Parça parça okumada device_id tipinin tüm dosyadaki gibi çıkması için ön tarama
+    (yalnız bu kolon okunur). Tek parça okumadaki pandas çıkarımıyla aynı sıralamayı sağlar.
+    """
+    kinds = set()
+    try:
+        for ch in pd.read_csv(src, usecols=[col], chunksize=chunksize):
+            kinds.add(ch[col].dtype.kind)
+    except ValueError:  # kolon yok → prepare_frame hatayı verecek
+        return None
+    if "O" in kinds:
+        return "str"
+    if "f" in kinds:
+        return "float64"
+    return None
+
+
+def iter_chunks(src: Path, chunksize: int, device_col: str) -> Iterator[pd.DataFrame]:
+    if src.suffix.lower() == ".parquet":
+        import pyarrow.parquet as pq
+
+        pf = pq.ParquetFile(src)
+        for batch in pf.iter_batches(batch_size=chunksize):
+            yield batch.to_pandas()
+    else:
+        dtype = _csv_device_dtype(src, device_col, chunksize)
+        yield from pd.read_csv(
+            src, chunksize=chunksize, dtype={device_col: dtype} if dtype else None
+        )
+
+
+def _write_run(path: Path, records: Iterable[tuple[object, str, dict]]) -> int:
+    n = 0
+    with path.open("wb") as f:
+        p = pickle.Pickler(f, protocol=pickle.HIGHEST_PROTOCOL)
+        for rec in records:
+            p.dump(rec)
+            n += 1
+    return n
+
+
+def _read_run(path: Path) -> Iterator[tuple[object, str, dict]]:
+    with path.open("rb") as f:
+        u = pickle.Unpickler(f)
+        while True:
+            try:
+                yield u.load()
+            except EOFError:
+                return
 
-    # JSONL yaz
+
+def _run_key(r: tuple[object, str, dict]) -> tuple[object, str]:
+    return (r[0], r[1])
+
+
+def _merge_runs(runs: list[Path], tmp: Path, fanin: int) -> list[Path]:
+    """
+    Run sayısı fanin'i aşıyorsa ardışık fanin'lik gruplar ara run'lara birleştirilir (çok
+    geçişli birleştirme); böylece aynı anda en çok fanin run dosyası açıktır (EMFILE).
+    Gruplar ardışık olduğundan eşit anahtarlarda önceki run'ın önceliği korunur.
+    """
+    level = 0
+    while len(runs) > fanin:
+        level += 1
+        merged: list[Path] = []
+        for j in range(0, len(runs), fanin):
+            group = runs[j : j + fanin]
+            if len(group) == 1:
+                merged.append(group[0])
+                continue
+            path = tmp / f"merge_{level:02d}_{j // fanin:05d}.pkl"
+            _write_run(path, heapq.merge(*(_read_run(r) for r in group), key=_run_key))
+            for r in group:
+                r.unlink()
+            merged.append(path)
+        print(
+            f"[..] birleştirme geçişi {level} | {len(runs)} -> {len(merged)} run", file=sys.stderr
+        )
+        runs = merged
+    return runs
+
+
+def maybe_compress(df: pd.DataFrame, args, labels: dict, stats: dict) -> pd.DataFrame:
+    """--compress-tol-m verilmişse compress_frame; stats'a giriş/çıkış sayısı ve süre eklenir."""
+    if args.compress_tol_m is None:
+        return df
+    t0 = time.perf_counter()
+    n = len(df)
+    df = compress_frame(
+        df, labels, args.compress_tol_m, args.compress_max_gap_sec, args.compress_neighbors
+    )
+    stats["in"] = stats.get("in", 0) + n
+    stats["out"] = stats.get("out", 0) + len(df)
+    stats["sec"] = stats.get("sec", 0.0) + time.perf_counter() - t0
+    return df
+
+
+# iter_records çıktısındaki etiket kolonları (compress_frame için labels eşlemesi)
+_OUT_LABELS = {"geofence": "label_geofence", "route": "label_route", "event": "label_event"}
+
+
+def _compress_merged(
+    merged: Iterable[tuple[object, str, dict]], args, stats: dict
+) -> Iterator[dict]:
+    """
+    Birleştirilmiş (device_id, timestamp) sıralı kayıtları cihaz bütünlüğünü bozmadan
+    ~chunksize satırlık gruplar halinde sıkıştırır; sıkıştırma cihaz başına olduğundan
+    sonuç tek parça moddakiyle aynıdır (bellek: en büyük cihaz + bir grup).
+    """
+    buf: list[dict] = []
+    prev = None
+
+    def flush() -> Iterator[dict]:
+        df = maybe_compress(pd.DataFrame.from_records(buf), args, _OUT_LABELS, stats)
+        yield from (buf[i] for i in df.index.tolist())
+        buf.clear()
+
+    for dev, _, rec in merged:
+        if dev != prev and len(buf) >= args.chunksize:
+            yield from flush()
+        prev = dev
+        buf.append(rec)
+    if buf:
+        yield from flush()
+
+
+def run_streaming(args, mp: dict, max_kmh: float | None, out: Path, stats: dict) -> int:
+    """
+    Sınırlı bellekli mod: her parça işlenip (device_id, timestamp) ile sıralanarak geçici
+    bir 'run' dosyasına yazılır; sonunda run'lar heapq.merge ile birleştirilir (harici
+    birleştirmeli sıralama; run sayısı --merge-fanin'i aşarsa önce ara geçişlerle azaltılır).
+    heapq.merge eşit anahtarlarda önceki run'ı öne aldığından çıktı, tek parça moddaki
+    kararlı (stable) sıralamayla aynıdır. Sıkıştırma (--compress-tol-m) birleştirmeden
+    sonra cihaz grupları üzerinde yapılır; çıktı tek parça moddakiyle aynıdır.
+    """
+    src = Path(args.csv)
+    labels = mp.get("labels", {})
+    t0 = time.perf_counter()
+    n_in = n_out = 0
+    with tempfile.TemporaryDirectory(prefix="prep_", dir=out.parent) as tmp:
+        runs: list[Path] = []
+        for i, chunk in enumerate(iter_chunks(src, args.chunksize, mp["device_id"])):
+            n_in += len(chunk)
+            df = prepare_frame(chunk, mp, max_kmh)
+            run = Path(tmp) / f"run_{i:05d}.pkl"
+            n_out += _write_run(run, iter_records(df, labels))
+            runs.append(run)
+            dt = time.perf_counter() - t0
+            print(
+                f"[..] parça {i + 1} | okunan {n_in} | kalan {n_out} | {n_in / dt:,.0f} satır/s",
+                file=sys.stderr,
+            )
+
+        runs = _merge_runs(runs, Path(tmp), args.merge_fanin)
+        merged = heapq.merge(*(_read_run(r) for r in runs), key=_run_key)
+        if args.compress_tol_m is None:
+            records = (rec for _, _, rec in merged)
+        else:
+            records = _compress_merged(merged, args, stats)
+        return write_output(records, out, args.format, args.partition_by)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--csv", required=True, help="DBRA24 kaynak dosya (CSV/Parquet)")
+    ap.add_argument("--mapping", default="configs/mapping_dbra24.json")
+    ap.add_argument("--config", default="configs/config.json")
+    ap.add_argument("--out", default="data/processed/dbra24_test.jsonl")
+    ap.add_argument(
+        "--chunksize",
+        type=int,
+        default=0,
+        help="0: tüm dosya bellekte; >0: bu kadar satırlık parçalarla sınırlı bellekte işle",
+    )
+    ap.add_argument(
+        "--merge-fanin",
+        type=int,
+        default=64,
+        help="parça modunda aynı anda açık tutulan en fazla geçici run dosyası",
+    )
+    ap.add_argument(
+        "--format",
+        choices=["jsonl", "parquet", "arrow"],
+        default="jsonl",
+        help="parquet/arrow: float32 koordinat/hız, int64 epoch-saniye timestamp",
+    )
+    ap.add_argument(
+        "--partition-by",
+        choices=["device_id", "date"],
+        default=None,
+        help="kolonlu formatta hive dizinlerine böl (--out bir dizin olur)",
+    )
+    ap.add_argument(
+        "--compress-tol-m",
+        type=float,
+        default=None,
+        help="yörünge sıkıştırma toleransı (m, zaman duyarlı Douglas–Peucker); verilmezse kapalı",
+    )
+    ap.add_argument(
+        "--compress-max-gap-sec",
+        type=float,
+        default=60.0,
+        help="sıkıştırmada korunan ardışık noktalar arası en uzun süre (s)",
+    )
+    ap.add_argument(
+        "--compress-neighbors",
+        type=int,
+        default=1,
+        help="etiketli noktaların her iki yanında korunan komşu sayısı",
+    )
+    args = ap.parse_args()
+
+    cfg = json.loads(Path(args.config).read_text(encoding="utf-8"))
+    mp = json.loads(Path(args.mapping).read_text(encoding="utf-8"))
+    max_kmh = cfg.get("filters", {}).get("max_speed_kmh", None)
+
+    if args.partition_by and args.format == "jsonl":
+        raise ValueError("--partition-by yalnız parquet/arrow formatında kullanılabilir")
+    if args.merge_fanin < 2:
+        raise ValueError("--merge-fanin en az 2 olmalı")
+    if args.compress_tol_m is not None and args.compress_tol_m <= 0:
+        raise ValueError("--compress-tol-m pozitif olmalı")
     out = Path(args.out)
+    if args.format != "jsonl" and out.suffix.lower() == ".jsonl":
+        out = out.with_suffix("" if args.partition_by else f".{args.format}")
     out.parent.mkdir(parents=True, exist_ok=True)
-    with out.open("w", encoding="utf-8") as f:
-        for _, r in df[out_cols].iterrows():
-            rec = {
-                "device_id": str(r["device_id"]),
-                "timestamp": r["timestamp"],
-                "lat": float(r["lat"]),
-                "lon": float(r["lon"]),
-                "speed": float(r["speed"]),
-            }
-            if labels.get("geofence") in out_cols:
-                rec["label_geofence"] = bool(r.get(labels["geofence"], False))
-            if labels.get("route") in out_cols:
-                rec["label_route"] = bool(r.get(labels["route"], False))
-            if labels.get("event") in out_cols:
-                rec["label_event"] = bool(r.get(labels["event"], False))
-            f.write(json.dumps(rec, ensure_ascii=False) + "\n")
-    print(f"[OK] -> {out} | Kayıt: {len(df)}")
+    t0 = time.perf_counter()
+    stats: dict = {}
+
+    if args.chunksize > 0:
+        n = run_streaming(args, mp, max_kmh, out, stats)
+    else:
+        src = Path(args.csv)
+        df = pd.read_parquet(src) if src.suffix.lower() == ".parquet" else pd.read_csv(src)
+        df = maybe_compress(prepare_frame(df, mp, max_kmh), args, mp.get("labels", {}), stats)
+
+        records = (rec for _, _, rec in iter_records(df, mp.get("labels", {})))
+        n = write_output(records, out, args.format, args.partition_by)
+
+    dt = time.perf_counter() - t0
+    msg = f"[OK] -> {out} | Kayıt: {n} | {dt:.1f} s ({n / max(dt, 1e-9):,.0f} kayıt/s)"
+    if stats:
+        msg += (
+            f" | sıkıştırma {stats['in']} -> {stats['out']} "
+            f"(oran {stats['in'] / max(stats['out'], 1):.2f}x, {stats['sec']:.2f} s)"
+        )
+    print(msg)
 
 
 if __name__ == "__main__":
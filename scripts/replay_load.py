@@ -0,0 +1,226 @@
+# scripts/replay_load.py
+"""
+/detect için uçtan uca yük testi: hazırlanmış veri setini (prepare_dbra24.py çıktısı)
+API'ye yeniden oynatır; throughput, p50/p95/p99 gecikme, alarm sayıları ve RSS'i JSON yazar.
+
+- Cihaz sırası korunur: her cihaz tek bir 'şeride' (lane) düşer ve noktaları sırayla gider;
+  --concurrency şerit sayısıdır (eşzamanlı istek üst sınırı).
+- --rate > 0: açık döngü (open-loop) zamanlama; global zaman sırasındaki i. istek
+  t0 + i / rate anında planlanır. Gecikme, planlanan andan yanıta kadar ölçülür
+  (coordinated omission olmasın diye); gönderim gecikmesi ayrıca raporlanır.
+- --mode asgi: süreç içi (httpx.ASGITransport, ağ yok);
+  --mode uvicorn: yerel uvicorn süreci başlatılır; --url ile çalışan bir sunucu da verilebilir.
+
+    PYTHONPATH=src python scripts/replay_load.py --in data/processed/dbra24_test.jsonl \
+        --mode asgi --concurrency 32 --rate 0 --limit 20000
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+import zlib
+from collections import Counter
+from pathlib import Path
+
+import httpx
+import numpy as np
+
+from locate.utils.io import read_dataset
+
+
+def rss_mb(pid: int | None = None) -> float | None:
+    """Anlık RSS (MB); /proc yoksa bu süreç için tepe RSS."""
+    try:
+        for line in Path(f"/proc/{pid or 'self'}/status").read_text().splitlines():
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024.0
+    except OSError:
+        pass
+    if pid is None:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+    return None
+
+
+def load_points(path: str, limit: int) -> list[dict]:
+    df = read_dataset(path, columns=["device_id", "timestamp", "lat", "lon", "speed"])
+    # global olay zamanı sırası (cihaz içi sıra kararlı sıralamayla korunur)
+    df = df.sort_values("timestamp", kind="stable")
+    if limit > 0:
+        df = df.head(limit)
+    ts = df["timestamp"].dt.strftime("%Y-%m-%dT%H:%M:%SZ").tolist()
+    cols = zip(df["device_id"], ts, df["lat"], df["lon"], df["speed"], strict=True)
+    return [
+        {"device_id": str(d), "timestamp": t, "lat": float(la), "lon": float(lo), "speed": float(v)}
+        for d, t, la, lo, v in cols
+    ]
+
+
+def lanes_for(points: list[dict], n_lanes: int) -> list[list[tuple[int, dict]]]:
+    lanes: list[list[tuple[int, dict]]] = [[] for _ in range(n_lanes)]
+    for i, p in enumerate(points):
+        lanes[zlib.crc32(p["device_id"].encode()) % n_lanes].append((i, p))
+    return [ln for ln in lanes if ln]
+
+
+async def replay(client: httpx.AsyncClient, points: list[dict], args) -> dict:
+    n = len(points)
+    lat = np.full(n, np.nan)
+    lag = np.zeros(n)
+    status: Counter = Counter()
+    alarms: Counter = Counter()
+    errors: Counter = Counter()
+    period = 1.0 / args.rate if args.rate > 0 else 0.0
+    loop = asyncio.get_running_loop()
+    t0 = loop.time()
+
+    async def lane(items: list[tuple[int, dict]]):
+        for i, p in items:
+            planned = t0 + i * period
+            now = loop.time()
+            if planned > now:
+                await asyncio.sleep(planned - now)
+            start = loop.time()
+            try:
+                r = await client.post("/detect", json=p)
+            except httpx.HTTPError as e:
+                errors[type(e).__name__] += 1
+                continue
+            end = loop.time()
+            # açık döngüde gecikme planlanan andan ölçülür
+            lat[i] = end - (planned if period else start)
+            lag[i] = max(0.0, start - planned) if period else 0.0
+            status[r.status_code] += 1
+            if r.status_code == 200:
+                body = r.json()
+                if "alarm" in body:
+                    alarms[body["alarm"]["label"]] += 1
+
+    await asyncio.gather(*(lane(ln) for ln in lanes_for(points, args.concurrency)))
+    elapsed = loop.time() - t0
+    ok = lat[~np.isnan(lat)] * 1000.0
+    pct = (lambda q: float(np.percentile(ok, q))) if len(ok) else (lambda q: None)
+    return {
+        "requests": n,
+        "completed": int(len(ok)),
+        "duration_sec": elapsed,
+        "throughput_rps": len(ok) / elapsed if elapsed > 0 else None,
+        "latency_ms": {
+            "p50": pct(50),
+            "p95": pct(95),
+            "p99": pct(99),
+            "max": float(ok.max()) if len(ok) else None,
+            "mean": float(ok.mean()) if len(ok) else None,
+        },
+        "send_lag_ms": {
+            "p99": float(np.percentile(lag, 99) * 1000.0),
+            "max": float(lag.max() * 1000.0),
+        },
+        "status": {str(k): v for k, v in sorted(status.items())},
+        "alarms": dict(sorted(alarms.items())),
+        "alarm_count": int(sum(alarms.values())),
+        "errors": dict(errors),
+    }
+
+
+def _wait_ready(url: str, proc: subprocess.Popen, timeout: float = 30.0) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"uvicorn başlamadı (çıkış kodu {proc.returncode})")
+        try:
+            if httpx.get(f"{url}/health", timeout=1.0).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise TimeoutError(f"uvicorn {timeout} s içinde hazır olmadı: {url}")
+
+
+async def run(args, points: list[dict]) -> dict:
+    limits = httpx.Limits(
+        max_connections=args.concurrency, max_keepalive_connections=args.concurrency
+    )
+    meta: dict = {"mode": args.mode}
+    if args.mode == "asgi":
+        from locate.api.main import app
+
+        # ASGITransport lifespan olaylarını göndermez: başlatma/kapanış (alarm kuyruğunun
+        # boşaltılması, snapshot) uygulamanın kendi lifespan bağlamıyla çalıştırılır
+        transport = httpx.ASGITransport(app=app)
+        async with (
+            app.router.lifespan_context(app),
+            httpx.AsyncClient(transport=transport, base_url="http://replay") as c,
+        ):
+            res = await replay(c, points, args)
+        meta["rss_mb"] = rss_mb()
+        return {**meta, **res}
+
+    proc = None
+    url = args.url
+    if url is None:
+        url = f"http://127.0.0.1:{args.port}"
+        pypath = os.pathsep.join(filter(None, ["src", os.getenv("PYTHONPATH")]))
+        proc = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", args.app, "--port", str(args.port)]
+            + ["--log-level", "warning"],
+            env={**os.environ, "PYTHONPATH": pypath},
+        )
+    try:
+        if proc is not None:
+            _wait_ready(url, proc)
+        async with httpx.AsyncClient(base_url=url, limits=limits, timeout=args.timeout) as c:
+            res = await replay(c, points, args)
+        meta["url"] = url
+        meta["rss_mb"] = rss_mb(proc.pid) if proc is not None else None
+        meta["client_rss_mb"] = rss_mb()
+        return {**meta, **res}
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait()
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--in", dest="inp", required=True, help="hazırlanmış veri (JSONL/Parquet)")
+    ap.add_argument("--mode", choices=["asgi", "uvicorn"], default="asgi")
+    ap.add_argument("--url", help="uvicorn modunda çalışan sunucu (verilmezse başlatılır)")
+    ap.add_argument("--app", default="locate.api.main:app")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--concurrency", type=int, default=16, help="eşzamanlı şerit sayısı")
+    ap.add_argument("--rate", type=float, default=0.0, help="istek/s (0: olabildiğince hızlı)")
+    ap.add_argument("--limit", type=int, default=0, help=">0: ilk N nokta")
+    ap.add_argument("--timeout", type=float, default=10.0)
+    ap.add_argument("--out", default="out/bench/replay.json")
+    args = ap.parse_args()
+
+    points = load_points(args.inp, args.limit)
+    if not points:
+        raise ValueError(f"Boş veri seti: {args.inp}")
+    res = asyncio.run(run(args, points))
+    res.update(
+        {
+            "input": args.inp,
+            "concurrency": args.concurrency,
+            "target_rate": args.rate or None,
+            "devices": len({p["device_id"] for p in points}),
+        }
+    )
+    out = Path(args.out)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(res, ensure_ascii=False, indent=2), encoding="utf-8")
+    lm = res["latency_ms"]
+    print(
+        f"[OK] -> {out} | {res['completed']}/{res['requests']} istek | "
+        f"{res['throughput_rps']:,.0f} req/s | p50 {lm['p50']:.2f} ms p95 {lm['p95']:.2f} ms "
+        f"p99 {lm['p99']:.2f} ms | alarm {res['alarm_count']} | RSS {res['rss_mb']} MB"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+# scripts/simulate_fleet.py
+"""
+Tohumlu (seeded) sentetik filo üreticisi (architecture.md §1 Simülasyon, opsiyonel/tanısal).
+N cihaz, sabit örnekleme aralığı; etiketler hazırlanmış veri şemasıyla üretilir.
+
+- Normal hareket: yön rastgele yürüyüş, hız ortalamaya dönen AR(1) süreci; konum
+  hız x aralık ile yerel düzlemde entegre edilir (bildirilen hız konumla tutarlıdır).
+- Geofence çıkışı: cihazların --exit-frac kadarı sınıra yakın başlayıp merkezden dışa
+  sürer; label_geofence = merkez mesafesi > radius_m (doğal çıkışlar da etiketlenir).
+- Hız sıçraması: nokta başına --p-spike olasılıkla 1-3 örneklik bildirilen hız artışı
+  (konum değişmez) → label_event.
+- GPS sıçraması: nokta başına --p-jump olasılıkla tek noktanın 300-3000 m kayması
+  → label_route.
+
+    PYTHONPATH=src python scripts/simulate_fleet.py --devices 200 --points 3600 \
+        --out data/sim/sim_test.jsonl --seed 1
+    # prepare_dbra24.py girdisi (ham kolon adları mapping'ten, hız km/h):
+    PYTHONPATH=src python scripts/simulate_fleet.py --format dbra24 --out data/raw/sim.csv
+
+Aynı tohum ve parametreler aynı veriyi üretir. Üretim cihaz bloklarıyla yapılır (blok
+başına ~1M nokta); bellek toplam boyuttan bağımsızdır.
+"""
+
+import argparse
+import json
+import sys
+import time
+from collections.abc import Iterator
+from math import cos, radians
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from locate.utils.geo import R_EARTH_M, haversine_m_vec
+from locate.utils.io import write_columnar
+
+_BLOCK_POINTS = 1 << 20
+
+
+def iter_fleet(
+    n_devices: int,
+    n_points: int,
+    lat0: float,
+    lon0: float,
+    radius_m: float,
+    interval_sec: int = 1,
+    seed: int = 0,
+    exit_frac: float = 0.05,
+    p_spike: float = 0.002,
+    p_jump: float = 0.002,
+    cruise_mps: float = 12.0,
+    start: str = "2024-01-01T00:00:00Z",
+) -> Iterator[pd.DataFrame]:
+    """
+    Cihaz blokları halinde filo: device_id, timestamp (UTC), lat, lon, speed (m/s),
+    label_geofence, label_route, label_event; blok içinde (device_id, timestamp) sıralı.
+    Blok boyu yalnız n_points'e bağlıdır; aynı parametreler aynı blokları üretir.
+    """
+    P = int(n_points)
+    per_block = max(1, _BLOCK_POINTS // P)
+    t0 = pd.Timestamp(start)
+    t0 = t0.tz_convert("UTC") if t0.tzinfo else t0.tz_localize("UTC")
+    k_lon = 1.0 / (R_EARTH_M * cos(radians(lat0)))
+    width = len(str(max(n_devices - 1, 0)))
+    for b, first in enumerate(range(0, n_devices, per_block)):
+        rng = np.random.default_rng([seed, b])
+        D = min(per_block, n_devices - first)
+
+        # hız: cihaz başına ortalama etrafında AR(1) (durağan std ~2 m/s)
+        phi = 0.95
+        mu = rng.uniform(0.5, 1.5, (D, 1)) * cruise_mps
+        ar = rng.normal(0.0, 1.0, (D, P))
+        for j in range(1, P):  # ar[j] = phi * ar[j-1] + e[j]; cihazlar üzerinde vektörel
+            ar[:, j] += phi * ar[:, j - 1]
+        speed = np.clip(mu + 2.0 * np.sqrt(1 - phi**2) * ar, 0.0, None)
+        del ar
+
+        # başlangıç: normal cihazlar yarıçapın yarısı içinde, çıkış yapanlar sınıra yakın
+        exits = rng.random(D) < exit_frac
+        theta = rng.uniform(0.0, 2 * np.pi, D)
+        path = mu[:, 0] * interval_sec * P
+        r0 = np.where(
+            exits,
+            np.clip(radius_m - path * rng.uniform(0.3, 0.7, D), 0.0, None),
+            0.5 * radius_m * np.sqrt(rng.random(D)),
+        )
+        # yön (radyan, kuzeyden saat yönü): çıkışta merkezden dışa, küçük sapmalarla
+        h0 = np.where(exits, theta, rng.uniform(0.0, 2 * np.pi, D))
+        step_sd = np.where(exits, radians(1.0), radians(6.0)) * np.sqrt(interval_sec)
+        heading = h0[:, None] + np.cumsum(rng.normal(0.0, 1.0, (D, P)) * step_sd[:, None], axis=1)
+
+        step = speed * interval_sec
+        step[:, 0] = 0.0  # k. nokta (k-1)'den speed[k] ile gelinir
+        x = r0[:, None] * np.sin(theta)[:, None] + np.cumsum(step * np.sin(heading), axis=1)
+        y = r0[:, None] * np.cos(theta)[:, None] + np.cumsum(step * np.cos(heading), axis=1)
+        del step, heading
+
+        # GPS sıçraması: tek nokta kayar (cihazın ilk noktası hariç)
+        jump = rng.random((D, P)) < p_jump
+        jump[:, 0] = False
+        nj = int(jump.sum())
+        jr, ja = rng.uniform(300.0, 3000.0, nj), rng.uniform(0.0, 2 * np.pi, nj)
+        x[jump] += jr * np.sin(ja)
+        y[jump] += jr * np.cos(ja)
+
+        # hız sıçraması: 1-3 örneklik bildirilen hız artışı
+        s0 = rng.random((D, P)) < p_spike
+        run = rng.integers(1, 4, (D, P))
+        spike = s0.copy()
+        spike[:, 1:] |= s0[:, :-1] & (run[:, :-1] >= 2)
+        spike[:, 2:] |= s0[:, :-2] & (run[:, :-2] >= 3)
+        speed = speed + spike * rng.uniform(15.0, 40.0, (D, P))
+        del s0, run
+
+        lat = lat0 + np.degrees(y / R_EARTH_M)
+        lon = lon0 + np.degrees(x * k_lon)
+        del x, y
+        outside = haversine_m_vec(lat0, lon0, lat, lon) > radius_m
+
+        offs = rng.integers(0, 60, D)[:, None] + np.arange(P)[None, :] * interval_sec
+        ids = np.array([f"sim_{i:0{width}d}" for i in range(first, first + D)])
+        yield pd.DataFrame(
+            {
+                "device_id": np.repeat(ids, P),
+                "timestamp": t0 + pd.to_timedelta(offs.ravel(), unit="s"),
+                "lat": lat.ravel(),
+                "lon": lon.ravel(),
+                "speed": speed.ravel(),
+                "label_geofence": outside.ravel(),
+                "label_route": jump.ravel(),
+                "label_event": spike.ravel(),
+            }
+        )
+
+
+def simulate_fleet(n_devices: int, n_points: int, **kw) -> pd.DataFrame:
+    """iter_fleet bloklarının birleşimi (tek DataFrame)."""
+    return pd.concat(list(iter_fleet(n_devices, n_points, **kw)), ignore_index=True)
+
+
+def to_dbra24(df: pd.DataFrame, mp: dict) -> pd.DataFrame:
+    """Ham DBRA24 kolon adlarıyla (mapping), hız km/h; prepare_dbra24.py girdisi."""
+    labels = mp.get("labels", {})
+    out = pd.DataFrame(
+        {
+            mp["device_id"]: df["device_id"],
+            mp["timestamp"]: df["timestamp"].dt.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            mp["lat"]: df["lat"],
+            mp["lon"]: df["lon"],
+            mp["speed_kmh"]: df["speed"] * 3.6,
+        }
+    )
+    for k in ("geofence", "route", "event"):
+        if labels.get(k):
+            out[labels[k]] = df[f"label_{k}"].astype("int8")
+    return out
+
+
+def _records(df: pd.DataFrame) -> Iterator[dict]:
+    ts = df["timestamp"].dt.strftime("%Y-%m-%dT%H:%M:%SZ").tolist()
+    cols = [df[c].tolist() for c in ("device_id", "lat", "lon", "speed")]
+    labs = [(c, df[c].tolist()) for c in ("label_geofence", "label_route", "label_event")]
+    for i, (d, la, lo, sp) in enumerate(zip(*cols, strict=True)):
+        rec = {"device_id": d, "timestamp": ts[i], "lat": la, "lon": lo, "speed": sp}
+        for c, v in labs:
+            rec[c] = v[i]
+        yield rec
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--devices", type=int, default=100)
+    ap.add_argument("--points", type=int, default=3600, help="cihaz başına nokta")
+    ap.add_argument("--interval", type=int, default=1, help="örnekleme aralığı (s)")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--exit-frac", type=float, default=0.05, help="dışa süren cihaz oranı")
+    ap.add_argument("--p-spike", type=float, default=0.002, help="nokta başına hız sıçraması")
+    ap.add_argument("--p-jump", type=float, default=0.002, help="nokta başına GPS sıçraması")
+    ap.add_argument("--cruise", type=float, default=12.0, help="ortalama hız (m/s)")
+    ap.add_argument("--start", default="2024-01-01T00:00:00Z")
+    ap.add_argument("--config", default="configs/config.json", help="geofence merkezi/yarıçapı")
+    ap.add_argument("--mapping", default="configs/mapping_dbra24.json", help="--format dbra24")
+    ap.add_argument("--format", choices=["jsonl", "parquet", "arrow", "dbra24"], default="jsonl")
+    ap.add_argument("--out", default="data/sim/sim_test.jsonl")
+    args = ap.parse_args()
+
+    if args.devices <= 0 or args.points <= 0 or args.interval <= 0:
+        raise ValueError("--devices, --points ve --interval pozitif olmalı")
+    cfg = json.loads(Path(args.config).read_text(encoding="utf-8"))
+    g = cfg["geofence"]
+    out = Path(args.out)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    blocks = iter_fleet(
+        args.devices,
+        args.points,
+        g["lat0"],
+        g["lon0"],
+        g["radius_m"],
+        interval_sec=args.interval,
+        seed=args.seed,
+        exit_frac=args.exit_frac,
+        p_spike=args.p_spike,
+        p_jump=args.p_jump,
+        cruise_mps=args.cruise,
+        start=args.start,
+    )
+
+    t0 = time.perf_counter()
+    n = 0
+    pos = {"label_geofence": 0, "label_route": 0, "label_event": 0}
+
+    def counted() -> Iterator[pd.DataFrame]:
+        nonlocal n
+        for df in blocks:
+            n += len(df)
+            for c in pos:
+                pos[c] += int(df[c].sum())
+            print(f"[..] {n} nokta", file=sys.stderr)
+            yield df
+
+    if args.format == "jsonl":
+        with out.open("w", encoding="utf-8") as f:
+            for df in counted():
+                f.writelines(json.dumps(r) + "\n" for r in _records(df))
+    elif args.format == "dbra24":
+        mp = json.loads(Path(args.mapping).read_text(encoding="utf-8"))
+        for i, df in enumerate(counted()):
+            to_dbra24(df, mp).to_csv(out, mode="w" if i == 0 else "a", header=i == 0, index=False)
+    else:
+        recs = (r for df in counted() for r in _records(df))
+        write_columnar(recs, out, "ipc" if args.format == "arrow" else args.format)
+    print(
+        f"[OK] -> {out} | {n} nokta, {args.devices} cihaz | "
+        + ", ".join(f"{k}={v}" for k, v in pos.items())
+        + f" | {time.perf_counter() - t0:.1f} s"
+    )
+
+
+if __name__ == "__main__":
+    main()
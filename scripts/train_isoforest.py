@@ -1,100 +1,239 @@
 import argparse
 import json
+import sys
+import time
 from pathlib import Path
 
 import numpy as np
 import pandas as pd
-from joblib import dump
+import sklearn
+from joblib import Parallel, delayed, dump
 from sklearn.ensemble import IsolationForest
 from sklearn.preprocessing import StandardScaler
 
-from locate.utils.geo import haversine_m
-
-
-def bearing_deg(lat1, lon1, lat2, lon2):
-    import numpy as np
-
-    φ1, φ2 = np.radians(lat1), np.radians(lat2)
-    dλ = np.radians(lon2 - lon1)
-    y = np.sin(dλ) * np.cos(φ2)
-    x = np.cos(φ1) * np.sin(φ2) - np.sin(φ1) * np.cos(φ2) * np.cos(dλ)
-    θ = np.arctan2(y, x)
-    return (np.degrees(θ) + 360.0) % 360.0
-
-
-def ang_diff_deg(a, b):
-    return (a - b + 180.0) % 360.0 - 180.0
+from locate.ml.cache import FeatureCache
+from locate.ml.features import FEATURE_NAMES, build_features
+from locate.ml.scorer import ModelScorer, export_artifact
+from locate.utils.io import iter_dataset, read_dataset
+
+_COLS = ["device_id", "timestamp", "lat", "lon", "speed"]
+
+
+class Reservoir:
+    """
+    Akıştan k satırlık düzgün örneklem (yerine koymadan): her satıra U(0,1) anahtar verilir,
+    en küçük k anahtarlı satırlar tutulur (bottom-k). Bellek O(k), parça başına vektörel.
+    """
+
+    def __init__(self, k: int, n_features: int, rng: np.random.Generator):
+        self.k = int(k)
+        self.rng = rng
+        self.keys = np.empty(0)
+        self.rows = np.empty((0, n_features))
+
+    def add(self, X: np.ndarray) -> None:
+        keys = self.rng.random(len(X))
+        if len(self.keys) >= self.k:
+            # dolu rezervuar: yalnız mevcut en büyük anahtardan küçükler aday
+            m = keys < self.keys.max()
+            if not m.any():
+                return
+            keys, X = keys[m], X[m]
+        keys = np.concatenate([self.keys, keys])
+        rows = np.concatenate([self.rows, X])
+        if len(keys) > self.k:
+            idx = np.argpartition(keys, self.k - 1)[: self.k]
+            keys, rows = keys[idx], rows[idx]
+        self.keys, self.rows = keys, rows
+
+
+def _fit_tree(X: np.ndarray, seed: int) -> IsolationForest:
+    # tek ağaç, rezervuarın tamamıyla (max_samples = rezervuar boyu)
+    return IsolationForest(n_estimators=1, max_samples=len(X), random_state=seed).fit(X)
+
+
+# birleştirme doğrulamasında kullanılan kalibrasyon satırı sayısı
+_CHECK_ROWS = 256
+
+
+def _reference_scores(parts: list[IsolationForest], X: np.ndarray) -> np.ndarray:
+    """
+    Birleşik ormanın olması gereken score_samples'ı, yalnız parçaların public API'siyle:
+    aynı örneklem boyunda (ψ) s_i = -2^(-h_i / c(ψ)) → s = -2^(ortalama log2(-s_i)).
+    """
+    return -np.exp2(np.mean([np.log2(-p.score_samples(X)) for p in parts], axis=0))
+
+
+def merge_trees(parts: list[IsolationForest], contamination, X_calib: np.ndarray):
+    """
+    Tek ağaçlı ormanları tek bir IsolationForest'ta birleştirir (sklearn'ün skorlamada
+    kullandığı ağaç başı iç alanlar birleştirilir). Bu alanlar sürümle değişebilir: sürüm
+    requirements.txt/environment.yml'de sabittir ve sonuç parçalardan kurulan referansla
+    doğrulanır; uyuşmazsa bozuk model yazılmaz, eğitim durur. offset_: contamination
+    "auto" ise -0.5, değilse kalibrasyon örnekleminin score_samples persentili (sklearn ile
+    aynı tanım).
+    """
+    X_check = X_calib[:_CHECK_ROWS]
+    ref = _reference_scores(parts, X_check)
+    model = parts[0]
+    model.n_estimators = len(parts)
+    model.estimators_ = [p.estimators_[0] for p in parts]
+    model.estimators_features_ = [p.estimators_features_[0] for p in parts]
+    model._seeds = np.array([p._seeds[0] for p in parts])
+    model._decision_path_lengths = tuple(p._decision_path_lengths[0] for p in parts)
+    model._average_path_length_per_tree = tuple(p._average_path_length_per_tree[0] for p in parts)
+    got = model.score_samples(X_check)
+    if not np.allclose(got, ref, rtol=1e-9, atol=0.0):
+        raise RuntimeError(
+            f"Birleşik IsolationForest referansla uyuşmuyor (maks |fark| "
+            f"{np.abs(got - ref).max():.3e}): merge_trees scikit-learn {sklearn.__version__} "
+            "ile uyumsuz; requirements.txt'deki sürümü kullanın"
+        )
+    model.contamination = contamination
+    if contamination == "auto":
+        model.offset_ = -0.5
+    else:
+        model.offset_ = float(np.percentile(model.score_samples(X_calib), 100.0 * contamination))
+    return model
+
+
+def fit_streaming(args, cfg: dict, mcfg: dict, contamination):
+    """
+    Sınırlı bellekli eğitim: veri parça parça okunur, özellikler cihaz state'i parçalar
+    arasında taşınarak hesaplanır, scaler partial_fit ile akışta öğrenilir. Her ağaç için
+    ayrı bir max_samples'lık rezervuar tutulur; ağaçlar sonunda paralel eğitilir.
+    Bellek ~ n_estimators * max_samples * özellik sayısı (+ cihaz başına state).
+    """
+    fcfg = cfg.get("features", {})
+    n_trees = int(mcfg.get("n_estimators", 256))
+    k = int(mcfg.get("max_samples", 1024))
+    rng = np.random.default_rng(mcfg.get("random_state", 42))
+    nf = len(FEATURE_NAMES)
+    trees = [Reservoir(k, nf, rng) for _ in range(n_trees)]
+    calib = Reservoir(args.calib_samples, nf, rng)  # normalizasyon/kantiller için
+    scaler = StandardScaler() if fcfg.get("scaler", "standard") == "standard" else None
+
+    carry: dict = {}
+    n = 0
+    t0 = time.perf_counter()
+    for i, df in enumerate(iter_dataset(args.inp, _COLS, args.chunksize)):
+        X = build_features(
+            df, cfg["geofence"]["lat0"], cfg["geofence"]["lon0"], fcfg.get("window_sec", 0), carry
+        ).to_numpy(dtype="float64")
+        if scaler is not None:
+            scaler.partial_fit(X)
+        for r in trees:
+            r.add(X)
+        calib.add(X)
+        n += len(X)
+        print(
+            f"[..] parça {i + 1} | satır {n} | cihaz {len(carry.get('last', {}))} | "
+            f"{n / (time.perf_counter() - t0):,.0f} satır/s",
+            file=sys.stderr,
+        )
+    if n == 0:
+        raise ValueError(f"Boş veri seti: {args.inp}")
 
+    def scale(A: np.ndarray) -> np.ndarray:
+        return scaler.transform(A) if scaler is not None else A
 
-def build_features(df: pd.DataFrame, lat0: float, lon0: float) -> pd.DataFrame:
-    df = df.copy()
-    df["timestamp"] = pd.to_datetime(df["timestamp"], utc=True)
-    df = df.sort_values(["device_id", "timestamp"], kind="stable")
-    # cihaz bazında öteleme
-    for c in ["lat", "lon", "speed", "timestamp"]:
-        df[f"prev_{c}"] = df.groupby("device_id")[c].shift(1)
-    dt = (df["timestamp"] - df["prev_timestamp"]).dt.total_seconds()
-    brg = bearing_deg(df["prev_lat"], df["prev_lon"], df["lat"], df["lon"])
-    brg_prev = df.groupby("device_id")[brg.name].shift(1)
-    accel = (df["speed"] - df["prev_speed"]) / dt
-    turn_rate = abs(ang_diff_deg(brg, brg_prev)) / dt
-    dist_center = df.apply(
-        lambda r: haversine_m(lat0, lon0, float(r["lat"]), float(r["lon"])), axis=1
+    seeds = np.random.default_rng(mcfg.get("random_state", 42)).integers(0, 2**31 - 1, n_trees)
+    parts = Parallel(n_jobs=args.jobs)(
+        delayed(_fit_tree)(scale(r.rows), int(s)) for r, s in zip(trees, seeds, strict=True)
     )
-    X = pd.DataFrame(
-        {
-            "speed": df["speed"],
-            "accel_abs": abs(accel),
-            "turn_rate_abs": turn_rate,
-            "dist_center_m": dist_center,
-        }
-    )
-    X = X.replace([np.inf, -np.inf], np.nan).dropna()
-    return X
+    X_calib = scale(calib.rows)
+    model = merge_trees(parts, contamination, X_calib)
+    model.max_samples = k
+    return model, scaler, X_calib, n
 
 
 def main():
     ap = argparse.ArgumentParser()
-    ap.add_argument("--in", dest="inp", required=True, help="JSONL (lines=True)")
+    ap.add_argument(
+        "--in", dest="inp", required=True, help="JSONL ya da Parquet/Arrow (dosya/dizin)"
+    )
     ap.add_argument("--config", default="configs/config.json")
     ap.add_argument("--outdir", default="models")
+    ap.add_argument("--no-cache", action="store_true", help="özellik önbelleğini kullanma")
+    ap.add_argument(
+        "--chunksize",
+        type=int,
+        default=0,
+        help="0: tüm veri bellekte; >0: parça parça oku, ağaç başına rezervuar örneklemiyle eğit",
+    )
+    ap.add_argument(
+        "--calib-samples", type=int, default=65536, help="akış modunda kalibrasyon örneklemi"
+    )
+    ap.add_argument("--jobs", type=int, default=-1, help="akış modunda paralel ağaç eğitimi")
     args = ap.parse_args()
 
     cfg = json.loads(Path(args.config).read_text())
     lat0 = cfg["geofence"]["lat0"]
     lon0 = cfg["geofence"]["lon0"]
 
-    df = pd.read_json(args.inp, lines=True)
-    X = build_features(df, lat0, lon0)
+    fcfg = cfg.get("features", {})
+    mcfg = cfg.get("model", {})
+    # config'te null ise sklearn varsayılanı ("auto")
+    contamination = mcfg.get("contamination") or "auto"
 
-    # scaler
-    scaler = None
-    if cfg.get("features", {}).get("scaler", "standard") == "standard":
-        scaler = StandardScaler().fit(X.values)
-        Xv = scaler.transform(X.values)
+    if args.chunksize > 0:
+        model, scaler, Xv, n = fit_streaming(args, cfg, mcfg, contamination)
+        features = list(FEATURE_NAMES)
     else:
-        Xv = X.values
 
-    # model
-    mcfg = cfg.get("model", {})
-    model = IsolationForest(
-        n_estimators=mcfg.get("n_estimators", 256),
-        max_samples=mcfg.get("max_samples", 1024),
-        contamination=mcfg.get("contamination", 0.10),  # hedef FAR ~10%
-        random_state=mcfg.get("random_state", 42),
-    ).fit(Xv)
+        def compute() -> pd.DataFrame:
+            df = read_dataset(args.inp, columns=_COLS)
+            return build_features(df, lat0, lon0, fcfg.get("window_sec", 0))
+
+        if args.no_cache or not fcfg.get("cache_dir"):
+            X = compute()
+        else:
+            max_mb = fcfg.get("cache_max_mb")
+            cache = FeatureCache(fcfg["cache_dir"], None if max_mb is None else int(max_mb * 2**20))
+            params = {"lat0": lat0, "lon0": lon0, "window_sec": fcfg.get("window_sec")}
+            X, hit = cache.get_or_compute(args.inp, build_features, params, compute)
+            print(f"[..] özellik önbelleği: {'isabet' if hit else 'yazıldı'} ({cache.root})")
+
+        # scaler
+        scaler = None
+        if fcfg.get("scaler", "standard") == "standard":
+            scaler = StandardScaler().fit(X.values)
+            Xv = scaler.transform(X.values)
+        else:
+            Xv = X.values
+
+        # model
+        model = IsolationForest(
+            n_estimators=mcfg.get("n_estimators", 256),
+            max_samples=mcfg.get("max_samples", 1024),
+            contamination=contamination,
+            random_state=mcfg.get("random_state", 42),
+        ).fit(Xv)
+        features, n = list(X.columns), len(X)
+
+    # API skor normalizasyonu (doküman 5.2): raw = -decision_function, min/max eğitimden
+    # (akış modunda kalibrasyon örnekleminden)
+    raw = -model.decision_function(Xv)
+    # eşik taraması (eval_isoforest.py) için contamination'dan bağımsız skor kantilleri:
+    # -score_samples = raw - offset_; contamination c ↔ (1 - c) kantili
+    score_quantiles = np.quantile(raw - model.offset_, np.linspace(0.0, 1.0, 1001))
 
     Path(args.outdir).mkdir(parents=True, exist_ok=True)
-    dump(
-        {"model": model, "scaler": scaler, "features": list(X.columns)},
-        Path(args.outdir) / "isoforest.joblib",
-    )
+    bundle = {
+        "model": model,
+        "scaler": scaler,
+        "features": features,
+        "raw_min": float(raw.min()),
+        "raw_max": float(raw.max()),
+        "score_quantiles": score_quantiles,
+    }
+    dump(bundle, Path(args.outdir) / "isoforest.joblib")
     (Path(args.outdir) / "isoforest.meta.json").write_text(
-        json.dumps(
-            {"features": list(X.columns), "count": int(len(X))}, ensure_ascii=False, indent=2
-        )
+        json.dumps({"features": features, "count": int(n)}, ensure_ascii=False, indent=2)
     )
-    print(f"[OK] model -> {Path(args.outdir) / 'isoforest.joblib'} | n={len(X)}")
+    # API için düz, mmap'lenebilir artefakt (joblib paketi eval/yeniden eğitim için kalır)
+    flat = export_artifact(ModelScorer.from_bundle(bundle), Path(args.outdir) / "isoforest.flat")
+    print(f"[OK] model -> {Path(args.outdir) / 'isoforest.joblib'} + {flat} | n={n}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,279 @@
+# src/locate/api/affinity.py
+"""
+Cihaz afinitesi (device-affinity) yönlendirmesi.
+
+Her worker kendi süreç içi state'ini tutar; aynı device_id'nin tüm noktaları
+crc32(device_id) % N ile hep aynı worker'a gönderilir. Böylece paylaşımlı state
+backend'i olmadan da çoklu çekirdek kullanılabilir.
+
+Çalıştırma (src altından, PYTHONPATH=src):
+    python -m locate.api.affinity --workers 4 --port 8000
+  → 8001..8004 portlarında 4 uvicorn worker'ı + 8000'de yönlendirici.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import zlib
+from typing import Any
+
+__all__ = ["worker_for", "AffinityRouter", "main"]
+
+
+def worker_for(device_id: str, n_workers: int) -> int:
+    """Süreçler ve yeniden başlatmalar arasında kararlı worker indeksi."""
+    return zlib.crc32(device_id.encode("utf-8")) % n_workers
+
+
+class _Upstream:
+    """Tek bir worker'a keep-alive bağlantı havuzlu, minimal HTTP/1.1 istemcisi."""
+
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self._idle: list[tuple[asyncio.StreamReader, asyncio.StreamWriter]] = []
+
+    async def request(
+        self, method: str, path: str, body: bytes = b""
+    ) -> tuple[int, list[tuple[bytes, bytes]], bytes]:
+        head = (
+            f"{method} {path} HTTP/1.1\r\nHost: {self.host}:{self.port}\r\n"
+            f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n"
+        ).encode("latin-1")
+        for attempt in range(3):
+            reused = bool(self._idle)
+            try:
+                if reused:
+                    reader, writer = self._idle.pop()
+                else:
+                    reader, writer = await asyncio.open_connection(self.host, self.port)
+            except OSError:
+                # worker henüz ayağa kalkmamış olabilir
+                if attempt == 2:
+                    raise
+                await asyncio.sleep(0.2)
+                continue
+            try:
+                writer.write(head + body)
+                await writer.drain()
+                status, headers, data, keep = await self._read_response(reader)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                writer.close()
+                # boşta beklerken worker'ın kapattığı bağlantı → yenisiyle tekrar dene
+                if not reused or attempt == 2:
+                    raise
+                continue
+            if keep:
+                self._idle.append((reader, writer))
+            else:
+                writer.close()
+            return status, headers, data
+        raise ConnectionError(f"worker'a ulaşılamadı: {self.host}:{self.port}")
+
+    @staticmethod
+    async def _read_response(reader: asyncio.StreamReader):
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionError("worker bağlantıyı kapattı")
+        status = int(status_line.split()[1])
+        headers: list[tuple[bytes, bytes]] = []
+        length = None
+        chunked = False
+        keep = True
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            k, _, v = line.partition(b":")
+            k, v = k.strip().lower(), v.strip()
+            if k == b"content-length":
+                length = int(v)
+            elif k == b"transfer-encoding" and v.lower() == b"chunked":
+                chunked = True
+                continue
+            elif k == b"connection" and v.lower() == b"close":
+                keep = False
+            if k not in (b"connection", b"keep-alive", b"date", b"server"):
+                headers.append((k, v))
+        if chunked:
+            parts = []
+            while True:
+                size = int((await reader.readline()).split(b";")[0], 16)
+                if size == 0:
+                    await reader.readline()
+                    break
+                parts.append(await reader.readexactly(size))
+                await reader.readline()
+            data = b"".join(parts)
+            headers = [(k, v) for k, v in headers if k != b"content-length"]
+            headers.append((b"content-length", str(len(data)).encode()))
+        elif length is not None:
+            data = await reader.readexactly(length)
+        else:
+            data = await reader.read()
+            keep = False
+        return status, headers, data, keep
+
+
+class AffinityRouter:
+    """
+    ASGI yönlendirici:
+      - POST /detect        → device_id'nin worker'ı
+      - POST /detect/batch  → noktalar worker'lara bölünür, sonuçlar giriş sırasıyla birleşir
+      - POST /detect/stream → gövde tamponlanır; NDJSON kayıtları worker'lara bölünür,
+                              çıktılar seq sırasıyla birleşir (tam çift yönlü akış yok)
+      - /detect/ws          → reddedilir (WebSocket vekilliği yok; el sıkışma 403)
+      - diğer yollar        → worker 0
+    """
+
+    def __init__(self, upstreams: list[tuple[str, int]]):
+        if not upstreams:
+            raise ValueError("En az bir worker gerekli")
+        self.upstreams = [_Upstream(h, p) for h, p in upstreams]
+
+    async def _body(self, receive) -> bytes:
+        chunks = []
+        while True:
+            msg = await receive()
+            chunks.append(msg.get("body", b""))
+            if not msg.get("more_body", False):
+                return b"".join(chunks)
+
+    @staticmethod
+    async def _send(send, status: int, headers: list[tuple[bytes, bytes]], body: bytes):
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
+
+    async def _batch(self, payload: dict[str, Any]):
+        pts = payload.get("points") or []
+        n = len(self.upstreams)
+        groups: dict[int, list[int]] = {}
+        for i, p in enumerate(pts):
+            groups.setdefault(worker_for(str(p.get("device_id", "")), n), []).append(i)
+
+        async def call(w: int, idx: list[int]):
+            body = json.dumps({"points": [pts[i] for i in idx], "only_alarms": False})
+            return idx, await self.upstreams[w].request("POST", "/detect/batch", body.encode())
+
+        replies = await asyncio.gather(*(call(w, idx) for w, idx in groups.items()))
+        results: list[Any] = [None] * len(pts)
+        for idx, (status, headers, data) in replies:
+            if status != 200:
+                return status, headers, data
+            for i, r in zip(idx, json.loads(data)["results"], strict=True):
+                results[i] = r
+        alarm_count = sum("alarm" in r for r in results)
+        if payload.get("only_alarms"):
+            results = [r for r in results if "alarm" in r]
+        out = json.dumps(
+            {"count": len(pts), "alarm_count": alarm_count, "results": results}
+        ).encode()
+        return 200, [(b"content-type", b"application/json")], out
+
+    async def _stream(self, body: bytes):
+        lines = [ln for ln in body.split(b"\n") if ln.strip()]
+        n = len(self.upstreams)
+        groups: dict[int, list[int]] = {}
+        for i, ln in enumerate(lines):
+            try:
+                w = worker_for(str(json.loads(ln).get("device_id", "")), n)
+            except (ValueError, AttributeError):
+                w = 0  # bozuk kayıt: hatayı worker 0 üretsin (state'e dokunmaz)
+            groups.setdefault(w, []).append(i)
+
+        async def call(w: int, idx: list[int]):
+            sub = b"".join(lines[i] + b"\n" for i in idx)
+            return idx, await self.upstreams[w].request("POST", "/detect/stream", sub)
+
+        replies = await asyncio.gather(*(call(w, idx) for w, idx in groups.items()))
+        out: list[dict[str, Any]] = []
+        for idx, (status, headers, data) in replies:
+            if status != 200:
+                return status, headers, data
+            for ln in data.split(b"\n"):
+                if not ln.strip():
+                    continue
+                rec = json.loads(ln)
+                # worker'ın seq'i kendi alt akışındaki sıradır → giriş sırasına çevrilir
+                s = rec["seq"]
+                rec["seq"] = idx[s] if s < len(idx) else len(lines)
+                out.append(rec)
+        out.sort(key=lambda r: r["seq"])
+        data = b"".join(json.dumps(r).encode() + b"\n" for r in out)
+        return 200, [(b"content-type", b"application/x-ndjson")], data
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            while True:
+                msg = await receive()
+                if msg["type"] == "lifespan.startup":
+                    await send({"type": "lifespan.startup.complete"})
+                elif msg["type"] == "lifespan.shutdown":
+                    await send({"type": "lifespan.shutdown.complete"})
+                    return
+        if scope["type"] == "websocket":
+            # worker'a taşınmazsa cihaz state'i yanlış worker'da kurulurdu → açıkça reddedilir
+            await receive()  # websocket.connect
+            await send({"type": "websocket.close", "code": 1008})
+            return
+        if scope["type"] != "http":
+            return
+
+        body = await self._body(receive)
+        path, method = scope["path"], scope["method"]
+        qs = scope.get("query_string", b"")
+        full_path = path + ("?" + qs.decode("latin-1") if qs else "")
+        try:
+            if method == "POST" and path == "/detect/batch":
+                status, headers, data = await self._batch(json.loads(body))
+            elif method == "POST" and path == "/detect/stream":
+                status, headers, data = await self._stream(body)
+            else:
+                w = 0
+                if method == "POST" and path == "/detect":
+                    w = worker_for(str(json.loads(body).get("device_id", "")), len(self.upstreams))
+                status, headers, data = await self.upstreams[w].request(method, full_path, body)
+        except (ValueError, AttributeError):
+            # bozuk JSON: doğrulama hatasını worker 0 üretsin
+            status, headers, data = await self.upstreams[0].request(method, full_path, body)
+        await self._send(send, status, headers, data)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--workers", type=int, default=2)
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8000, help="yönlendirici portu")
+    ap.add_argument("--app", default="locate.api.main:app")
+    args = ap.parse_args()
+
+    import uvicorn
+
+    ports = [args.port + 1 + i for i in range(args.workers)]
+    # GEOSENTINEL_WORKER: worker indeksi (state.snapshot_path içindeki '{worker}'); aynı
+    # worker sayısıyla yeniden başlatmada her worker kendi cihazlarının görüntüsünü açar
+    procs = [
+        subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", args.app, "--host", "127.0.0.1", "--port", str(p)],
+            env={**os.environ, "GEOSENTINEL_WORKER": str(i)},
+        )
+        for i, p in enumerate(ports)
+    ]
+    try:
+        uvicorn.run(
+            AffinityRouter([("127.0.0.1", p) for p in ports]), host=args.host, port=args.port
+        )
+    finally:
+        for pr in procs:
+            pr.terminate()
+        for pr in procs:
+            pr.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+# src/locate/api/batcher.py
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Callable
+from typing import Any
+
+import numpy as np
+
+ScoreFn = Callable[[np.ndarray], tuple[np.ndarray, np.ndarray]]
+
+
+class MicroBatcher:
+    """
+    Eşzamanlı isteklerin özellik vektörlerini toplayıp tek çağrıda skorlar.
+
+    Akış:
+      - submit() satırı kuyruğa ekler ve bir future bekler.
+      - Kuyruk max_batch satıra ulaşınca hemen, aksi halde ilk satırdan
+        max_wait_ms sonra boşaltılır (flush).
+      - Skorlama thread havuzunda çalışır; event loop bu sırada yeni istekleri toplar.
+
+    Gecikme üst sınırı ~max_wait_ms + tek batch skor süresidir.
+    """
+
+    def __init__(self, score_fn: ScoreFn, max_batch: int = 32, max_wait_ms: float = 2.0):
+        self._score_fn = score_fn
+        self.max_batch = max(1, int(max_batch))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self._rows: list[list[float]] = []
+        self._futs: list[asyncio.Future] = []
+        self._timer: asyncio.TimerHandle | None = None
+        self._tasks: set[asyncio.Task] = set()
+        # metrikler
+        self.batches = 0
+        self.rows = 0
+        self.flush_full = 0
+        self.flush_timeout = 0
+        # batch boyutu histogramı: üst sınırlar 1, 2, 4, ..., max_batch
+        self._bounds = [1 << i for i in range(max(1, self.max_batch).bit_length())]
+        if self._bounds[-1] < self.max_batch:
+            self._bounds.append(self.max_batch)
+        self._hist = [0] * len(self._bounds)
+
+    async def submit(self, row: list[float]) -> tuple[float, bool]:
+        """Tek satır → (score[0-1], anomaly?)"""
+        return await self.enqueue(row)
+
+    def enqueue(self, row: list[float]) -> asyncio.Future:
+        """
+        Satırı beklemeden kuyruğa ekler; sonucu (score, anomaly?) veren future döner.
+        Akış bağlantıları art arda noktaları böyle ekleyip sonuçları sırayla bekler.
+        """
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        self._rows.append(row)
+        self._futs.append(fut)
+        if len(self._rows) >= self.max_batch:
+            self.flush_full += 1
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._on_timeout)
+        return fut
+
+    def _on_timeout(self) -> None:
+        self._timer = None
+        if self._rows:
+            self.flush_timeout += 1
+            self._flush()
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        rows, futs = self._rows, self._futs
+        self._rows, self._futs = [], []
+
+        n = len(rows)
+        self.batches += 1
+        self.rows += n
+        for i, b in enumerate(self._bounds):
+            if n <= b:
+                self._hist[i] += 1
+                break
+
+        task = asyncio.get_running_loop().create_task(self._run(rows, futs))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, rows: list[list[float]], futs: list[asyncio.Future]) -> None:
+        loop = asyncio.get_running_loop()
+        try:
+            scores, flags = await loop.run_in_executor(
+                None, self._score_fn, np.asarray(rows, dtype="float64")
+            )
+        except Exception as e:  # tüm bekleyenlere hatayı ilet
+            for f in futs:
+                if not f.done():
+                    f.set_exception(e)
+            return
+        for f, s, a in zip(futs, scores.tolist(), flags.tolist(), strict=True):
+            if not f.done():
+                f.set_result((s, a))
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "batches": self.batches,
+            "rows": self.rows,
+            "flush_full": self.flush_full,
+            "flush_timeout": self.flush_timeout,
+            # ortalama doluluk: ortalama batch boyu / max_batch
+            "mean_fill": (self.rows / self.batches / self.max_batch) if self.batches else 0.0,
+            "size_hist": {f"le_{b}": c for b, c in zip(self._bounds, self._hist, strict=True)},
+        }
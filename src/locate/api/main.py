@@ -1,16 +1,36 @@
 # src/locate/api/main.py
 from __future__ import annotations
 
+import asyncio
+import logging
 import os
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager, suppress
 from datetime import UTC, datetime
 from pathlib import Path
-from typing import Literal
+from time import perf_counter
+from typing import Literal, get_args
 
-from fastapi import FastAPI
-from pydantic import BaseModel, Field
+import numpy as np
+from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import PlainTextResponse, Response
+from pydantic import BaseModel, Field, ValidationError
 
 from ..core.config import Config, load_config
+from ..core.fences import Fence, MultiGeofence, fences_from_config
 from ..core.geofence import DebouncedGeofence, GeofenceParams
+from ..core.rules import rules_from_config
+from ..core.snapshot import Snapshotter, StateSnapshot
+from ..core.state import DeviceStateStore, SQLiteStateBackend, make_backend
+from ..ml.features import FEATURE_NAMES, OnlineFeatureState
+from ..ml.scorer import ModelScorer, load_scorer, resolve_model_path
+from ..utils.jsonfast import dumps as _dumps
+from .batcher import MicroBatcher
+from .metrics import Counter, Gauge, Histogram, Registry, RequestTimer, request_marks
+from .sinks import AlarmDispatcher, dispatcher_from_config
+from .stream import NDJSONStreamResponse, OrderedPipeline
+
+log = logging.getLogger(__name__)
 
 
 # -------------------- Pydantic şemaları --------------------
@@ -19,17 +39,22 @@ class DetectIn(BaseModel):
     timestamp: datetime
     lat: float
     lon: float
-    speed: float = Field(..., description="m/s")
+    speed: float = Field(..., description="m/s", allow_inf_nan=False)
+
+
+AlarmLabel = Literal["GEOFENCE_EXIT", "MODEL_ANOMALY", "SPEED_ANOMALY", "ROUTE_JUMP"]
 
 
 class Alarm(BaseModel):
     code: int
-    label: Literal["GEOFENCE_EXIT", "MODEL_ANOMALY", "SPEED_ANOMALY", "ROUTE_JUMP"]
+    label: AlarmLabel
     source: Literal["GEOFENCE", "MODEL", "RULE"]
     window_sec: int | None = None
     # MODEL durumunda faydalı alanlar (geofence için None bırakılır)
     score: float | None = None
     threshold: float | None = None
+    # çoklu alan (config.fences) çıkışında hangi alan
+    fence_id: str | None = None
 
 
 class DetectOutAlarm(BaseModel):
@@ -48,21 +73,134 @@ class DetectOutNormal(BaseModel):
     distance_m: float | None = None
 
 
+class DetectBatchIn(BaseModel):
+    points: list[DetectIn] = Field(..., min_length=1)
+    # True ise yalnız alarm üreten noktalar döner
+    only_alarms: bool = False
+
+
+class DetectBatchOut(BaseModel):
+    count: int
+    alarm_count: int
+    results: list[DetectOutAlarm | DetectOutNormal]
+
+
 # -------------------- Yardımcılar --------------------
+def _as_utc(dt: datetime) -> datetime:
+    """Naive datetime ise UTC varsayılır; aware ise UTC'ye çevrilir."""
+    if dt.tzinfo is None:
+        return dt.replace(tzinfo=UTC)
+    return dt.astimezone(UTC)
+
+
 def _to_iso8601_utc(dt: datetime) -> str:
     """
     Girdi datetime hangi timezone'da olursa olsun cevabı ISO 8601 UTC ('...Z') döndür.
-    Naive datetime ise UTC varsayılır.
+    Naive datetime ise UTC varsayılır. (strftime/astimezone yerine ofset çıkarma +
+    isoformat: her istekte çalıştığı için ucuz tutulur.)
     """
-    if dt.tzinfo is None:
-        dt = dt.replace(tzinfo=UTC)
-    else:
-        dt = dt.astimezone(UTC)
-    return dt.strftime("%Y-%m-%dT%H:%M:%SZ")
+    off = dt.utcoffset()
+    if off:
+        dt = dt - off
+    return dt.isoformat(timespec="seconds")[:19] + "Z"
+
+
+def _epoch_sec(dt: datetime) -> float:
+    """Olay zamanını epoch saniyeye çevir (naive -> UTC)."""
+    return _as_utc(dt).timestamp()
+
+
+# -------------------- Hızlı cevap yolu --------------------
+# Cevaplar şema modelleri (DetectOut*) kurulmadan doğrudan dict olarak üretilir ve tek
+# adımda JSON'a kodlanır; FastAPI'nin response_model ile yeniden doğrulama + jsonable_encoder
+# adımları atlanır. response_model'ler OpenAPI dokümantasyonu için yerinde kalır.
+# Alan sırası ve değerleri şema modellerinin model_dump() çıktısıyla aynıdır (§5.2).
+# Kodlama: locate.utils.jsonfast (orjson varsa).
+def _json(obj) -> Response:
+    return Response(content=_dumps(obj), media_type="application/json")
+
+
+_fence_alarms: dict[str, dict] = {}
+
+
+def _geofence_alarm(fence: Fence | None = None) -> dict:
+    # sabit payload: cihazdan bağımsız, bir kez üretilip paylaşılır (değiştirilmez)
+    if fence is None:
+        return _GEOFENCE_ALARM
+    alarm = _fence_alarms.get(fence.id)
+    if alarm is None:
+        alarm = _fence_alarms[fence.id] = Alarm(
+            code=1000,
+            label="GEOFENCE_EXIT",
+            source="GEOFENCE",
+            window_sec=fence.debounce_sec,
+            fence_id=fence.id,
+        ).model_dump()
+    return alarm
+
+
+def _rule_alarm(label: str | None) -> dict | None:
+    return None if label is None else _RULE_ALARMS[label]
+
+
+def _model_alarm(score: float) -> dict:
+    alarm = _MODEL_ALARM.copy()  # alan sırası korunur
+    alarm["score"] = score
+    return alarm
+
+
+def _build_response(inp: DetectIn, alarm: dict | None, distance_m: float) -> dict:
+    # Zamanı ISO8601 UTC stringe çevir (güvence)
+    ts_str = _to_iso8601_utc(inp.timestamp)
+
+    if alarm is not None:
+        # ---- Dokümantasyon 5.2 uyumlu alarm JSON ----
+        return {
+            "device_id": inp.device_id,
+            "timestamp": ts_str,
+            "location": {"lat": inp.lat, "lon": inp.lon},
+            "anomaly_reason": alarm["label"],
+            "alarm": alarm,
+        }
+
+    # Alarm yok → minimal ya da verbose normal çıktı
+    return {
+        "device_id": inp.device_id,
+        "timestamp": ts_str,
+        "anomaly": False,
+        "distance_m": distance_m if ALARM_VERBOSE else None,
+    }
 
 
 # -------------------- App & Config --------------------
-app = FastAPI(title="Locate – AI Anomali Tespit Modülü")
+async def _snapshot_loop(interval_sec: float) -> None:
+    # kopya event loop'ta (state ile aynı thread), disk yazımı/birleştirme thread havuzunda
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(interval_sec)
+        try:
+            await loop.run_in_executor(None, snapshotter.write, snapshotter.capture())
+        except Exception as e:
+            log.warning("State görüntüsü yazılamadı: %r", e)
+
+
+@asynccontextmanager
+async def _lifespan(app: FastAPI):
+    task = None
+    if snapshotter is not None:
+        task = asyncio.create_task(_snapshot_loop(cfg.state_snapshot_interval_sec))
+    yield
+    # kapanış: kuyrukta bekleyen alarmlar hedeflere, son state görüntüsü diske yazılır
+    if alarm_sink is not None:
+        await alarm_sink.close()
+    if task is not None:
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+        snapshotter.save()
+
+
+app = FastAPI(title="Locate – AI Anomali Tespit Modülü", lifespan=_lifespan)
 
 CFG_PATH = Path("configs/config.json")
 cfg: Config = load_config(CFG_PATH)
@@ -76,13 +214,226 @@ else:
     # config.api.alarm_verbose sahasıyla eşleşsin
     ALARM_VERBOSE = bool(cfg.api_alarm_verbose)
 
+# Geofence ve özellik state'i tek bir depoda (TTL/LRU tahliyeli).
+# config.state.backend = "memory" (süreç içi) | "sqlite" (çoklu uvicorn worker'ı arasında
+# paylaşımlı). Alternatif: süreç içi state + cihaz afinitesi (python -m locate.api.affinity).
+store = make_backend(
+    cfg.state_backend,
+    ttl_sec=cfg.state_ttl_sec,
+    max_devices=cfg.state_max_devices,
+    sqlite_path=cfg.state_sqlite_path,
+)
 gf = DebouncedGeofence(
     GeofenceParams(
         lat0=cfg.gf_lat0,
         lon0=cfg.gf_lon0,
         radius_m=cfg.gf_radius_m,
         debounce_sec=cfg.gf_debounce_sec,
+    ),
+    store=store,
+)
+
+# Yeniden başlatmada state kaybolmasın: periyodik görüntü + tembel geri yükleme
+# (config.state.snapshot_path; '{worker}' → GEOSENTINEL_WORKER, bkz. api.affinity; tek
+# süreçte "0"). Dizin süreç başına kilitlenir: afinite dışında aynı yolu paylaşan
+# worker'lar (uvicorn --workers) başlamaz. SQLite backend zaten kalıcıdır; görüntü yalnız
+# memory backend için.
+snapshotter: Snapshotter | None = None
+if cfg.state_snapshot_path and isinstance(store, DeviceStateStore):
+    _snap_dir = cfg.state_snapshot_path.replace("{worker}", os.getenv("GEOSENTINEL_WORKER", "0"))
+    snapshotter = Snapshotter(store, _snap_dir, full_every=cfg.state_snapshot_full_every)
+    store.attach_snapshot(
+        StateSnapshot(
+            _snap_dir,
+            ttl_sec=cfg.state_ttl_sec,
+            max_age_sec=cfg.state_snapshot_max_age_sec,
+            max_lag_sec=cfg.state_snapshot_max_lag_sec,
+        )
+    )
+# Pencereli ortalama tamponları (features.window_sec > 0) süreç içidir: SQLite ile
+# paylaşılan state'te aynı cihazın noktaları farklı worker'lara düşerse *_ma özellikleri
+# worker'a göre değişir. Bu yüzden yalnız cihaz afinitesiyle (GEOSENTINEL_WORKER) izinli.
+if (
+    isinstance(store, SQLiteStateBackend)
+    and cfg.feat_window_sec > 0
+    and not os.getenv("GEOSENTINEL_WORKER")
+):
+    raise ValueError(
+        "state.backend='sqlite' ile features.window_sec > 0 yalnız cihaz afinitesiyle "
+        "(python -m locate.api.affinity) kullanılabilir; window_sec=0 ya da afinite seçin"
+    )
+fs = OnlineFeatureState(cfg.gf_lat0, cfg.gf_lon0, store=store, window_sec=cfg.feat_window_sec)
+
+# Çoklu alan (depo/müşteri sahaları); config.fences.items boşsa devre dışı.
+# (cihaz, alan) state'i aynı depoda: TTL/LRU, SQLite ve snapshot kapsamında.
+mgf: MultiGeofence | None = None
+if cfg.fences:
+    mgf = MultiGeofence(
+        fences_from_config(cfg.fences, cfg.gf_debounce_sec),
+        cell_deg=cfg.fences_cell_deg,
+        store=store,
     )
+
+# Hız/ivme/sıçrama kuralları (config.filters); eşiklerin hepsi null ise devre dışı
+rules = rules_from_config(cfg.filters)
+
+# Model başlangıçta bir kez yüklenir (MODEL_PATH env > config.model.path).
+# Düz artefakt (.flat) yoksa yanındaki joblib paketi (isoforest.joblib) denenir;
+# ikisi de yoksa API yalnız geofence ile çalışır.
+MODEL_PATH = resolve_model_path(os.getenv("MODEL_PATH", cfg.model_path))
+scorer: ModelScorer | None = None
+if MODEL_PATH.exists():
+    scorer = load_scorer(MODEL_PATH)
+    if scorer.features != FEATURE_NAMES:
+        raise ValueError(
+            f"Model özellikleri online özelliklerle uyuşmuyor: {scorer.features} != {FEATURE_NAMES}"
+        )
+else:
+    log.warning("Model bulunamadı (%s); MODEL_ANOMALY devre dışı.", MODEL_PATH)
+
+# Eşzamanlı /detect isteklerinin skorlaması mikro-batch ile birleştirilir
+# (config.model.batch_max_size > 1 ise; aksi halde her istek doğrudan skorlanır).
+batcher: MicroBatcher | None = None
+if scorer is not None and cfg.model_batch_max_size > 1:
+    batcher = MicroBatcher(
+        scorer.score_many,
+        max_batch=cfg.model_batch_max_size,
+        max_wait_ms=cfg.model_batch_max_wait_ms,
+    )
+
+# Alarmların kalıcı hedeflere (JSONL/Parquet/SQLite/webhook) aktarımı (config.alarms);
+# istek alarmı kuyruğa bırakır, yazma arka planda batch'lerle yapılır. sinks boşsa None.
+alarm_sink: AlarmDispatcher | None = dispatcher_from_config(cfg.alarms)
+
+# Sabit alarm parçaları (config/model yüklendikten sonra bir kez)
+_GEOFENCE_ALARM = Alarm(
+    code=1000, label="GEOFENCE_EXIT", source="GEOFENCE", window_sec=cfg.gf_debounce_sec
+).model_dump()
+_MODEL_ALARM = Alarm(
+    code=1200,
+    label="MODEL_ANOMALY",
+    source="MODEL",
+    window_sec=cfg.feat_window_sec,
+    score=0.0,
+    threshold=None if scorer is None else scorer.threshold,
+).model_dump()
+_RULE_ALARMS = {
+    label: Alarm(code=code, label=label, source="RULE").model_dump()
+    for code, label in ((1100, "SPEED_ANOMALY"), (1101, "ROUTE_JUMP"))
+}
+
+
+# -------------------- Metrikler (/metrics, Prometheus metin formatı) --------------------
+# Süreç başınadır; çoklu worker'da her worker ayrı kazınır (scrape).
+metrics = Registry()
+STAGES = metrics.register(
+    Histogram(
+        "geosentinel_stage_seconds",
+        "Uç nokta aşama süreleri (validate/geofence/fences/features/rules/model/serialize)",
+        ("path", "stage"),
+    )
+)
+REQUESTS = metrics.register(
+    Histogram("geosentinel_request_seconds", "Uçtan uca istek süresi", ("path",))
+)
+RESPONSES = metrics.register(
+    Counter("geosentinel_responses_total", "Durum koduna göre yanıtlar", ("path", "status"))
+)
+POINTS = metrics.register(Counter("geosentinel_points_total", "İşlenen nokta sayısı", ("path",)))
+STREAMS = metrics.register(
+    Counter("geosentinel_stream_connections_total", "Açılan akış bağlantıları", ("path",))
+)
+ALARMS = metrics.register(Counter("geosentinel_alarms_total", "Etikete göre alarmlar", ("label",)))
+for _label in get_args(AlarmLabel):
+    ALARMS.inc(_label, n=0)
+
+
+def _state_metric(*keys: str):
+    # ilk bulunan anahtar (memory: memory_bytes, sqlite: disk_bytes)
+    def fn():
+        st = store.stats()
+        return {(st["backend"],): next((st[k] for k in keys if k in st), None)}
+
+    return fn
+
+
+metrics.register(
+    Gauge(
+        "geosentinel_state_devices",
+        "State deposundaki cihaz sayısı",
+        _state_metric("devices"),
+        ("backend",),
+    )
+)
+metrics.register(
+    Gauge(
+        "geosentinel_state_memory_bytes",
+        "State deposu bellek kullanımı (sqlite: dosya boyutu)",
+        _state_metric("memory_bytes", "disk_bytes"),
+        ("backend",),
+    )
+)
+metrics.register(
+    Gauge(
+        "geosentinel_state_evicted_total",
+        "TTL/LRU ile silinen cihazlar",
+        _state_metric("evicted"),
+        ("backend",),
+        kind="counter",
+    )
+)
+if batcher is not None:
+    for _key, _doc, _kind in (
+        ("batches", "Skorlanan mikro-batch sayısı", "counter"),
+        ("rows", "Mikro-batch ile skorlanan satırlar", "counter"),
+        ("flush_full", "Dolduğu için boşaltılan batch'ler", "counter"),
+        ("flush_timeout", "Süre dolduğu için boşaltılan batch'ler", "counter"),
+        ("mean_fill", "Ortalama batch doluluğu (0-1)", "gauge"),
+    ):
+        metrics.register(
+            Gauge(
+                f"geosentinel_batcher_{_key}" + ("_total" if _kind == "counter" else ""),
+                _doc,
+                lambda k=_key: {(): batcher.stats()[k]},
+                kind=_kind,
+            )
+        )
+
+if alarm_sink is not None:
+    for _key, _doc, _kind in (
+        ("queued", "Hedefe yazılmayı bekleyen alarmlar", "gauge"),
+        ("enqueued", "Alarm kuyruğuna alınan alarmlar", "counter"),
+        ("dropped", "Kuyruk dolu olduğu için atılan alarmlar", "counter"),
+        ("batches", "Hedeflere yazılan alarm batch'leri", "counter"),
+    ):
+        metrics.register(
+            Gauge(
+                f"geosentinel_alarm_sink_{_key}" + ("_total" if _kind == "counter" else ""),
+                _doc,
+                lambda k=_key: {(): alarm_sink.stats()[k]},
+                kind=_kind,
+            )
+        )
+    for _key, _doc in (
+        ("written", "Hedefe yazılan alarmlar"),
+        ("errors", "Hedef yazma hataları (batch)"),
+    ):
+        metrics.register(
+            Gauge(
+                f"geosentinel_alarm_sink_{_key}_total",
+                _doc,
+                lambda k=_key: {(s,): v for s, v in alarm_sink.stats()[k].items()},
+                ("sink",),
+                kind="counter",
+            )
+        )
+
+app.add_middleware(
+    RequestTimer,
+    paths=("/detect", "/detect/batch"),
+    requests=REQUESTS,
+    responses=RESPONSES,
+    stages=STAGES,
 )
 
 
@@ -99,49 +450,279 @@ def health():
             "radius_m": cfg.gf_radius_m,
             "debounce_sec": cfg.gf_debounce_sec,
         },
+        "fences": 0 if mgf is None else len(mgf.index.fences),
+        "rules": vars(rules.p) if rules.enabled else None,
+        "state": store.stats(),
+        "snapshot": None if snapshotter is None else snapshotter.stats(),
+        "alarm_sink": None if alarm_sink is None else alarm_sink.stats(),
+        "model": {
+            "loaded": scorer is not None,
+            "path": str(MODEL_PATH),
+            "threshold": None if scorer is None else scorer.threshold,
+            "batcher": None if batcher is None else batcher.stats(),
+        },
     }
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics_endpoint():
+    """Prometheus metin formatı (text/plain; version=0.0.4)."""
+    return PlainTextResponse(
+        metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+def _lap(t: float, path: str, stage: str) -> float:
+    now = perf_counter()
+    STAGES.observe(now - t, path, stage)
+    return now
+
+
+def _detect_state(inp: DetectIn, path: str) -> tuple[dict | None, dict | None, float, list[float]]:
+    """
+    Durumlu aşamalar: geofence + debounce, çoklu alan, online özellikler ve kurallar.
+    Cihaz state'ini günceller; aynı cihazın noktaları için geliş sırasıyla çağrılmalı.
+    Döner: (geofence alarmı, kural alarmı, merkez mesafesi, özellik vektörü); alarm yoksa
+    None. Kural alarmı yalnız model alarmı yoksa cevaba girer (MODEL_ANOMALY önceliklidir).
+    """
+    t = perf_counter()
+    # Geofence kontrolü; debounce olay zamanına göre (/detect/batch ve eval ile aynı
+    # 'outside_since' state'i paylaşılır, tek zaman tabanı)
+    ts = _as_utc(inp.timestamp)
+    now_ts = ts.timestamp()
+    triggered, distance_m = gf.check(inp.device_id, inp.lat, inp.lon, now_ts)
+    t = _lap(t, path, "geofence")
+    exited = []
+    if mgf is not None:
+        exited = mgf.check(inp.device_id, inp.lat, inp.lon, now_ts)[1]
+        t = _lap(t, path, "fences")
+
+    # Özellik state'i her noktada güncellenmeli (alarm olsa da)
+    feats, step_m, dt = fs.add_and_step(inp.device_id, ts, inp.lat, inp.lon, inp.speed)
+    t = _lap(t, path, "features")
+
+    alarm = rule = None
+    if triggered:
+        alarm = _geofence_alarm()
+    elif exited:
+        alarm = _geofence_alarm(exited[0])
+    elif rules.enabled:
+        rule = _rule_alarm(rules.check(feats[0], feats[1], step_m, dt))
+        _lap(t, path, "rules")
+    return alarm, rule, distance_m, feats
+
+
 @app.post("/detect", response_model=DetectOutAlarm | DetectOutNormal)
-def detect(inp: DetectIn):
+async def detect(inp: DetectIn):
     """
     Akış:
       1) Şema doğrulama (Pydantic)
-      2) Geofence + debounce
-      3) (ileride) ML model skoru
+      2) Geofence + debounce (olay zamanına göre: timestamp)
+      3) Online özellikler + hız/sıçrama kuralları (önceki noktaya göre)
+      4) ML model skoru (geofence alarmı yoksa)
+      Öncelik (§5.1): GEOFENCE_EXIT > MODEL_ANOMALY > SPEED_ANOMALY > ROUTE_JUMP
+    Aşama süreleri geosentinel_stage_seconds{path="/detect"} altında (/metrics).
     """
-    # Geofence kontrolü
-    triggered, distance_m = gf.check(inp.device_id, inp.lat, inp.lon)
+    marks = request_marks()
+    if marks is not None:
+        marks[1] = perf_counter()
 
-    # Zamanı ISO8601 UTC stringe çevir (güvence)
-    ts_str = _to_iso8601_utc(inp.timestamp)
+    alarm, rule, distance_m, feats = _detect_state(inp, "/detect")
+    if alarm is None and scorer is not None:
+        t = perf_counter()
+        if batcher is not None:
+            score, is_anomaly = await batcher.submit(feats)
+        else:
+            score, is_anomaly = scorer.score_one(feats)
+        _lap(t, "/detect", "model")
+        if is_anomaly:
+            alarm = _model_alarm(score)
+    if alarm is None:
+        alarm = rule
 
-    if triggered:
-        # ---- Dokümantasyon 5.2 uyumlu alarm JSON ----
-        return DetectOutAlarm(
-            device_id=inp.device_id,
-            timestamp=ts_str,
-            location={"lat": inp.lat, "lon": inp.lon},
-            anomaly_reason="GEOFENCE_EXIT",
-            alarm=Alarm(
-                code=1000,
-                label="GEOFENCE_EXIT",
-                source="GEOFENCE",
-                window_sec=cfg.gf_debounce_sec,
-            ),
-        )
+    POINTS.inc("/detect")
+    if alarm is not None:
+        ALARMS.inc(alarm["label"])
+    if marks is not None:
+        marks[2] = perf_counter()  # buradan sonrası 'serialize'
+    out = _build_response(inp, alarm, distance_m)
+    if alarm is not None and alarm_sink is not None:
+        await alarm_sink.put(out)  # yer varsa beklemeden döner; yazma arka planda
+    return _json(out)
 
-    # Alarm yok → minimal ya da verbose normal çıktı
-    if ALARM_VERBOSE:
-        return DetectOutNormal(
-            device_id=inp.device_id,
-            timestamp=ts_str,
-            anomaly=False,
-            distance_m=distance_m,
-        )
-    else:
-        return DetectOutNormal(
-            device_id=inp.device_id,
-            timestamp=ts_str,
-            anomaly=False,
-        )
+
+# -------------------- Akış (WebSocket / NDJSON) --------------------
+async def _stream_out(
+    inp: DetectIn, alarm: dict | None, distance_m: float, seq: int
+) -> bytes | None:
+    # yalnız alarmlar gönderilir: /detect alarm JSON'u (§5.2) + bağlantıdaki sıra no (seq)
+    if alarm is None:
+        return None
+    ALARMS.inc(alarm["label"])
+    out = _build_response(inp, alarm, distance_m)
+    if alarm_sink is not None:
+        await alarm_sink.put(out)  # kuyruktaki kayıt değiştirilmez; seq kopyaya eklenir
+    return _dumps({**out, "seq": seq})
+
+
+async def _stream_scored(
+    fut, inp: DetectIn, rule: dict | None, distance_m: float, seq: int
+) -> bytes | None:
+    score, is_anomaly = await fut
+    return await _stream_out(inp, _model_alarm(score) if is_anomaly else rule, distance_m, seq)
+
+
+async def _stream_records(lines: AsyncIterator[bytes], pipe: OrderedPipeline, path: str) -> None:
+    """
+    Bağlantıdan gelen kayıtları sırayla işler (seq: 0'dan başlayan kayıt numarası).
+    Durumlu aşama kayıt geldiği anda çalışır; model skoru mikro-batch'e bırakılıp
+    sonucu pipeline'da sırası gelince beklenir. Geçersiz kayıt için {"seq", "error"} döner,
+    akış sürer.
+    """
+    seq = -1
+    try:
+        async for line in lines:
+            seq += 1
+            try:
+                inp = DetectIn.model_validate_json(line)
+            except ValidationError as e:
+                err = e.errors(include_url=False, include_context=False, include_input=False)
+                await pipe.put(_dumps({"seq": seq, "error": err}))
+                continue
+            POINTS.inc(path)
+            alarm, rule, distance_m, feats = _detect_state(inp, path)
+            if alarm is None and scorer is not None:
+                if batcher is not None:
+                    fut = batcher.enqueue(feats)
+                    await pipe.put(_stream_scored(fut, inp, rule, distance_m, seq))
+                    continue
+                score, is_anomaly = scorer.score_one(feats)
+                if is_anomaly:
+                    alarm = _model_alarm(score)
+            if alarm is None:
+                alarm = rule
+            if alarm is not None:
+                await pipe.put(_stream_out(inp, alarm, distance_m, seq))
+    except ValueError as e:  # satır sınırı aşıldı; akış kapatılır
+        await pipe.put(_dumps({"seq": seq + 1, "error": str(e)}))
+
+
+@app.post("/detect/stream")
+async def detect_stream(request: Request):
+    """
+    Gövde: DetectIn kayıtları, satır başına bir JSON (NDJSON, chunked).
+    Cevap: yalnız alarmlar (ve hatalı kayıtlar), NDJSON olarak ve giriş sırasıyla;
+    gövde okunurken akar. Debounce /detect gibi olay zamanına göredir.
+    """
+    STREAMS.inc("/detect/stream")
+
+    async def handler(lines, pipe):
+        await _stream_records(lines, pipe, "/detect/stream")
+
+    return NDJSONStreamResponse(handler, max_pending=cfg.api_stream_max_pending)
+
+
+@app.websocket("/detect/ws")
+async def detect_ws(ws: WebSocket):
+    """
+    Mesaj: bir DetectIn JSON'u ya da satır başına bir kayıt (NDJSON). Sunucu yalnız
+    alarmları (ayrı metin mesajları, giriş sırasıyla) gönderir. Bekleyen çıktı
+    api.stream_max_pending'e ulaşınca yeni mesaj okunmaz (geri basınç).
+    """
+    await ws.accept()
+    STREAMS.inc("/detect/ws")
+
+    async def emit(data: bytes) -> None:
+        await ws.send_text(data.decode())
+
+    async def lines() -> AsyncIterator[bytes]:
+        while True:
+            msg = await ws.receive()
+            if msg["type"] == "websocket.disconnect":
+                return
+            data = msg.get("bytes") or msg.get("text", "").encode()
+            for ln in data.split(b"\n"):
+                if ln.strip():
+                    yield ln
+
+    pipe = OrderedPipeline(emit, cfg.api_stream_max_pending)
+    try:
+        await _stream_records(lines(), pipe, "/detect/ws")
+    except WebSocketDisconnect:
+        pass
+    finally:
+        # giriş yalnız istemci kapanınca biter; gönderilemeyecek çıktılar bırakılır
+        pipe.cancel()
+
+
+@app.post("/detect/batch", response_model=DetectBatchOut)
+async def detect_batch(inp: DetectBatchIn):
+    """
+    Tamponlanmış (buffered) noktaların toplu işlenmesi; farklı cihazlar karışık olabilir.
+      1) Tüm merkez mesafeleri tek NumPy geçişinde
+      2) Debounce, online özellikler ve kurallar cihaz bazında, olay zamanı sırasıyla
+      3) Geofence alarmı olmayan noktalar tek çağrıda model ile skorlanır; model alarmı
+         olmayanlara kural alarmı (SPEED_ANOMALY > ROUTE_JUMP) verilir
+      4) Sonuçlar giriş sırasıyla; only_alarms=True ise yalnız alarmlar
+
+    Debounce /detect gibi olay zamanına göre ölçülür (tamponlanmış noktalar aynı anda ulaşır).
+    /detect ile aynı event loop'ta çalışır; cihaz state'i tek thread'den güncellenir.
+    """
+    marks = request_marks()
+    if marks is not None:
+        marks[1] = perf_counter()
+    pts = inp.points
+    ts = [_epoch_sec(p.timestamp) for p in pts]
+    triggered, dist = gf.check_many(
+        [p.device_id for p in pts],
+        [p.lat for p in pts],
+        [p.lon for p in pts],
+        ts,
+    )
+    alarms: list[dict | None] = [_geofence_alarm() if t else None for t in triggered.tolist()]
+
+    rows: list[int] = []
+    feats: list[list[float]] = []
+    rule_hits: list[tuple[int, dict]] = []
+    for i in sorted(range(len(pts)), key=ts.__getitem__):
+        p = pts[i]
+        if mgf is not None:
+            exited = mgf.check(p.device_id, p.lat, p.lon, ts[i])[1]
+            if exited and alarms[i] is None:
+                alarms[i] = _geofence_alarm(exited[0])
+        f, step_m, dt = fs.add_and_step(p.device_id, _as_utc(p.timestamp), p.lat, p.lon, p.speed)
+        if alarms[i] is None:
+            rows.append(i)
+            feats.append(f)
+            rule = _rule_alarm(rules.check(f[0], f[1], step_m, dt)) if rules.enabled else None
+            if rule is not None:
+                rule_hits.append((i, rule))
+    if scorer is not None and rows:
+        t = perf_counter()
+        scores, is_anomaly = scorer.score_many(np.asarray(feats, dtype="float64"))
+        _lap(t, "/detect/batch", "model")
+        for i, sc, a in zip(rows, scores.tolist(), is_anomaly.tolist(), strict=True):
+            if a:
+                alarms[i] = _model_alarm(sc)
+    for i, rule in rule_hits:
+        if alarms[i] is None:
+            alarms[i] = rule
+
+    POINTS.inc("/detect/batch", n=len(pts))
+    for a in alarms:
+        if a is not None:
+            ALARMS.inc(a["label"])
+    if marks is not None:
+        marks[2] = perf_counter()
+
+    results = [
+        _build_response(p, a, d)
+        for p, a, d in zip(pts, alarms, dist.tolist(), strict=True)
+        if a is not None or not inp.only_alarms
+    ]
+    if alarm_sink is not None:
+        for r in results:
+            if "alarm" in r:
+                await alarm_sink.put(r)
+    alarm_count = sum(a is not None for a in alarms)
+    return _json({"count": len(pts), "alarm_count": alarm_count, "results": results})
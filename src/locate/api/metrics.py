@@ -0,0 +1,264 @@
+# src/locate/api/metrics.py
+"""
+Süreç içi, bağımlılıksız metrikler ve Prometheus metin formatı (text/plain; version=0.0.4).
+
+Kayıt maliyeti düşük tutulur (üretimde açık kalabilsin):
+  - Histogram.observe: sabit kova sınırlarında bisect + iki toplama (kilit yok; API
+    tek event loop thread'inde kaydeder).
+  - Kümülatif kova sayıları yalnız /metrics okunurken hesaplanır.
+  - Gauge değerleri (state, batcher) kayıt anında değil, okuma anında callback ile alınır.
+
+Aşama süreleri (geosentinel_stage_seconds{path, stage}):
+  - validate: istek gelişinden handler'ın başlamasına kadar (gövde okuma + JSON + Pydantic)
+  - geofence / fences / features / model: handler içinde ölçülür
+  - serialize: handler dönüşünden yanıt başlığının gönderilmesine kadar
+    (response_model doğrulaması + JSON kodlama)
+İlk ve son aşama RequestTimer (ASGI ara katmanı) ile handler'ın bıraktığı zaman
+damgalarından (request_marks) hesaplanır.
+"""
+
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from collections.abc import Callable, Iterable
+from contextvars import ContextVar
+from time import perf_counter
+from typing import Any
+
+__all__ = [
+    "LATENCY_BUCKETS",
+    "Counter",
+    "Gauge",
+    "Histogram",
+    "Registry",
+    "RequestTimer",
+    "request_marks",
+]
+
+# saniye; 50 µs .. 1 s
+LATENCY_BUCKETS = (
+    0.00005,
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+)
+
+Labels = tuple[str, ...]
+
+
+def _fmt(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+
+def _esc(v: str) -> str:
+    return v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Iterable[str], values: Iterable[str], extra: str = "") -> str:
+    parts = [f'{k}="{_esc(str(v))}"' for k, v in zip(names, values, strict=True)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _Metric(ABC):
+    kind = "untyped"
+
+    def __init__(self, name: str, doc: str, labelnames: Labels = ()):
+        self.name = name
+        self.doc = doc
+        self.labelnames = tuple(labelnames)
+
+    def _header(self) -> list[str]:
+        return [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} {self.kind}"]
+
+    @abstractmethod
+    def render(self) -> list[str]:
+        """Prometheus metin satırları (HELP/TYPE başlığı dahil)."""
+
+
+class Counter(_Metric):
+    """Etiket değerleri başına artan sayaç."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, doc: str, labelnames: Labels = ()):
+        super().__init__(name, doc, labelnames)
+        self._values: dict[Labels, float] = {}
+
+    def inc(self, *labels: str, n: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + n
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0)
+
+    def render(self) -> list[str]:
+        out = self._header()
+        for lv, v in sorted(self._values.items()):
+            out.append(f"{self.name}{_labels(self.labelnames, lv)} {_fmt(v)}")
+        return out
+
+
+class Histogram(_Metric):
+    """
+    Sabit kovalı histogram. Kova başına (kümülatif olmayan) sayı tutulur; son kova +Inf.
+    observe O(log kova) ve bellek etiket kümesi başına O(kova).
+    """
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        doc: str,
+        labelnames: Labels = (),
+        buckets: Iterable[float] = LATENCY_BUCKETS,
+    ):
+        super().__init__(name, doc, labelnames)
+        self.buckets = tuple(sorted(float(b) for b in buckets))
+        # etiketler -> [kova sayıları (+Inf dahil), toplam]
+        self._series: dict[Labels, list] = {}
+
+    def _get(self, labels: Labels) -> list:
+        s = self._series.get(labels)
+        if s is None:
+            s = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        return s
+
+    def observe(self, value: float, *labels: str) -> None:
+        s = self._series.get(labels) or self._get(labels)
+        s[0][bisect_left(self.buckets, value)] += 1
+        s[1] += value
+
+    def snapshot(self, *labels: str) -> tuple[list[int], float]:
+        """(kümülatif kova sayıları, toplam); son eleman toplam gözlem sayısıdır."""
+        counts, total = self._series.get(labels, [[0] * (len(self.buckets) + 1), 0.0])
+        cum, acc = [], 0
+        for c in counts:
+            acc += c
+            cum.append(acc)
+        return cum, total
+
+    def render(self) -> list[str]:
+        out = self._header()
+        bounds = (*self.buckets, float("inf"))
+        for lv in sorted(self._series):
+            cum, total = self.snapshot(*lv)
+            for b, c in zip(bounds, cum, strict=True):
+                le = f'le="{_fmt(b)}"'
+                out.append(f"{self.name}_bucket{_labels(self.labelnames, lv, le)} {c}")
+            out.append(f"{self.name}_sum{_labels(self.labelnames, lv)} {_fmt(total)}")
+            out.append(f"{self.name}_count{_labels(self.labelnames, lv)} {cum[-1]}")
+        return out
+
+
+class Gauge(_Metric):
+    """
+    Değeri okuma anında callback'ten alınan gösterge: fn() -> {etiketler: değer}.
+    Başka bir bileşenin tuttuğu sayaçlar için kind="counter" verilir.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        doc: str,
+        fn: Callable[[], dict[Labels, float | None]],
+        labelnames: Labels = (),
+        kind: str = "gauge",
+    ):
+        super().__init__(name, doc, labelnames)
+        self._fn = fn
+        self.kind = kind
+
+    def render(self) -> list[str]:
+        out = self._header()
+        for lv, v in sorted(self._fn().items()):
+            if v is not None:
+                out.append(f"{self.name}{_labels(self.labelnames, lv)} {_fmt(v)}")
+        return out
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> Any:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metrik zaten kayıtlı: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines: list[str] = []
+        for m in self._metrics.values():
+            lines.extend(m.render())
+        return "\n".join(lines) + "\n"
+
+
+# İstek başına zaman damgaları: [istek başı, handler başı, handler sonu] (perf_counter)
+_MARKS: ContextVar[list[float] | None] = ContextVar("geosentinel_request_marks", default=None)
+
+
+def request_marks() -> list[float] | None:
+    """RequestTimer altındaki isteklerde zaman damgası listesi; aksi halde None."""
+    return _MARKS.get()
+
+
+class RequestTimer:
+    """
+    Saf ASGI ara katmanı (BaseHTTPMiddleware'in görev/kuyruk maliyeti yok).
+    Verilen yollar için istek süresini, durum kodu sayacını ve handler'ın işaretlediği
+    zaman damgalarından 'validate' / 'serialize' aşamalarını kaydeder.
+    """
+
+    def __init__(
+        self,
+        app,
+        paths: Iterable[str],
+        requests: Histogram,
+        responses: Counter,
+        stages: Histogram,
+    ):
+        self.app = app
+        self.paths = frozenset(paths)
+        self.requests = requests
+        self.responses = responses
+        self.stages = stages
+
+    async def __call__(self, scope, receive, send):
+        path = scope.get("path")
+        if scope["type"] != "http" or path not in self.paths:
+            await self.app(scope, receive, send)
+            return
+        marks = [perf_counter(), 0.0, 0.0]
+        token = _MARKS.set(marks)
+        status = [500]
+
+        async def _send(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+                if marks[2]:
+                    self.stages.observe(perf_counter() - marks[2], path, "serialize")
+            await send(message)
+
+        try:
+            await self.app(scope, receive, _send)
+        finally:
+            _MARKS.reset(token)
+            if marks[1]:
+                self.stages.observe(marks[1] - marks[0], path, "validate")
+            self.requests.observe(perf_counter() - marks[0], path)
+            self.responses.inc(path, str(status[0]))
@@ -0,0 +1,403 @@
+# src/locate/api/sinks.py
+"""
+Alarm dağıtımı: /detect uçları alarmları bellek içi, sınırlı bir kuyruğa bırakır; arka plan
+görevi bunları batch'ler halinde yerel hedeflere (sink) yazar. Yazma tek bir yardımcı
+thread'de yapılır; istek yolu I/O beklemez.
+
+Hedefler (config.alarms.sinks, liste; her öğe {"type": ..., ...}):
+  - jsonl   : {"path"} satır başına bir alarm JSON'u (§5.2), yalnız sona ekleme
+  - parquet : {"path"} dizin; süreç başına bir parça dosyası, batch başına bir row group
+  - sqlite  : {"path"} 'alarms' tablosu (WAL; worker'lar aynı dosyayı paylaşabilir)
+  - webhook : {"url", "timeout_sec"} batch başına JSON dizisi POST (yerel alıcı / stand-in)
+Dosya yollarında '{pid}' süreç numarasıyla değiştirilir (çoklu uvicorn worker'ı).
+
+Kuyruk dolunca politika (config.alarms.policy):
+  - drop_oldest: en eski bekleyen alarm atılır (varsayılan; en yeni alarmlar korunur)
+  - drop_new   : yeni alarm atılır
+  - block      : istek kuyrukta yer açılana kadar bekler (geri basınç; kayıp yok)
+Hedef hatası loglanır ve sayılır; o hedef için batch tekrar denenmez. Kapanışta
+(uygulama lifespan'i) kuyrukta kalanlar yazılıp hedefler kapatılır.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import sqlite3
+import urllib.request
+from abc import ABC, abstractmethod
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import UTC, datetime
+from pathlib import Path
+from typing import Any
+
+from ..utils.jsonfast import dumps as _dumps
+
+__all__ = [
+    "POLICIES",
+    "AlarmDispatcher",
+    "AlarmSink",
+    "JSONLSink",
+    "ParquetSink",
+    "SQLiteSink",
+    "WebhookSink",
+    "dispatcher_from_config",
+    "make_sink",
+]
+
+log = logging.getLogger(__name__)
+
+POLICIES = ("drop_oldest", "drop_new", "block")
+
+
+def _path(p: str | Path) -> Path:
+    return Path(str(p).replace("{pid}", str(os.getpid())))
+
+
+def _flat(rec: dict) -> dict[str, Any]:
+    """§5.2 alarm JSON'u → düz satır (Parquet/SQLite kolonları)."""
+    a, loc = rec["alarm"], rec["location"]
+    return {
+        "device_id": rec["device_id"],
+        "timestamp": rec["timestamp"],
+        "lat": loc["lat"],
+        "lon": loc["lon"],
+        "label": a["label"],
+        "code": a["code"],
+        "source": a["source"],
+        "window_sec": a.get("window_sec"),
+        "score": a.get("score"),
+        "threshold": a.get("threshold"),
+        "fence_id": a.get("fence_id"),
+    }
+
+
+class AlarmSink(ABC):
+    """Alarm hedefi. write/close dağıtıcının yazma thread'inde, sırayla çağrılır."""
+
+    name = "sink"
+
+    @abstractmethod
+    def write(self, batch: list[dict]) -> None:
+        """Alarm batch'ini (§5.2 JSON dict'leri) yazar; hata durumunda exception fırlatır."""
+
+    def close(self) -> None:  # noqa: B027
+        """Açık kaynakları bırakır."""
+
+
+class JSONLSink(AlarmSink):
+    name = "jsonl"
+
+    def __init__(self, path: str | Path):
+        self.path = _path(path)
+        self._f = None
+
+    def write(self, batch: list[dict]) -> None:
+        if self._f is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._f = self.path.open("ab")
+        # batch tek write: O_APPEND ile satırlar başka süreçlerinkiyle karışmaz
+        self._f.write(b"".join(_dumps(r) + b"\n" for r in batch))
+        self._f.flush()
+
+    def close(self) -> None:
+        if self._f is not None:
+            self._f.close()
+            self._f = None
+
+
+class ParquetSink(AlarmSink):
+    name = "parquet"
+
+    def __init__(self, path: str | Path):
+        self.dir = _path(path)
+        self.path: Path | None = None
+        self._w = None
+
+    def write(self, batch: list[dict]) -> None:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        table = pa.Table.from_pylist([_flat(r) for r in batch], schema=_parquet_schema())
+        if self._w is None:
+            # Parquet dosyasına sonradan eklenemez: süreç/başlangıç başına yeni parça
+            self.dir.mkdir(parents=True, exist_ok=True)
+            stamp = datetime.now(UTC).strftime("%Y%m%dT%H%M%S")
+            self.path = self.dir / f"part-{stamp}-{os.getpid()}.parquet"
+            self._w = pq.ParquetWriter(self.path, table.schema)
+        self._w.write_table(table)
+
+    def close(self) -> None:
+        if self._w is not None:
+            self._w.close()  # footer yazılmadan dosya okunamaz
+            self._w = None
+
+
+def _parquet_schema():
+    import pyarrow as pa
+
+    return pa.schema(
+        [
+            ("device_id", pa.string()),
+            ("timestamp", pa.string()),
+            ("lat", pa.float64()),
+            ("lon", pa.float64()),
+            ("label", pa.string()),
+            ("code", pa.int32()),
+            ("source", pa.string()),
+            ("window_sec", pa.int32()),
+            ("score", pa.float64()),
+            ("threshold", pa.float64()),
+            ("fence_id", pa.string()),
+        ]
+    )
+
+
+class SQLiteSink(AlarmSink):
+    name = "sqlite"
+
+    _COLS = (
+        "device_id",
+        "timestamp",
+        "lat",
+        "lon",
+        "label",
+        "code",
+        "source",
+        "window_sec",
+        "score",
+        "threshold",
+        "fence_id",
+    )
+
+    def __init__(self, path: str | Path):
+        self.path = _path(path)
+        self._conn: sqlite3.Connection | None = None
+        self._sql = (
+            f"INSERT INTO alarms ({', '.join(self._COLS)}) "
+            f"VALUES ({', '.join('?' * len(self._COLS))})"
+        )
+
+    def _db(self) -> sqlite3.Connection:
+        # bağlantı yazma thread'inde açılır ve yalnız orada kullanılır
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS alarms (id INTEGER PRIMARY KEY, device_id TEXT, "
+                "timestamp TEXT, lat REAL, lon REAL, label TEXT, code INTEGER, source TEXT, "
+                "window_sec INTEGER, score REAL, threshold REAL, fence_id TEXT)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS alarms_device_ts ON alarms(device_id, timestamp)"
+            )
+            self._conn = conn
+        return self._conn
+
+    def write(self, batch: list[dict]) -> None:
+        db = self._db()
+        rows = [tuple(f[c] for c in self._COLS) for f in map(_flat, batch)]
+        db.execute("BEGIN")
+        try:
+            db.executemany(self._sql, rows)
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+class WebhookSink(AlarmSink):
+    name = "webhook"
+
+    def __init__(self, url: str, timeout_sec: float = 2.0):
+        self.url = url
+        self.timeout_sec = float(timeout_sec)
+
+    def write(self, batch: list[dict]) -> None:
+        req = urllib.request.Request(
+            self.url,
+            data=_dumps(batch),
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        # 2xx dışı HTTPError fırlatır
+        with urllib.request.urlopen(req, timeout=self.timeout_sec) as resp:
+            resp.read()
+
+
+def make_sink(spec: dict[str, Any]) -> AlarmSink:
+    """config.alarms.sinks öğesi → hedef."""
+    kind = spec.get("type")
+    if kind == "jsonl":
+        return JSONLSink(spec.get("path", "out/alarms/alarms-{pid}.jsonl"))
+    if kind == "parquet":
+        return ParquetSink(spec.get("path", "out/alarms/parquet"))
+    if kind == "sqlite":
+        return SQLiteSink(spec.get("path", "data/alarms/alarms.sqlite"))
+    if kind == "webhook":
+        if not spec.get("url"):
+            raise ValueError("webhook alarm hedefi için 'url' gerekli")
+        return WebhookSink(spec["url"], spec.get("timeout_sec", 2.0))
+    raise ValueError(f"Bilinmeyen alarm hedefi: {kind}")
+
+
+class AlarmDispatcher:
+    """
+    Sınırlı kuyruk + arka plan yazıcı görevi.
+
+    - put() kuyrukta yer varsa beklemeden döner (event loop'u askıya almaz).
+    - Yazıcı, kuyruk max_batch'e ulaşınca hemen, aksi halde en geç flush_ms'de bir
+      batch alır ve hedeflere tek thread'lik havuzda sırayla yazar (batch sırası korunur).
+    - close() kuyruğu boşaltır, hedefleri kapatır; sonrasında gelen alarmlar atılır.
+    """
+
+    def __init__(
+        self,
+        sinks: list[AlarmSink],
+        max_queue: int = 10000,
+        max_batch: int = 256,
+        flush_ms: float = 200.0,
+        policy: str = "drop_oldest",
+    ):
+        if policy not in POLICIES:
+            raise ValueError(f"Bilinmeyen alarm kuyruğu politikası: {policy} ({POLICIES})")
+        if not float(flush_ms) > 0:
+            # 0 → wait_for(..., 0) hemen döner ve yazıcı görevi boş döngüye girer
+            raise ValueError(f"alarms.flush_ms pozitif olmalı: {flush_ms}")
+        self.sinks = list(sinks)
+        self.max_queue = max(1, int(max_queue))
+        self.max_batch = max(1, int(max_batch))
+        self.flush_wait = float(flush_ms) / 1000.0
+        self.policy = policy
+        self._q: deque[dict] = deque()
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="alarm-sink")
+        self._task: asyncio.Task | None = None
+        self._kick = asyncio.Event()  # batch doldu / kapanış
+        self._space = asyncio.Event()  # block politikası: kuyrukta yer açıldı
+        self._closed = False
+        # metrikler
+        self.enqueued = 0
+        self.dropped = 0
+        self.batches = 0
+        # hedef başına sayaçlar; aynı türden birden çok hedef: jsonl, jsonl_1, ...
+        names = [s.name for s in self.sinks]
+        self._keys = [
+            n if names[:i].count(n) == 0 else f"{n}_{names[:i].count(n)}"
+            for i, n in enumerate(names)
+        ]
+        self.written = dict.fromkeys(self._keys, 0)
+        self.errors = dict.fromkeys(self._keys, 0)
+
+    def start(self) -> None:
+        """Yazıcı görevini çalışan event loop'ta başlatır (ilk put'ta kendiliğinden)."""
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def put(self, rec: dict) -> None:
+        """Alarmı kuyruğa ekler; rec bundan sonra değiştirilmemelidir."""
+        if self._closed:
+            self.dropped += 1
+            return
+        if self._task is None:
+            self.start()
+        while len(self._q) >= self.max_queue:
+            if self.policy == "drop_new":
+                self.dropped += 1
+                return
+            if self.policy == "drop_oldest":
+                self._q.popleft()
+                self.dropped += 1
+                break
+            self._space.clear()
+            self._kick.set()
+            await self._space.wait()
+            if self._closed:
+                self.dropped += 1
+                return
+        self._q.append(rec)
+        self.enqueued += 1
+        if len(self._q) >= self.max_batch:
+            self._kick.set()
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while self._q or not self._closed:
+            if len(self._q) < self.max_batch and not self._closed:
+                self._kick.clear()
+                try:
+                    await asyncio.wait_for(self._kick.wait(), self.flush_wait)
+                except TimeoutError:
+                    pass
+            if not self._q:
+                continue
+            batch = [self._q.popleft() for _ in range(min(self.max_batch, len(self._q)))]
+            self._space.set()
+            self.batches += 1
+            await loop.run_in_executor(self._pool, self._write, batch)
+
+    def _write(self, batch: list[dict]) -> None:
+        for key, s in zip(self._keys, self.sinks, strict=True):
+            try:
+                s.write(batch)
+                self.written[key] += len(batch)
+            except Exception as e:
+                self.errors[key] += 1
+                log.warning("Alarm hedefi yazılamadı (%s, %d alarm): %r", key, len(batch), e)
+
+    def _close_sinks(self) -> None:
+        for s in self.sinks:
+            try:
+                s.close()
+            except Exception:
+                log.exception("Alarm hedefi kapatılamadı (%s)", s.name)
+
+    async def close(self) -> None:
+        """Bekleyen alarmları yazar ve hedefleri kapatır (uygulama kapanışında)."""
+        if self._closed:
+            return
+        self._closed = True
+        self._kick.set()
+        self._space.set()
+        if self._task is not None:
+            await self._task
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._pool, self._close_sinks)
+        self._pool.shutdown(wait=True)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "sinks": list(self._keys),
+            "policy": self.policy,
+            "max_queue": self.max_queue,
+            "max_batch": self.max_batch,
+            "flush_ms": self.flush_wait * 1000.0,
+            "queued": len(self._q),
+            "enqueued": self.enqueued,
+            "dropped": self.dropped,
+            "batches": self.batches,
+            "written": dict(self.written),
+            "errors": dict(self.errors),
+        }
+
+
+def dispatcher_from_config(alarms: dict[str, Any]) -> AlarmDispatcher | None:
+    """config.alarms bölümünden dağıtıcı; hedef yoksa None (devre dışı)."""
+    specs = list(alarms.get("sinks", []))
+    if not specs:
+        return None
+    return AlarmDispatcher(
+        [make_sink(s) for s in specs],
+        max_queue=int(alarms.get("max_queue", 10000)),
+        max_batch=int(alarms.get("max_batch", 256)),
+        flush_ms=float(alarms.get("flush_ms", 200.0)),
+        policy=str(alarms.get("policy", "drop_oldest")),
+    )
@@ -0,0 +1,126 @@
+# src/locate/api/stream.py
+"""
+Uzun ömürlü bağlantılar (WebSocket / NDJSON) için bağlantı başına sıralı işleme hattı.
+
+- Okuyucu (bağlantının receive döngüsü) her kaydı geldiği sırayla durumlu aşamadan
+  (geofence + özellikler) geçirir ve sonucu OrderedPipeline'a koyar. Sonuç hazır bir
+  çıktı (bytes / None) ya da model skorunu bekleyen bir awaitable olabilir; böylece aynı
+  bağlantının ardışık noktaları mikro-batch'te birlikte skorlanır.
+- Yazıcı görev kuyruğu FIFO boşaltır: çıktılar girişle aynı sırada gönderilir.
+- Geri basınç: kuyruk max_pending ile sınırlıdır. Yazıcı (istemci okumuyor / ağ yavaş)
+  geride kalırsa put() bekler, okuyucu yeni mesaj almaz ve TCP akış kontrolü devreye girer.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import AsyncIterator, Awaitable, Callable
+from inspect import isawaitable
+
+from starlette.responses import Response
+
+__all__ = ["OrderedPipeline", "NDJSONStreamResponse", "iter_lines"]
+
+Output = bytes | None
+Emit = Callable[[bytes], Awaitable[None]]
+
+_END = object()
+
+
+class OrderedPipeline:
+    """Sınırlı, sıra korumalı çıktı kuyruğu + tek yazıcı görevi."""
+
+    def __init__(self, emit: Emit, max_pending: int = 1024):
+        self._emit = emit
+        self._q: asyncio.Queue = asyncio.Queue(max(1, int(max_pending)))
+        self._task = asyncio.get_running_loop().create_task(self._drain())
+
+    async def put(self, item: Output | Awaitable[Output]) -> None:
+        if self._task.done():
+            # yazıcı durdu (istemci koptu / gönderim hatası): hatayı okuyucuya taşı
+            self._task.result()
+            raise RuntimeError("Akış yazıcısı kapandı")
+        await self._q.put(item)
+
+    async def close(self) -> None:
+        """Bekleyen tüm çıktılar gönderildikten sonra döner."""
+        if not self._task.done():
+            await self._q.put(_END)
+        await self._task
+
+    def cancel(self) -> None:
+        self._task.cancel()
+
+    async def _drain(self) -> None:
+        while True:
+            item = await self._q.get()
+            if item is _END:
+                return
+            if isawaitable(item):
+                item = await item
+            if item is not None:
+                await self._emit(item)
+
+
+async def iter_lines(chunks: AsyncIterator[bytes], max_line: int = 1 << 20) -> AsyncIterator[bytes]:
+    """Parça parça gelen gövdeyi NDJSON satırlarına böler (boş satırlar atlanır)."""
+    buf = b""
+    async for chunk in chunks:
+        buf += chunk
+        if b"\n" in chunk:
+            *lines, buf = buf.split(b"\n")
+            for ln in lines:
+                if len(ln) > max_line:
+                    raise ValueError(f"Satır çok uzun (> {max_line} bayt)")
+                if ln.strip():
+                    yield ln
+        # tamamlanmamış son satır da sınırlı (parça bir satırı bitirip uzun bir satıra başlayabilir)
+        if len(buf) > max_line:
+            raise ValueError(f"Satır çok uzun (> {max_line} bayt)")
+    if buf.strip():
+        yield buf
+
+
+Handler = Callable[[AsyncIterator[bytes], OrderedPipeline], Awaitable[None]]
+
+
+class NDJSONStreamResponse(Response):
+    """
+    Tam çift yönlü (full-duplex) NDJSON akışı: istek gövdesi okunurken cevap satırları
+    gönderilir. Starlette'in StreamingResponse'u gövdeyi disconnect dinlemek için tükettiği
+    için ASGI düzeyinde yazılmıştır. handler(satırlar, pipeline) kayıtları işler.
+    """
+
+    media_type = "application/x-ndjson"
+
+    def __init__(self, handler: Handler, max_pending: int = 1024):
+        # Response.__init__ boş gövde için content-length: 0 ekler; akışta başlık yok
+        self.status_code = 200
+        self.background = None
+        self.raw_headers = [(b"content-type", self.media_type.encode())]
+        self._handler = handler
+        self._max_pending = max_pending
+
+    async def __call__(self, scope, receive, send) -> None:
+        await send({"type": "http.response.start", "status": 200, "headers": self.raw_headers})
+
+        async def emit(data: bytes) -> None:
+            await send({"type": "http.response.body", "body": data + b"\n", "more_body": True})
+
+        async def body() -> AsyncIterator[bytes]:
+            while True:
+                msg = await receive()
+                if msg["type"] == "http.disconnect":
+                    return
+                yield msg.get("body", b"")
+                if not msg.get("more_body", False):
+                    return
+
+        pipe = OrderedPipeline(emit, self._max_pending)
+        try:
+            await self._handler(iter_lines(body()), pipe)
+            await pipe.close()
+        except BaseException:
+            pipe.cancel()
+            raise
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
@@ -8,12 +8,46 @@ from typing import Any
 class Config:
     def __init__(self, d: dict[str, Any]):
         self.raw = d
-        self.api_alarm_verbose = bool(d.get("api", {}).get("alarm_verbose", True))
+        api = d.get("api", {})
+        self.api_alarm_verbose = bool(api.get("alarm_verbose", True))
+        # akış bağlantısı (WebSocket/NDJSON) başına gönderilmeyi bekleyen en fazla çıktı
+        self.api_stream_max_pending = int(api.get("stream_max_pending", 1024))
         g = d.get("geofence", {})
         self.gf_lat0 = float(g.get("lat0", 0.0))
         self.gf_lon0 = float(g.get("lon0", 0.0))
         self.gf_radius_m = float(g.get("radius_m", 500.0))
         self.gf_debounce_sec = int(g.get("debounce_sec", 10))
+        st = d.get("state", {})
+        self.state_backend = str(st.get("backend", "memory"))
+        self.state_sqlite_path = str(st.get("sqlite_path", "data/state/devices.sqlite"))
+        ttl = st.get("ttl_sec")
+        self.state_ttl_sec = None if ttl is None else float(ttl)
+        cap = st.get("max_devices")
+        self.state_max_devices = None if cap is None else int(cap)
+        # periyodik state görüntüsü (locate.core.snapshot; yalnız memory backend); null → kapalı
+        snap = st.get("snapshot_path")
+        self.state_snapshot_path = None if snap is None else str(snap)
+        self.state_snapshot_interval_sec = float(st.get("snapshot_interval_sec", 30.0))
+        self.state_snapshot_full_every = int(st.get("snapshot_full_every", 10))
+        age = st.get("snapshot_max_age_sec", 3600)
+        self.state_snapshot_max_age_sec = None if age is None else float(age)
+        lag = st.get("snapshot_max_lag_sec")
+        self.state_snapshot_max_lag_sec = None if lag is None else float(lag)
+        fc = d.get("fences", {})
+        self.fences: list[dict[str, Any]] = list(fc.get("items", []))
+        cell = fc.get("cell_deg")
+        self.fences_cell_deg = None if cell is None else float(cell)
+        # hız/ivme/sıçrama kuralları (locate.core.rules); prepare hız filtresiyle ortak
+        self.filters: dict[str, Any] = dict(d.get("filters", {}))
+        # alarm hedefleri ve kuyruk ayarları (locate.api.sinks); sinks boşsa devre dışı
+        self.alarms: dict[str, Any] = dict(d.get("alarms", {}))
+        f = d.get("features", {})
+        self.feat_window_sec = int(f.get("window_sec", 0))
+        m = d.get("model", {})
+        # dizin: düz mmap artefaktı (train_isoforest.py yazar); dosya: joblib paketi
+        self.model_path = str(m.get("path", "models/isoforest.flat"))
+        self.model_batch_max_size = int(m.get("batch_max_size", 1))
+        self.model_batch_max_wait_ms = float(m.get("batch_max_wait_ms", 2.0))
 
 
 def load_config(path: str | Path) -> Config:
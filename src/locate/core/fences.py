@@ -0,0 +1,200 @@
+# src/locate/core/fences.py
+from __future__ import annotations
+
+import math
+from collections.abc import Iterable, Sequence
+from dataclasses import dataclass, field
+from math import cos, degrees, floor, radians
+from statistics import median
+from time import time
+from typing import Any
+
+from ..utils.geo import R_EARTH_M, haversine_m
+from .state import DeviceStateStore, StateBackend
+
+__all__ = [
+    "CircleFence",
+    "PolygonFence",
+    "Fence",
+    "FenceIndex",
+    "MultiGeofence",
+    "fences_from_config",
+]
+
+
+@dataclass
+class CircleFence:
+    id: str
+    lat: float
+    lon: float
+    radius_m: float
+    debounce_sec: int = 10
+
+    def bbox(self) -> tuple[float, float, float, float]:
+        """(lat_min, lat_max, lon_min, lon_max) derece."""
+        dlat = degrees(self.radius_m / R_EARTH_M)
+        lat_min, lat_max = self.lat - dlat, self.lat + dlat
+        # boylam payı, kutba en yakın enlemde en geniş
+        c = max(cos(radians(min(89.9, max(abs(lat_min), abs(lat_max))))), 1e-6)
+        dlon = dlat / c
+        return (lat_min, lat_max, self.lon - dlon, self.lon + dlon)
+
+    def contains(self, lat: float, lon: float) -> bool:
+        # DebouncedGeofence ile aynı kural: distance > radius_m ise dışarıda
+        return haversine_m(self.lat, self.lon, lat, lon) <= self.radius_m
+
+
+@dataclass
+class PolygonFence:
+    """
+    Çokgen alan; points: [(lat, lon), ...] (kapanış noktası tekrarlanmak zorunda değil).
+    İçerde/dışarıda testi ilk köşe etrafında yerel eşdikdörtgen projeksiyonda
+    ışın atma (ray casting) ile yapılır.
+    """
+
+    id: str
+    points: Sequence[tuple[float, float]]
+    debounce_sec: int = 10
+    _xy: list[tuple[float, float]] = field(init=False, repr=False)
+    _ref: tuple[float, float, float] = field(init=False, repr=False)
+
+    def __post_init__(self):
+        if len(self.points) < 3:
+            raise ValueError(f"Çokgen en az 3 köşe içermeli: {self.id}")
+        lat_ref, lon_ref = self.points[0]
+        k = cos(radians(lat_ref))
+        self._ref = (lat_ref, lon_ref, k)
+        self._xy = [((lo - lon_ref) * k, la - lat_ref) for la, lo in self.points]
+
+    def bbox(self) -> tuple[float, float, float, float]:
+        lats = [p[0] for p in self.points]
+        lons = [p[1] for p in self.points]
+        return (min(lats), max(lats), min(lons), max(lons))
+
+    def contains(self, lat: float, lon: float) -> bool:
+        lat_ref, lon_ref, k = self._ref
+        x, y = (lon - lon_ref) * k, lat - lat_ref
+        inside = False
+        xy = self._xy
+        xj, yj = xy[-1]
+        for xi, yi in xy:
+            if (yi > y) != (yj > y) and x < (xj - xi) * (y - yi) / (yj - yi) + xi:
+                inside = not inside
+            xj, yj = xi, yi
+        return inside
+
+
+Fence = CircleFence | PolygonFence
+
+
+def fences_from_config(items: Iterable[dict[str, Any]], debounce_sec: int = 10) -> list[Fence]:
+    """
+    config.json 'fences' listesini okur:
+      {"id": "depo-01", "type": "circle", "lat": .., "lon": .., "radius_m": .., "debounce_sec": 10}
+      {"id": "saha-07", "type": "polygon", "points": [[lat, lon], ...]}
+    debounce_sec verilmezse üst seviye geofence.debounce_sec kullanılır.
+    """
+    out: list[Fence] = []
+    for i, it in enumerate(items):
+        fid = str(it.get("id", i))
+        deb = int(it.get("debounce_sec", debounce_sec))
+        kind = it.get("type", "circle")
+        if kind == "circle":
+            out.append(
+                CircleFence(fid, float(it["lat"]), float(it["lon"]), float(it["radius_m"]), deb)
+            )
+        elif kind == "polygon":
+            pts = [(float(p[0]), float(p[1])) for p in it["points"]]
+            out.append(PolygonFence(fid, pts, deb))
+        else:
+            raise ValueError(f"Bilinmeyen geofence tipi: {kind}")
+    return out
+
+
+class FenceIndex:
+    """
+    Enlem/boylam ızgarası (geohash benzeri sabit hücreler) üzerinde uzamsal indeks.
+    Her alan, bbox'ının kestiği hücrelere yazılır; sorgu yalnız noktanın hücresindeki
+    adayları kesin testten geçirir → alan sayısından bağımsız, ~O(hücre başına aday).
+
+    cell_deg verilmezse alan bbox yüksekliklerinin medyanı kullanılır.
+    Not: ±180° boylam sınırını aşan alanlar desteklenmez.
+    """
+
+    def __init__(self, fences: Sequence[Fence], cell_deg: float | None = None):
+        self.fences = list(fences)
+        boxes = [f.bbox() for f in self.fences]
+        if cell_deg is None:
+            cell_deg = median(b[1] - b[0] for b in boxes) if boxes else 1.0
+        self.cell = max(float(cell_deg), 1e-4)
+        self._cells: dict[tuple[int, int], list[int]] = {}
+        for i, (la0, la1, lo0, lo1) in enumerate(boxes):
+            for ci in range(floor(la0 / self.cell), floor(la1 / self.cell) + 1):
+                for cj in range(floor(lo0 / self.cell), floor(lo1 / self.cell) + 1):
+                    self._cells.setdefault((ci, cj), []).append(i)
+
+    def candidates(self, lat: float, lon: float) -> list[int]:
+        return self._cells.get((floor(lat / self.cell), floor(lon / self.cell)), [])
+
+    def query(self, lat: float, lon: float) -> list[Fence]:
+        """Noktayı içeren alanlar."""
+        fs = self.fences
+        return [fs[i] for i in self.candidates(lat, lon) if fs[i].contains(lat, lon)]
+
+
+class MultiGeofence:
+    """
+    Çok sayıda alan için debounce'lu çıkış tespiti; state (cihaz, alan) çifti bazında.
+
+    Cihaz bir alanın içinde görüldüğünde o alana bağlanır; o alanın dışında kesintisiz
+    debounce_sec kaldığında çıkış alarmı bir kez üretilir ve bağ çözülür (alana yeniden
+    girene kadar o alan için tekrar alarm yok). Hiç içinde görülmediği alanlar için
+    state tutulmaz.
+
+    state: StateBackend read_fences/write_fences (fence_id -> outside_since, NaN = içeride);
+    geofence/özelliklerle aynı depo verilirse TTL/LRU, SQLite ve snapshot kapsamına girer.
+    """
+
+    def __init__(
+        self,
+        fences: Sequence[Fence],
+        cell_deg: float | None = None,
+        store: StateBackend | None = None,
+    ):
+        self.index = FenceIndex(fences, cell_deg)
+        self._by_id = {f.id: f for f in self.index.fences}
+        self.state = DeviceStateStore() if store is None else store
+
+    def check(
+        self, device_id: str, lat: float, lon: float, now_ts: float | None = None
+    ) -> tuple[list[str], list[Fence]]:
+        """
+        Returns:
+          (inside_ids, exited)
+          inside_ids: noktayı içeren alan id'leri
+          exited: debounce penceresi bu noktada dolan çıkışlar (alarm üretilmeli)
+        """
+        now_ts = time() if now_ts is None else now_ts
+        inside = self.index.query(lat, lon)
+        inside_ids = [f.id for f in inside]
+        st = self.state.read_fences(device_id)
+        if not st and not inside:
+            return (inside_ids, [])
+
+        exited: list[Fence] = []
+        new: dict[str, float] = {}
+        for fid, since in st.items():
+            fence = self._by_id.get(fid)
+            if fence is None or fid in inside_ids:
+                continue  # config'ten kaldırılmış alan bağı düşer; içerideyse aşağıda
+            if since != since:  # NaN → yeni dışarıya çıktı
+                new[fid] = now_ts
+            elif now_ts - since >= fence.debounce_sec:
+                exited.append(fence)  # alarm bir kez; bağ çözülür
+            else:
+                new[fid] = since
+        for fid in inside_ids:
+            new[fid] = math.nan  # içeride
+        if exited or new.keys() != st.keys() or any(v == v and st[f] != v for f, v in new.items()):
+            self.state.write_fences(device_id, new)
+        return (inside_ids, exited)
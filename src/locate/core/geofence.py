@@ -1,10 +1,14 @@
 # src/locate/core/geofence.py
 from __future__ import annotations
 
+from collections.abc import Sequence
 from dataclasses import dataclass
 from time import time
 
-from ..utils.geo import haversine_m
+import numpy as np
+
+from ..utils.geo import haversine_m, haversine_m_vec
+from .state import DeviceStateStore, StateBackend
 
 
 @dataclass
@@ -18,16 +22,30 @@ class GeofenceParams:
 class DebouncedGeofence:
     """
     Cihaz bazlı kısa süreli bellekle (in-memory) debounce uygular.
-    state: device_id -> outside_since_ts (epoch saniye) veya None
+    state: StateBackend 'outside_since' alanı (epoch saniye; NaN = içeride)
 
     Not:
       - now_ts verilirse olay zamanına göre; verilmezse sistem saatine göre hesap yapar.
       - Replay/test senaryolarında her zaman now_ts geçmek önerilir.
     """
 
-    def __init__(self, params: GeofenceParams):
+    def __init__(self, params: GeofenceParams, store: StateBackend | None = None):
         self.p = params
-        self.state: dict[str, float | None] = {}
+        self.state = DeviceStateStore() if store is None else store
+
+    def _step(self, device_id: str, outside: bool, now_ts: float) -> bool:
+        """Tek nokta için debounce durum makinesi; alarm gerekiyorsa True döner."""
+        (since,) = self.state.read(device_id, ("outside_since",))
+        if outside:
+            if since != since:  # NaN → yeni dışarıya çıktı
+                self.state.write(device_id, outside_since=now_ts)
+                return False
+            # alarm zamanı gelmiş olsa da state'i içeride olana kadar koru
+            return now_ts - since >= self.p.debounce_sec
+        # içeri döndü; state temizle
+        if since == since:
+            self.state.write(device_id, outside_since=np.nan)
+        return False
 
     def check(
         self, device_id: str, lat: float, lon: float, now_ts: float | None = None
@@ -39,21 +57,32 @@ class DebouncedGeofence:
         """
         now_ts = time() if now_ts is None else now_ts
         d = haversine_m(self.p.lat0, self.p.lon0, lat, lon)
-        outside = d > self.p.radius_m
+        return (self._step(device_id, d > self.p.radius_m, now_ts), d)
 
-        since = self.state.get(device_id)
-        if outside:
-            if since is None:
-                self.state[device_id] = now_ts  # yeni dışarıya çıktı
-                return (False, d)
-            else:
-                if now_ts - since >= self.p.debounce_sec:
-                    # alarm zamanı, fakat state'i içeride olana kadar koru
-                    return (True, d)
-                else:
-                    return (False, d)
-        else:
-            # içeri döndü; state temizle
-            if since is not None:
-                self.state[device_id] = None
-            return (False, d)
+    def check_many(
+        self,
+        device_ids: Sequence[str],
+        lats: Sequence[float] | np.ndarray,
+        lons: Sequence[float] | np.ndarray,
+        now_ts: Sequence[float] | np.ndarray,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Toplu kontrol: tüm merkez mesafeleri tek NumPy geçişinde hesaplanır,
+        debounce ise noktalar olay zamanına (now_ts) göre sıralanarak uygulanır.
+        Aynı zamana sahip noktalar giriş sırasını korur (stable sort).
+
+        Returns:
+          (triggered[bool], distance_m[float64]) — giriş sırasıyla hizalı.
+        """
+        ts = np.asarray(now_ts, dtype="float64")
+        d = haversine_m_vec(
+            self.p.lat0,
+            self.p.lon0,
+            np.asarray(lats, dtype="float64"),
+            np.asarray(lons, dtype="float64"),
+        )
+        outside = d > self.p.radius_m
+        triggered = np.zeros(len(ts), dtype=bool)
+        for i in np.argsort(ts, kind="stable").tolist():
+            triggered[i] = self._step(device_ids[i], bool(outside[i]), float(ts[i]))
+        return triggered, d
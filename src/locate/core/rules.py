@@ -0,0 +1,129 @@
+# src/locate/core/rules.py
+from __future__ import annotations
+
+from collections.abc import Sequence
+from dataclasses import dataclass
+from typing import Any
+
+import numpy as np
+
+from ..utils.geo import haversine_m_vec
+
+__all__ = [
+    "ROUTE_JUMP",
+    "SPEED_ANOMALY",
+    "MotionRules",
+    "RuleParams",
+    "rules_from_config",
+    "steps_many",
+]
+
+SPEED_ANOMALY = "SPEED_ANOMALY"  # 1100
+ROUTE_JUMP = "ROUTE_JUMP"  # 1101
+
+
+@dataclass
+class RuleParams:
+    """
+    Kural eşikleri (config.filters); None olan kural devre dışıdır.
+      max_speed_kmh : hız (bildirilen ya da d/dt) bu değerin üstündeyse SPEED_ANOMALY;
+                      önceki noktadan ima edilen hız (sıçrama / dt) üstündeyse ROUTE_JUMP
+      max_accel_mps2: |ivme| bu değerin üstündeyse SPEED_ANOMALY
+      max_jump_m    : önceki noktaya mesafe bu değerin üstündeyse ROUTE_JUMP (dt'den bağımsız)
+      jump_min_m    : GPS gürültü tabanı; bundan kısa sıçramalar ROUTE_JUMP sayılmaz
+    """
+
+    max_speed_kmh: float | None = None
+    max_accel_mps2: float | None = None
+    max_jump_m: float | None = None
+    jump_min_m: float = 50.0
+
+
+class MotionRules:
+    """
+    Önceki noktaya göre ucuz fiziksel kurallar; model skorundan önce, özellik adımıyla
+    aynı geçişte çalışır. Öncelik (§5.1): SPEED_ANOMALY > ROUTE_JUMP.
+    Girdiler OnlineFeatureState çıktısıdır: speed, accel (özellikler) ve önceki noktaya
+    sıçrama mesafesi / zaman farkı (cihazın ilk noktasında NaN).
+    """
+
+    def __init__(self, params: RuleParams):
+        self.p = params
+        self._vmax = np.inf if params.max_speed_kmh is None else params.max_speed_kmh / 3.6
+        self._amax = np.inf if params.max_accel_mps2 is None else params.max_accel_mps2
+        self._jmax = np.inf if params.max_jump_m is None else params.max_jump_m
+        self.enabled = bool(np.isfinite([self._vmax, self._amax, self._jmax]).any())
+
+    def check(self, speed: float, accel: float, step_m: float, dt: float) -> str | None:
+        """Tek nokta: tetiklenen en öncelikli kuralın etiketi ya da None."""
+        if speed > self._vmax or abs(accel) > self._amax:
+            return SPEED_ANOMALY
+        if step_m > self.p.jump_min_m:  # NaN (ilk nokta) karşılaştırması False
+            # dt <= 0: aynı/geri zamanda farklı konum → ima edilen hız sonsuz
+            if step_m > self._jmax or dt <= 0 or step_m / dt > self._vmax:
+                return ROUTE_JUMP
+        return None
+
+    def check_many(
+        self,
+        speed: np.ndarray,
+        accel: np.ndarray,
+        step_m: np.ndarray,
+        dt: np.ndarray,
+    ) -> np.ndarray:
+        """check'in vektörel sürümü: etiket dizisi (object; kural yoksa None)."""
+        speed, accel, step_m, dt = (
+            np.asarray(x, dtype="float64") for x in (speed, accel, step_m, dt)
+        )
+        is_speed = (speed > self._vmax) | (np.abs(accel) > self._amax)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            implied = np.where(dt > 0, step_m / dt, np.inf)
+        is_jump = (step_m > self.p.jump_min_m) & ((step_m > self._jmax) | (implied > self._vmax))
+        out = np.full(len(speed), None, dtype=object)
+        out[is_jump] = ROUTE_JUMP
+        out[is_speed] = SPEED_ANOMALY
+        return out
+
+
+def rules_from_config(filters: dict[str, Any]) -> MotionRules:
+    """config.filters bölümünden kural motoru."""
+
+    def opt(k: str) -> float | None:
+        v = filters.get(k)
+        return None if v is None else float(v)
+
+    return MotionRules(
+        RuleParams(
+            max_speed_kmh=opt("max_speed_kmh"),
+            max_accel_mps2=opt("max_accel_mps2"),
+            max_jump_m=opt("max_jump_m"),
+            jump_min_m=float(filters.get("jump_min_m", 50.0)),
+        )
+    )
+
+
+def steps_many(
+    device_ids: Sequence[str],
+    ts: Sequence[float] | np.ndarray,
+    lats: Sequence[float] | np.ndarray,
+    lons: Sequence[float] | np.ndarray,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Toplu mod: her noktanın aynı cihazın (zamanca) önceki noktasına sıçrama mesafesi (m) ve
+    zaman farkı (s); cihazın ilk noktasında NaN. Sıralama build_features ile aynıdır
+    ((device_id, ts), stable); sonuç giriş sırasıyla hizalıdır.
+    """
+    codes = np.unique(np.asarray(device_ids, dtype=str), return_inverse=True)[1]
+    ts = np.asarray(ts, dtype="float64")
+    lat = np.asarray(lats, dtype="float64")
+    lon = np.asarray(lons, dtype="float64")
+    order = np.lexsort((ts, codes))
+    step = np.full(len(ts), np.nan)
+    dt = np.full(len(ts), np.nan)
+    if len(order) > 1:
+        cur, prev = order[1:], order[:-1]
+        same = codes[cur] == codes[prev]
+        cur, prev = cur[same], prev[same]
+        step[cur] = haversine_m_vec(lat[prev], lon[prev], lat[cur], lon[cur])
+        dt[cur] = ts[cur] - ts[prev]
+    return step, dt
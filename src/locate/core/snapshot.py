@@ -0,0 +1,350 @@
+# src/locate/core/snapshot.py
+"""
+Cihaz state'inin (DeviceStateStore: debounce 'outside_since' + son nokta ts/lat/lon/speed/
+bearing + 'seen' + çoklu alan çiftleri) periyodik, artımlı anlık görüntüleri (snapshot).
+Yeniden başlatma / rolling deploy sonrası debounce pencereleri ve ilk noktanın özellikleri
+kaybolmaz.
+
+Dizin düzeni (parça başına <ad>/meta.json + keys.npy + rows.npy, mmap ile okunur):
+  base-<seq>   : tam görüntü (seq'e kadarki tüm parçaların birleşimi)
+  delta-<seq>  : son kayıttan beri dokunulan ('seen' >= önceki kayıt anı) cihazlar
+  keys.npy     : device_id'ler (UTF-8, sabit genişlikli bayt dizisi, sıralı)
+  rows.npy     : (n, len(COLUMNS)) float64, keys ile aynı sırada
+  fence_*.npy  : çoklu alan state'i (MultiGeofence), cihaz anahtarına göre sıralı çiftler:
+                 fence_keys (device_id), fence_ids (fence_id), fence_since (outside_since)
+Her parça geçici adla yazılıp yeniden adlandırılır (yarım parça okunmaz). full_every
+delta birikince parçalar arka planda yeni bir base'e birleştirilir, eskiler silinir.
+
+Geri yükleme tembeldir: açılışta yalnız meta.json okunur ve diziler mmap edilir; bir cihaz
+depoda ilk kez görüldüğünde anahtarı parçalarda (yeniden eskiye) ikili aramayla bulunup
+satırı slot'a kopyalanır. Böylece açılış milyonlarca cihazda da milisaniyeler sürer.
+Bayatlık kontrolleri:
+  - max_age_sec: en yeni parça bundan eskiyse görüntü hiç kullanılmaz (sistem saati)
+  - ttl_sec    : 'seen' bu süreden eskiyse satır yok sayılır (depo TTL'i ile aynı)
+  - max_lag_sec: son olay zamanı (ts) görüntüdeki en yeni olay zamanının bu kadar
+                 gerisindeyse satır yok sayılır (olay zamanına göre)
+Silinen (TTL/LRU) cihazlar deltalara yazılmaz; base'den dönen eski satırı ttl_sec eler.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import threading
+from pathlib import Path
+from time import perf_counter, time
+from typing import Any
+
+import numpy as np
+
+from .state import COLUMNS
+
+__all__ = ["SNAPSHOT_FORMAT", "SNAPSHOT_VERSION", "StateSnapshot", "Snapshotter"]
+
+SNAPSHOT_FORMAT = "geosentinel-state-snapshot"
+SNAPSHOT_VERSION = 1
+_SEEN = COLUMNS.index("seen")
+_TS = COLUMNS.index("ts")
+_FENCE_FILES = ("fence_keys.npy", "fence_ids.npy", "fence_since.npy")
+
+
+def _seq(p: Path) -> int:
+    return int(p.name.rsplit("-", 1)[1])
+
+
+def _parts(root: Path) -> tuple[Path | None, list[Path]]:
+    """(en yeni base, ondan yeni deltalar: yeniden eskiye)."""
+    if not root.is_dir():
+        return None, []
+    bases = sorted(root.glob("base-*[0-9]"), key=_seq)
+    base = bases[-1] if bases else None
+    floor = -1 if base is None else _seq(base)
+    deltas = sorted((d for d in root.glob("delta-*[0-9]") if _seq(d) > floor), key=_seq)
+    return base, deltas[::-1]
+
+
+def _fence_arrays(
+    fences: dict[str, dict[str, float]],
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """device_id -> {fence_id: outside_since} → cihaz anahtarına göre sıralı üç dizi."""
+    pairs = [(d, f, v) for d, st in fences.items() for f, v in st.items()]
+    fk = np.array([d.encode("utf-8") for d, _, _ in pairs], dtype="S")
+    fid = np.array([f.encode("utf-8") for _, f, _ in pairs], dtype="S")
+    since = np.array([v for _, _, v in pairs], dtype="float64")
+    order = np.argsort(fk, kind="stable")
+    return fk[order], fid[order], since[order]
+
+
+def _write_part(
+    root: Path,
+    name: str,
+    keys: np.ndarray,
+    rows: np.ndarray,
+    created: float,
+    kind: str,
+    fences: tuple[np.ndarray, np.ndarray, np.ndarray],
+) -> Path:
+    out = root / name
+    tmp = root / f".{name}.tmp{os.getpid()}"
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+    np.save(tmp / "keys.npy", keys)
+    np.save(tmp / "rows.npy", np.ascontiguousarray(rows, dtype="float64"))
+    for fname, arr in zip(_FENCE_FILES, fences, strict=True):
+        np.save(tmp / fname, arr)
+    ts = rows[:, _TS] if len(rows) else np.empty(0)
+    meta = {
+        "format": SNAPSHOT_FORMAT,
+        "version": SNAPSHOT_VERSION,
+        "kind": kind,
+        "columns": list(COLUMNS),
+        "created": created,
+        "devices": int(len(keys)),
+        "fence_rows": int(len(fences[0])),
+        "max_event_ts": float(np.nanmax(ts)) if np.isfinite(ts).any() else None,
+    }
+    (tmp / "meta.json").write_text(json.dumps(meta, indent=2), "utf-8")
+    os.replace(tmp, out)
+    return out
+
+
+def _lock_dir(root: Path):
+    root.mkdir(parents=True, exist_ok=True)
+    f = (root / ".lock").open("a")
+    try:
+        import fcntl
+    except ImportError:  # POSIX dışı: kilit yok
+        return f
+    try:
+        fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        f.close()
+        raise ValueError(
+            f"State görüntü dizini başka bir süreç tarafından kullanılıyor: {root}. Çoklu "
+            "worker'da yol '{worker}' içermeli ve worker'lar api.affinity ile başlatılmalı."
+        ) from None
+    return f
+
+
+class _Part:
+    def __init__(self, path: Path):
+        self.path = path
+        self.meta = json.loads((path / "meta.json").read_text(encoding="utf-8"))
+        if (
+            self.meta.get("format") != SNAPSHOT_FORMAT
+            or self.meta.get("version") != SNAPSHOT_VERSION
+            or self.meta.get("columns") != list(COLUMNS)
+        ):
+            raise ValueError(
+                f"Desteklenmeyen state görüntüsü: {path} ({self.meta.get('format')} "
+                f"v{self.meta.get('version')}, beklenen {SNAPSHOT_FORMAT} v{SNAPSHOT_VERSION})"
+            )
+        self.keys = np.load(path / "keys.npy", mmap_mode="r")
+        self.rows = np.load(path / "rows.npy", mmap_mode="r")
+        if self.rows.shape != (len(self.keys), len(COLUMNS)):
+            raise ValueError(f"State görüntüsü bozuk: {path} {self.rows.shape}")
+        if (path / _FENCE_FILES[0]).exists():
+            self.fence_keys, self.fence_ids, self.fence_since = (
+                np.load(path / f, mmap_mode="r") for f in _FENCE_FILES
+            )
+        else:  # alan state'i olmadan yazılmış eski parçalar
+            self.fence_keys = self.fence_ids = np.empty(0, dtype="S1")
+            self.fence_since = np.empty(0, dtype="float64")
+
+    def find(self, key: bytes) -> np.ndarray | None:
+        i = int(np.searchsorted(self.keys, key))
+        if i < len(self.keys) and self.keys[i] == key:
+            return self.rows[i]
+        return None
+
+    def fences(self, key: bytes) -> dict[str, float]:
+        lo = int(np.searchsorted(self.fence_keys, key, side="left"))
+        hi = int(np.searchsorted(self.fence_keys, key, side="right"))
+        return {
+            self.fence_ids[i].decode("utf-8"): float(self.fence_since[i]) for i in range(lo, hi)
+        }
+
+
+class StateSnapshot:
+    """Salt okunur, mmap'li görüntü; DeviceStateStore.attach_snapshot ile bağlanır."""
+
+    def __init__(
+        self,
+        root: str | Path,
+        ttl_sec: float | None = None,
+        max_age_sec: float | None = None,
+        max_lag_sec: float | None = None,
+        now: float | None = None,
+    ):
+        t = perf_counter()
+        now = time() if now is None else now
+        self.root = Path(root)
+        self.ttl_sec = ttl_sec
+        base, deltas = _parts(self.root)
+        self.parts = [_Part(p) for p in (*deltas, base) if p is not None]
+        self.created = max((p.meta["created"] for p in self.parts), default=None)
+        self.stale = (
+            self.created is not None
+            and max_age_sec is not None
+            and now - self.created > max_age_sec
+        )
+        if self.stale:
+            self.parts = []
+        ev = [p.meta["max_event_ts"] for p in self.parts if p.meta["max_event_ts"] is not None]
+        self.max_event_ts = max(ev) if ev else None
+        self._min_ts = (
+            -np.inf
+            if max_lag_sec is None or self.max_event_ts is None
+            else self.max_event_ts - max_lag_sec
+        )
+        self.hits = 0
+        self.misses = 0
+        self.open_ms = (perf_counter() - t) * 1000.0
+
+    def lookup(self, device_id: str, now: float) -> tuple[np.ndarray, dict[str, float]] | None:
+        """
+        Cihazın en yeni, bayat olmayan satırı (COLUMNS sırasıyla) ve aynı parçadaki alan
+        state'i ({fence_id: outside_since}) ya da None.
+        """
+        key = device_id.encode("utf-8")
+        for p in self.parts:
+            row = p.find(key)
+            if row is None:
+                continue
+            # en yeni satır bayatsa eskileri de bayattır
+            if row[_TS] < self._min_ts or (
+                self.ttl_sec is not None and row[_SEEN] < now - self.ttl_sec
+            ):
+                break
+            self.hits += 1
+            return row, p.fences(key)
+        self.misses += 1
+        return None
+
+    def __len__(self) -> int:
+        # parçalar arası tekrarlar dahil (üst sınır)
+        return sum(p.meta["devices"] for p in self.parts)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "path": str(self.root),
+            "parts": len(self.parts),
+            "rows": len(self),
+            "created": self.created,
+            "stale": self.stale,
+            "max_event_ts": self.max_event_ts,
+            "open_ms": self.open_ms,
+            "restored": self.hits,
+            "misses": self.misses,
+        }
+
+
+class Snapshotter:
+    """
+    Periyodik kayıt: capture() depo thread'inde (event loop) dokunulan satırları kopyalar;
+    write() diske yazar ve gerekirse birleştirir (yardımcı thread'de çalışabilir).
+
+    Dizin tek bir sürece aittir: açılışta <root>/.lock üzerinde özel kilit (flock) alınır;
+    kilit başka bir süreçteyse (ör. aynı yolu paylaşan uvicorn --workers) ValueError.
+    """
+
+    def __init__(self, store, root: str | Path, full_every: int = 10):
+        self.store = store
+        self.root = Path(root)
+        self.full_every = max(1, int(full_every))
+        self._lockf = _lock_dir(self.root)
+        self._since: float | None = None  # ilk kayıt tam görüntü
+        self._lock = threading.Lock()
+        self.saves = 0
+        self.last_save: float | None = None
+        self.last_rows = 0
+        self.last_ms = 0.0
+
+    def capture(self) -> tuple[list[str], np.ndarray, dict[str, dict[str, float]], float]:
+        now = time()
+        keys, rows, fences = self.store.export(self._since)
+        return keys, rows, fences, now
+
+    def write(
+        self, part: tuple[list[str], np.ndarray, dict[str, dict[str, float]], float]
+    ) -> Path | None:
+        keys, rows, fences, now = part
+        with self._lock:
+            t = perf_counter()
+            out = None
+            if keys or self._since is None:
+                k = np.array([s.encode("utf-8") for s in keys], dtype="S")
+                order = np.argsort(k, kind="stable")
+                base, deltas = _parts(self.root)
+                seq = max((_seq(p) for p in (base, *deltas) if p is not None), default=0) + 1
+                self.root.mkdir(parents=True, exist_ok=True)
+                out = _write_part(
+                    self.root,
+                    f"delta-{seq:06d}",
+                    k[order],
+                    rows[order],
+                    now,
+                    "delta",
+                    _fence_arrays(fences),
+                )
+                if len(deltas) + 1 >= self.full_every:
+                    self.compact(now)
+            if self._since is None or now > self._since:
+                self._since = now
+            self.saves += 1
+            self.last_save = now
+            self.last_rows = len(keys)
+            self.last_ms = (perf_counter() - t) * 1000.0
+            return out
+
+    def save(self) -> Path | None:
+        """capture + write (kapanışta son kayıt)."""
+        return self.write(self.capture())
+
+    def compact(self, now: float | None = None) -> Path | None:
+        """base + deltaları tek base'e birleştirir (yeni olan kazanır); TTL'i dolanlar atılır."""
+        now = time() if now is None else now
+        base, deltas = _parts(self.root)
+        paths = [p for p in (*deltas, base) if p is not None]
+        if not paths:
+            return None
+        parts = [_Part(p) for p in paths]
+        keys = np.concatenate([np.asarray(p.keys) for p in parts])
+        rows = np.concatenate([np.asarray(p.rows) for p in parts])
+        src = np.repeat(np.arange(len(parts)), [len(p.keys) for p in parts])
+        # np.unique: sıralı tekil anahtarlar + ilk görülme indeksi (yeniden eskiye → en yeni)
+        keys, first = np.unique(keys, return_index=True)
+        rows, src = rows[first], src[first]
+        ttl = getattr(self.store, "ttl_sec", None)
+        if ttl is not None:
+            keep = rows[:, _SEEN] >= now - ttl
+            keys, rows, src = keys[keep], rows[keep], src[keep]
+        # alan çiftleri: cihazın satırının alındığı (en yeni) parçadan; silinen cihazlarınki atılır
+        fk = np.concatenate([np.asarray(p.fence_keys) for p in parts])
+        fid = np.concatenate([np.asarray(p.fence_ids) for p in parts])
+        fsince = np.concatenate([np.asarray(p.fence_since) for p in parts])
+        fsrc = np.repeat(np.arange(len(parts)), [len(p.fence_keys) for p in parts])
+        pos = np.minimum(np.searchsorted(keys, fk), max(len(keys) - 1, 0))
+        ok = (keys[pos] == fk) & (src[pos] == fsrc) if len(keys) else np.zeros(len(fk), bool)
+        order = np.argsort(fk[ok], kind="stable")
+        fences = (fk[ok][order], fid[ok][order], fsince[ok][order])
+        seq = _seq(paths[0])
+        out = _write_part(self.root, f"base-{seq:06d}", keys, rows, now, "base", fences)
+        # yeni base kalıcı olduktan sonra kapsadığı parçalar (yarıda kalmış eskiler dahil)
+        for p in (*self.root.glob("base-*[0-9]"), *self.root.glob("delta-*[0-9]")):
+            if p != out and _seq(p) <= seq:
+                shutil.rmtree(p, ignore_errors=True)
+        return out
+
+    def stats(self) -> dict[str, Any]:
+        base, deltas = _parts(self.root)
+        return {
+            "path": str(self.root),
+            "saves": self.saves,
+            "last_save": self.last_save,
+            "last_rows": self.last_rows,
+            "last_ms": self.last_ms,
+            "deltas": len(deltas),
+            "full_every": self.full_every,
+        }
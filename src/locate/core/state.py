@@ -0,0 +1,402 @@
+# src/locate/core/state.py
+from __future__ import annotations
+
+import os
+import sqlite3
+import sys
+from abc import ABC, abstractmethod
+from pathlib import Path
+from time import time
+from typing import Any
+
+import numpy as np
+
+__all__ = ["StateBackend", "DeviceStateStore", "SQLiteStateBackend", "make_backend"]
+
+# Cihaz başına tutulan alanlar; NaN = "yok/None"
+FIELDS = ("outside_since", "ts", "lat", "lon", "speed", "bearing")
+# 'seen': son dokunma zamanı (sistem saati), TTL/LRU için
+COLUMNS = (*FIELDS, "seen")
+
+
+class StateBackend(ABC):
+    """
+    DebouncedGeofence, MultiGeofence ve OnlineFeatureState'in kullandığı cihaz state arayüzü.
+    Alanlar float'tır (FIELDS); olmayan cihaz/alan için NaN döner. Çoklu alan debounce'u
+    cihaz başına değişken sayıda (alan, outside_since) çifti tutar (read_fences/write_fences);
+    bu çiftler cihazla birlikte TTL/LRU ile silinir.
+    """
+
+    @abstractmethod
+    def read(self, device_id: str, fields: tuple[str, ...]) -> tuple[float, ...]:
+        """İstenen alanları döndürür (cihaz yoksa hepsi NaN)."""
+
+    @abstractmethod
+    def write(self, device_id: str, **values: float) -> None:
+        """Verilen alanları yazar (NaN = temizle) ve son görülme zamanını günceller."""
+
+    @abstractmethod
+    def read_fences(self, device_id: str) -> dict[str, float]:
+        """Cihazın bağlı olduğu alanlar: fence_id -> outside_since (NaN = içeride); yoksa {}."""
+
+    @abstractmethod
+    def write_fences(self, device_id: str, fences: dict[str, float]) -> None:
+        """Cihazın alan state'ini verilenle değiştirir ({} = temizle); 'seen' güncellenir."""
+
+    @abstractmethod
+    def __contains__(self, device_id: str) -> bool:
+        """Cihaz depoda mı; slot oluşturmaz, 'seen'i güncellemez (TTL/LRU'yu etkilemez)."""
+
+    @abstractmethod
+    def __len__(self) -> int: ...
+
+    @abstractmethod
+    def stats(self) -> dict[str, Any]: ...
+
+
+class DeviceStateStore(StateBackend):
+    """
+    Cihaz bazlı state için paylaşılan, dizi tabanlı (columnar) bellek deposu.
+
+    - device_id -> slot (int) indeksi; anahtarlar sys.intern ile tekilleştirilir.
+    - Her alan ayrı bir float64 dizisinde tutulur (cihaz başına 7 x 8 bayt);
+      cihaz başına Python nesnesi (dataclass, datetime, float) oluşmaz.
+    - Zamanlar epoch saniye (float); değer yoksa NaN.
+    - TTL: 'seen' (son dokunma, sistem saati) ttl_sec'ten eskiyse cihaz silinir;
+      tarama her sweep_every işlemde bir vektörel yapılır.
+    - LRU: max_devices dolduğunda en uzun süredir görülmeyen %10 cihaz atılır.
+
+    DebouncedGeofence 'outside_since', OnlineFeatureState 'ts/lat/lon/speed/bearing'
+    kolonlarını kullanır; aynı depo ikisine birden verilebilir. MultiGeofence'in (alan,
+    outside_since) çiftleri yalnız alan state'i olan cihazlar için slot -> dict olarak tutulur.
+    """
+
+    def __init__(
+        self,
+        ttl_sec: float | None = None,
+        max_devices: int | None = None,
+        capacity: int = 1024,
+        sweep_every: int = 4096,
+    ):
+        self.ttl_sec = ttl_sec
+        self.max_devices = max_devices
+        self.sweep_every = max(1, int(sweep_every))
+        self._index: dict[str, int] = {}
+        self._keys: list[str | None] = []  # slot -> device_id (silme için ters indeks)
+        self._free: list[int] = []
+        self._size = 0  # kullanılmış en yüksek slot + 1
+        self._ops = 0
+        self.evicted = 0
+        self._fences: dict[int, dict[str, float]] = {}
+        self._snapshot = None  # StateSnapshot (tembel geri yükleme)
+        self._alloc(max(1, int(capacity)))
+
+    # -------------------- iç yardımcılar --------------------
+    def _alloc(self, cap: int) -> None:
+        for name in COLUMNS:
+            old = getattr(self, name, None)
+            arr = np.full(cap, np.nan, dtype="float64")
+            if old is not None:
+                arr[: len(old)] = old
+            setattr(self, name, arr)
+        self._cap = cap
+
+    def _new_slot(self) -> int:
+        if self.max_devices is not None and len(self._index) >= self.max_devices:
+            self._evict_lru(max(1, self.max_devices // 10))
+        if self._free:
+            return self._free.pop()
+        if self._size >= self._cap:
+            self._alloc(self._cap * 2)
+        s = self._size
+        self._size += 1
+        self._keys.append(None)
+        return s
+
+    def _release(self, slots: list[int]) -> None:
+        for name in COLUMNS:
+            getattr(self, name)[slots] = np.nan
+        for s in slots:
+            del self._index[self._keys[s]]
+            self._keys[s] = None
+            self._fences.pop(s, None)
+        self._free.extend(slots)
+        self.evicted += len(slots)
+
+    def _evict_where(self, mask: np.ndarray) -> int:
+        drop = np.flatnonzero(mask).tolist()
+        if drop:
+            self._release(drop)
+        return len(drop)
+
+    def _evict_lru(self, n: int) -> int:
+        seen = self.seen[: self._size]
+        live = ~np.isnan(seen)
+        if n >= int(live.sum()):
+            return self._evict_where(live)
+        cutoff = np.partition(np.where(live, seen, np.inf), n - 1)[n - 1]
+        return self._evict_where(live & (seen <= cutoff))
+
+    # -------------------- genel API --------------------
+    def read(self, device_id: str, fields: tuple[str, ...]) -> tuple[float, ...]:
+        s = self.slot(device_id)
+        return tuple(getattr(self, f)[s] for f in fields)
+
+    def write(self, device_id: str, **values: float) -> None:
+        s = self.slot(device_id)
+        for f, v in values.items():
+            getattr(self, f)[s] = v
+
+    def read_fences(self, device_id: str) -> dict[str, float]:
+        return dict(self._fences.get(self.slot(device_id), ()))
+
+    def write_fences(self, device_id: str, fences: dict[str, float]) -> None:
+        s = self.slot(device_id)
+        if fences:
+            self._fences[s] = dict(fences)
+        else:
+            self._fences.pop(s, None)
+
+    def get(self, device_id: str) -> int | None:
+        """Mevcut slot (yoksa None); 'seen' güncellenmez."""
+        return self._index.get(device_id)
+
+    def slot(self, device_id: str, now: float | None = None) -> int:
+        """Cihazın slot'unu döndürür (yoksa oluşturur) ve son görülme zamanını günceller."""
+        now = time() if now is None else now
+        s = self._index.get(device_id)
+        if s is None:
+            s = self._new_slot()
+            key = sys.intern(device_id)
+            self._index[key] = s
+            self._keys[s] = key
+            if self._snapshot is not None:
+                self._restore(s, key, now)
+        self.seen[s] = now
+        self._ops += 1
+        if self.ttl_sec is not None and self._ops >= self.sweep_every:
+            self._ops = 0
+            # yeni/az önce dokunulan slot zaten taze; silinmez
+            self.evict_expired(now)
+        return s
+
+    def _restore(self, s: int, device_id: str, now: float) -> None:
+        found = self._snapshot.lookup(device_id, now)
+        if found is not None:
+            row, fences = found
+            for i, name in enumerate(FIELDS):
+                getattr(self, name)[s] = row[i]
+            if fences:
+                self._fences[s] = fences
+
+    def attach_snapshot(self, snapshot) -> None:
+        """
+        Yeniden başlatma sonrası state (locate.core.snapshot.StateSnapshot): depoda olmayan
+        bir cihaz ilk kez görüldüğünde alanları görüntüden kopyalanır.
+        """
+        self._snapshot = snapshot
+
+    def export(
+        self, since: float | None = None
+    ) -> tuple[list[str], np.ndarray, dict[str, dict[str, float]]]:
+        """
+        Canlı cihazlar (since verilirse yalnız 'seen' >= since olanlar): anahtarlar,
+        (n, len(COLUMNS)) float64 satır kopyası ve bu cihazlardan alan state'i olanların
+        device_id -> {fence_id: outside_since} kopyası (snapshot yazımı için).
+        """
+        seen = self.seen[: self._size]
+        live = ~np.isnan(seen)
+        idx = np.flatnonzero(live if since is None else live & (seen >= since)).tolist()
+        keys = [self._keys[i] for i in idx]
+        rows = np.column_stack([getattr(self, name)[idx] for name in COLUMNS])
+        fences = {self._keys[i]: dict(self._fences[i]) for i in idx if i in self._fences}
+        return keys, rows, fences
+
+    def evict_expired(self, now: float | None = None) -> int:
+        """TTL süresi dolmuş cihazları siler; silinen sayısını döndürür."""
+        if self.ttl_sec is None:
+            return 0
+        now = time() if now is None else now
+        return self._evict_where(self.seen[: self._size] < now - self.ttl_sec)
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __contains__(self, device_id: str) -> bool:
+        return device_id in self._index
+
+    def memory_bytes(self) -> int:
+        """Yaklaşık bellek kullanımı (kolonlar + indeks + anahtarlar, bayt)."""
+        cols = sum(getattr(self, name).nbytes for name in COLUMNS)
+        idx = sys.getsizeof(self._index) + sys.getsizeof(self._keys) + sys.getsizeof(self._free)
+        idx += sys.getsizeof(self._fences) + sum(sys.getsizeof(d) for d in self._fences.values())
+        n = len(self._index)
+        if n:
+            sample = [k for k, _ in zip(self._index, range(1000), strict=False)]
+            idx += int(n * sum(sys.getsizeof(k) for k in sample) / len(sample))
+        return cols + idx
+
+    def stats(self) -> dict[str, Any]:
+        n = len(self._index)
+        mem = self.memory_bytes()
+        return {
+            "backend": "memory",
+            "devices": n,
+            "capacity": self._cap,
+            "evicted": self.evicted,
+            "fence_devices": len(self._fences),
+            "ttl_sec": self.ttl_sec,
+            "max_devices": self.max_devices,
+            "memory_bytes": mem,
+            "bytes_per_device": (mem / n) if n else 0.0,
+            "snapshot": None if self._snapshot is None else self._snapshot.stats(),
+        }
+
+
+class SQLiteStateBackend(StateBackend):
+    """
+    Aynı makinedeki birden çok worker sürecinin paylaştığı SQLite (WAL) state'i.
+
+    - WAL modu: okuyucular yazarı beklemez; her süreç kendi bağlantısını açar
+      (fork sonrası bağlantı pid kontrolüyle yeniden kurulur).
+    - Her read/write tek bir indeksli satır işlemidir (autocommit).
+    - Aynı cihazın ardışık noktaları farklı worker'lara düşse de debounce/özellik
+      state'i ortaktır. Aynı cihaz için eşzamanlı (milisaniye içinde) iki nokta
+      yarışabilir; bu da engellenmek isteniyorsa cihaz afinitesi (api.affinity) kullanılır.
+    """
+
+    def __init__(self, path: str | Path, ttl_sec: float | None = None, sweep_every: int = 4096):
+        self.path = str(path)
+        self.ttl_sec = ttl_sec
+        self.sweep_every = max(1, int(sweep_every))
+        self._ops = 0
+        self._pid = -1
+        self._conn: sqlite3.Connection | None = None
+        self._sql_read: dict[tuple[str, ...], str] = {}
+        self._sql_write: dict[tuple[str, ...], str] = {}
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._db()  # şemayı oluştur
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None or self._pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            cols = ", ".join(f"{c} REAL" for c in COLUMNS)
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS device_state (device_id TEXT PRIMARY KEY, {cols})"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS device_state_seen ON device_state(seen)")
+            # çoklu alan debounce'u: (cihaz, alan) çifti başına bir satır
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS fence_state (device_id TEXT, fence_id TEXT, "
+                "outside_since REAL, PRIMARY KEY (device_id, fence_id)) WITHOUT ROWID"
+            )
+            self._conn, self._pid = conn, os.getpid()
+        return self._conn
+
+    def _touch(self, now: float) -> None:
+        self._ops += 1
+        if self.ttl_sec is not None and self._ops >= self.sweep_every:
+            self._ops = 0
+            self.evict_expired(now)
+
+    def read(self, device_id: str, fields: tuple[str, ...]) -> tuple[float, ...]:
+        sql = self._sql_read.get(fields)
+        if sql is None:
+            sql = self._sql_read[fields] = (
+                f"SELECT {', '.join(fields)} FROM device_state WHERE device_id = ?"
+            )
+        row = self._db().execute(sql, (device_id,)).fetchone()
+        if row is None:
+            return (np.nan,) * len(fields)
+        return tuple(np.nan if v is None else v for v in row)
+
+    def write(self, device_id: str, **values: float) -> None:
+        now = time()
+        keys = tuple(values)
+        sql = self._sql_write.get(keys)
+        if sql is None:
+            cols = (*keys, "seen")
+            sets = ", ".join(f"{c} = excluded.{c}" for c in cols)
+            sql = self._sql_write[keys] = (
+                f"INSERT INTO device_state (device_id, {', '.join(cols)}) "
+                f"VALUES (?, {', '.join('?' * len(cols))}) "
+                f"ON CONFLICT(device_id) DO UPDATE SET {sets}"
+            )
+        # NaN'ı NULL olarak sakla
+        params = [None if v != v else float(v) for v in values.values()]
+        self._db().execute(sql, (device_id, *params, now))
+        self._touch(now)
+
+    def read_fences(self, device_id: str) -> dict[str, float]:
+        rows = self._db().execute(
+            "SELECT fence_id, outside_since FROM fence_state WHERE device_id = ?", (device_id,)
+        )
+        return {f: np.nan if v is None else v for f, v in rows}
+
+    def write_fences(self, device_id: str, fences: dict[str, float]) -> None:
+        now = time()
+        db = self._db()
+        with db:  # tek işlem: silme + ekleme + 'seen'
+            db.execute("BEGIN")
+            db.execute("DELETE FROM fence_state WHERE device_id = ?", (device_id,))
+            db.executemany(
+                "INSERT INTO fence_state (device_id, fence_id, outside_since) VALUES (?, ?, ?)",
+                [(device_id, f, None if v != v else float(v)) for f, v in fences.items()],
+            )
+            db.execute(
+                "INSERT INTO device_state (device_id, seen) VALUES (?, ?) "
+                "ON CONFLICT(device_id) DO UPDATE SET seen = excluded.seen",
+                (device_id, now),
+            )
+        self._touch(now)
+
+    def evict_expired(self, now: float | None = None) -> int:
+        if self.ttl_sec is None:
+            return 0
+        now = time() if now is None else now
+        cutoff = now - self.ttl_sec
+        db = self._db()
+        with db:
+            db.execute("BEGIN")
+            db.execute(
+                "DELETE FROM fence_state WHERE device_id IN "
+                "(SELECT device_id FROM device_state WHERE seen < ?)",
+                (cutoff,),
+            )
+            cur = db.execute("DELETE FROM device_state WHERE seen < ?", (cutoff,))
+        return cur.rowcount
+
+    def __contains__(self, device_id: str) -> bool:
+        sql = "SELECT 1 FROM device_state WHERE device_id = ?"
+        return self._db().execute(sql, (device_id,)).fetchone() is not None
+
+    def __len__(self) -> int:
+        return int(self._db().execute("SELECT COUNT(*) FROM device_state").fetchone()[0])
+
+    def stats(self) -> dict[str, Any]:
+        db = self._db()
+        pages = db.execute("PRAGMA page_count").fetchone()[0]
+        page_size = db.execute("PRAGMA page_size").fetchone()[0]
+        return {
+            "backend": "sqlite",
+            "path": self.path,
+            "devices": len(self),
+            "ttl_sec": self.ttl_sec,
+            "disk_bytes": int(pages * page_size),
+        }
+
+
+def make_backend(
+    kind: str = "memory",
+    ttl_sec: float | None = None,
+    max_devices: int | None = None,
+    sqlite_path: str | Path = "data/state/devices.sqlite",
+) -> StateBackend:
+    """config.state.backend: "memory" (süreç içi) | "sqlite" (worker'lar arası paylaşımlı)."""
+    if kind == "memory":
+        return DeviceStateStore(ttl_sec=ttl_sec, max_devices=max_devices)
+    if kind == "sqlite":
+        return SQLiteStateBackend(sqlite_path, ttl_sec=ttl_sec)
+    raise ValueError(f"Bilinmeyen state backend: {kind}")
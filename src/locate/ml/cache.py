@@ -0,0 +1,155 @@
+# src/locate/ml/cache.py
+from __future__ import annotations
+
+import hashlib
+import inspect
+import json
+import os
+from collections.abc import Callable, Mapping
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+__all__ = ["FeatureCache", "dataset_fingerprint", "code_fingerprint"]
+
+_READ_BLOCK = 1 << 20
+
+
+def dataset_fingerprint(path: str | Path) -> str:
+    """
+    Veri setinin içerik özeti (blake2b). Dizinse (bölümlenmiş Parquet/Arrow) tüm dosyalar
+    göreli yollarıyla birlikte sıralı olarak özetlenir; dosya adı/mtime değil içerik esas alınır.
+    """
+    p = Path(path)
+    h = hashlib.blake2b(digest_size=16)
+    files = sorted(f for f in p.rglob("*") if f.is_file()) if p.is_dir() else [p]
+    for f in files:
+        if p.is_dir():
+            h.update(f.relative_to(p).as_posix().encode("utf-8") + b"\0")
+        with f.open("rb") as fh:
+            while block := fh.read(_READ_BLOCK):
+                h.update(block)
+    return h.hexdigest()
+
+
+def _package_deps(mod) -> list:
+    """Modülün ad alanından erişilen, aynı üst paketteki modüller (locate.utils.geo vb.)."""
+    root = mod.__name__.split(".", 1)[0] + "."
+    deps = {}
+    for v in vars(mod).values():
+        m = v if inspect.ismodule(v) else inspect.getmodule(v)
+        if m is not None and m is not mod and m.__name__.startswith(root):
+            deps[m.__name__] = m
+    return [deps[k] for k in sorted(deps)]
+
+
+def code_fingerprint(fn: Callable[..., Any]) -> str:
+    """
+    Özellik fonksiyonunun tanımlı olduğu modülün ve o modülün içe aktardığı paket içi
+    modüllerin (ör. locate.utils.geo çekirdekleri) kaynak kodu özeti; yardımcılar dahil
+    kod değişince önbellek kendiliğinden geçersizleşir.
+    """
+    mod = inspect.getmodule(fn)
+    h = hashlib.blake2b(digest_size=8)
+    try:
+        for m in [mod or fn, *(_package_deps(mod) if mod is not None else [])]:
+            h.update(inspect.getsource(m).encode("utf-8"))
+    except (OSError, TypeError):
+        h.update(f"{fn.__module__}.{fn.__qualname__}".encode())
+    return h.hexdigest()
+
+
+class FeatureCache:
+    """
+    İçerik adresli, diskte özellik matrisi önbelleği.
+
+    Anahtar = özet(veri seti içeriği + özellik kodu + ilgili config anahtarları).
+    Her giriş iki dosyadır: <anahtar>.npy (matris kendi dtype'ında, ör. build_features'ın
+    float32'si; mmap ile okunur) ve <anahtar>.json (kolon adları, satır sayısı, dtype).
+    Erişilen girişin mtime'ı güncellenir; toplam boyut max_bytes'ı aşarsa en eski
+    erişilenler silinir (LRU).
+    """
+
+    def __init__(self, root: str | Path, max_bytes: int | None = None):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def key(
+        dataset: str | Path, fn: Callable[..., Any], params: Mapping[str, Any] | None = None
+    ) -> str:
+        h = hashlib.blake2b(digest_size=16)
+        h.update(dataset_fingerprint(dataset).encode())
+        h.update(code_fingerprint(fn).encode())
+        h.update(json.dumps(dict(params or {}), sort_keys=True, default=str).encode())
+        return h.hexdigest()
+
+    def _paths(self, key: str) -> tuple[Path, Path]:
+        return self.root / f"{key}.npy", self.root / f"{key}.json"
+
+    def get(self, key: str) -> pd.DataFrame | None:
+        npy, meta = self._paths(key)
+        if not (npy.exists() and meta.exists()):
+            return None
+        info = json.loads(meta.read_text(encoding="utf-8"))
+        arr = np.load(npy, mmap_mode="r")
+        if str(arr.dtype) != info.get("dtype"):
+            return None  # eski biçim (dtype kaydı yok) ya da yarım yazım: yeniden hesaplanır
+        os.utime(npy)  # LRU: son erişim
+        return pd.DataFrame(arr, columns=info["columns"], copy=False)
+
+    def put(self, key: str, X: pd.DataFrame) -> None:
+        npy, meta = self._paths(key)
+        # yarım kalmış yazımlar okunmasın: geçici dosya + os.replace
+        tmp = npy.with_name(f".{key}.{os.getpid()}.npy")
+        arr = np.ascontiguousarray(X.to_numpy())
+        np.save(tmp, arr)
+        meta.write_text(
+            json.dumps({"columns": list(X.columns), "rows": int(len(X)), "dtype": str(arr.dtype)}),
+            encoding="utf-8",
+        )
+        os.replace(tmp, npy)
+        self.evict(keep=key)
+
+    def get_or_compute(
+        self,
+        dataset: str | Path,
+        fn: Callable[..., pd.DataFrame],
+        params: Mapping[str, Any],
+        compute: Callable[[], pd.DataFrame],
+    ) -> tuple[pd.DataFrame, bool]:
+        """(X, önbellekten_mi) döndürür; yoksa compute() çalışır ve sonuç yazılır."""
+        key = self.key(dataset, fn, params)
+        X = self.get(key)
+        if X is not None:
+            return X, True
+        X = compute()
+        self.put(key, X)
+        return X, False
+
+    def size_bytes(self) -> int:
+        return sum(f.stat().st_size for f in self.root.glob("*.npy"))
+
+    def evict(self, keep: str | None = None) -> int:
+        """Toplam boyut max_bytes altına inene kadar en eski erişilen girişleri siler."""
+        if self.max_bytes is None:
+            return 0
+        entries = sorted(
+            ((f.stat().st_mtime, f.stat().st_size, f) for f in self.root.glob("*.npy")),
+            key=lambda e: e[0],
+        )
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, f in entries:
+            if total <= self.max_bytes:
+                break
+            if f.stem == keep or f.name.startswith("."):
+                continue
+            f.unlink(missing_ok=True)
+            f.with_suffix(".json").unlink(missing_ok=True)
+            total -= size
+            removed += 1
+        return removed
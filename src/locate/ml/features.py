@@ -1,20 +1,34 @@
+# src/locate/ml/features.py
 from __future__ import annotations
 
-from dataclasses import dataclass
+from collections import deque
 from datetime import datetime
-from math import atan2, cos, radians, sin
+from math import isfinite, isnan, nan
 
-from ..utils.geo import haversine_m  # var: Haversine (metre)
+import numpy as np
+import pandas as pd
 
+from ..core.state import DeviceStateStore, StateBackend
+from ..utils.geo import bearing_deg as _bearing_deg
+from ..utils.geo import bearing_deg_vec as _bearing_deg_vec
+from ..utils.geo import haversine_m, haversine_m_vec  # var: Haversine (metre)
 
-def _bearing_deg(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
-    φ1, φ2 = radians(lat1), radians(lat2)
-    dλ = radians(lon2 - lon1)
-    y = sin(dλ) * cos(φ2)
-    x = cos(φ1) * sin(φ2) - sin(φ1) * cos(φ2) * cos(dλ)
-    θ = atan2(y, x)
-    deg = (θ * 180.0 / 3.141592653589793) % 360.0
-    return deg
+__all__ = ["FEATURE_NAMES", "OnlineFeatureState", "build_features"]
+
+# Özellik sırası; online (API) ve offline (eğitim) aynı tanımları kullanır,
+# train_isoforest.py modeli bu isimlerle kaydeder.
+FEATURE_NAMES = [
+    "speed",  # m/s (yoksa gözlenen d/dt)
+    "accel",  # m/s^2
+    "turn_rate",  # derece/s, işaretli
+    "dist_center",  # m, geofence merkezine
+    "radial_speed",  # m/s, merkezden uzaklaşma hızı
+    "speed_ma",  # son window_sec içindeki ortalamalar (mevcut nokta dahil)
+    "accel_ma",
+    "radial_speed_ma",
+]
+
+_LAST = ("ts", "lat", "lon", "speed", "bearing")
 
 
 def _ang_diff_deg(a: float, b: float) -> float:
@@ -23,45 +37,439 @@ def _ang_diff_deg(a: float, b: float) -> float:
     return d
 
 
-@dataclass
-class _Last:
-    ts: datetime
-    lat: float
-    lon: float
-    speed: float
-    bearing: float | None
+# Kayan toplamlara yalnız bu büyüklüğe kadar olan sonlu değerler girer. Daha büyükleri
+# (ör. hatalı 1e300 hız) toplama girip çıkınca iptal hatasıyla küçük değerleri silerdi;
+# bunlar ayrı tutulur ve yalnız içinde oldukları pencerelerin toplamına eklenir.
+_SUM_MAX = 1e6
+
+
+class _Window:
+    """
+    Cihaz başına zaman pencereli halka tampon + toplamlar (ekleme/çıkarma O(1)).
+    Sonlu olmayan değerler (NaN/inf) toplama girmez, alan başına sayılır ve yalnız pencerede
+    oldukları sürece ortalamayı NaN yapar (offline _rolling_mean ile aynı).
+    """
+
+    __slots__ = ("buf", "sums", "bad", "big", "odd")
+
+    def __init__(self):
+        self.buf: deque[tuple[float, float, float, float]] = deque()
+        self.sums = [0.0, 0.0, 0.0]  # speed, accel, radial
+        self.bad = [0, 0, 0]  # penceredeki sonlu olmayan değer sayısı
+        self.big = [0, 0, 0]  # penceredeki |değer| > _SUM_MAX sayısı
+        self.odd = 0  # bad/big değeri olan nokta sayısı (0 → hızlı yol)
+
+    def _add(self, item: tuple[float, float, float, float], sign: int) -> None:
+        # yavaş yol: en az bir değer sonlu değil ya da |değer| > _SUM_MAX
+        self.odd += sign
+        for j in range(3):
+            v = item[j + 1]
+            if not isfinite(v):
+                self.bad[j] += sign
+            elif -_SUM_MAX <= v <= _SUM_MAX:
+                self.sums[j] += sign * v
+            else:
+                self.big[j] += sign
+
+    def _mean(self, j: int, n: int) -> float:
+        if self.bad[j]:
+            return nan
+        s = self.sums[j]
+        if self.big[j]:
+            s += sum(v for v in (e[j + 1] for e in self.buf) if not -_SUM_MAX <= v <= _SUM_MAX)
+        return s / n
+
+    def push(self, ts: float, speed: float, accel: float, radial: float, window_sec: float):
+        buf, sums, m = self.buf, self.sums, _SUM_MAX
+        item = (ts, speed, accel, radial)
+        buf.append(item)
+        # hızlı yol satır içi: üç değer de toplama girer (NaN karşılaştırması False → _add)
+        if -m <= speed <= m and -m <= accel <= m and -m <= radial <= m:
+            sums[0] += speed
+            sums[1] += accel
+            sums[2] += radial
+        else:
+            self._add(item, 1)
+        # pencere (ts - window_sec, ts]; eski noktalar soldan düşer
+        cutoff = ts - window_sec
+        while buf[0][0] <= cutoff:
+            old = buf.popleft()
+            _, a, b, c = old
+            if -m <= a <= m and -m <= b <= m and -m <= c <= m:
+                sums[0] -= a
+                sums[1] -= b
+                sums[2] -= c
+            else:
+                self._add(old, -1)
+        n = len(buf)
+        if n == 1:
+            # yalnız mevcut nokta kaldı: toplamlar sıfırdan kurulur, ekle/çıkar yuvarlama
+            # hatası taşınmaz (sayaçlar tamsayı, kaymaz)
+            self.sums = sums = [v if -m <= v <= m else 0.0 for v in item[1:]]
+        if not self.odd:
+            return sums[0] / n, sums[1] / n, sums[2] / n
+        return self._mean(0, n), self._mean(1, n), self._mean(2, n)
 
 
 class OnlineFeatureState:
     """
-    Cihaz bazında son noktayı saklar; bir sonraki ölçüm geldiğinde
-    (speed, |accel|, |turn_rate|, dist_center_m) özelliklerini döndürür.
+    Akışlı özellik motoru: her nokta için FEATURE_NAMES sırasıyla 8 özellik üretir.
+
+    - Son nokta (ts/lat/lon/speed/bearing) state backend'inde tutulur; ts epoch saniyedir
+      (datetime de kabul edilir).
+    - Pencereli ortalamalar (speed_ma/accel_ma/radial_speed_ma) cihaz başına zaman
+      pencereli tampon ve kayan toplamlarla nokta başına O(1) güncellenir. Pencere,
+      son window_sec saniyedeki noktalardır (window_sec <= 0 → yalnız mevcut nokta).
+    - Cihazın ilk noktasında ya da dt <= 0 iken türev özellikler (accel, turn_rate,
+      radial_speed) 0'dır.
+
+    Offline build_features aynı tanımları cihaz segmentleri üzerinde vektörel hesaplar;
+    eğitim ve API özellikleri aynıdır (bkz. scripts/check_feature_parity.py).
     """
 
-    def __init__(self, lat0: float, lon0: float):
-        self._last: dict[str, _Last] = {}
+    def __init__(
+        self,
+        lat0: float,
+        lon0: float,
+        store: StateBackend | None = None,
+        window_sec: float = 0,
+        sweep_every: int = 4096,
+    ):
+        self._last = DeviceStateStore() if store is None else store
         self._lat0 = lat0
         self._lon0 = lon0
+        self.window_sec = float(window_sec or 0)
+        self._windows: dict[str, _Window] = {}
+        self._sweep_every = max(1, int(sweep_every))
+        self._ops = 0
+        self._max_ts = -np.inf
+
+    def _step(
+        self,
+        prev: tuple[float, float, float, float, float],
+        win: _Window | None,
+        ts: float,
+        lat: float,
+        lon: float,
+        speed: float,
+    ) -> tuple[list[float], float]:
+        """Tek nokta: (özellikler, yeni bearing). prev = _LAST alanları (yoksa NaN)."""
+        prev_ts, prev_lat, prev_lon, prev_speed, prev_brg = prev
+        dist_center = haversine_m(self._lat0, self._lon0, lat, lon)
+        accel = turn_rate = radial = 0.0
+        brg = np.nan
+        if prev_ts == prev_ts:  # NaN değil → önceki nokta var
+            brg = _bearing_deg(prev_lat, prev_lon, lat, lon)
+            dt = ts - prev_ts
+            if isnan(speed):
+                speed = haversine_m(prev_lat, prev_lon, lat, lon) / dt if dt > 0 else 0.0
+            # dt <= 0: zaman geri gitmiş/tekrar; türevler 0
+            if dt > 0:
+                if prev_speed == prev_speed:
+                    accel = (speed - prev_speed) / dt
+                if prev_brg == prev_brg:
+                    turn_rate = _ang_diff_deg(brg, prev_brg) / dt
+                prev_dc = haversine_m(self._lat0, self._lon0, prev_lat, prev_lon)
+                radial = (dist_center - prev_dc) / dt
+        elif isnan(speed):
+            speed = 0.0
+        if win is None:
+            ma = (speed, accel, radial)
+        else:
+            ma = win.push(ts, speed, accel, radial, self.window_sec)
+        return [speed, accel, turn_rate, dist_center, radial, *ma], brg
+
+    def _window(self, device_id: str, reset: bool) -> _Window | None:
+        if self.window_sec <= 0:
+            return None
+        win = self._windows.get(device_id)
+        if win is None or reset:
+            win = self._windows[device_id] = _Window()
+        return win
+
+    def _sweep(self) -> None:
+        # penceresi olay zamanında tamamen geçmişte kalan ve state backend'inden de düşmüş
+        # (TTL/LRU) cihazların tamponları atılır. Backend'de duran cihazınki korunur: geride
+        # kalan (ör. birikmiş kaydı yeniden oynatılan) bir cihazın penceresi hâlâ geçerlidir.
+        cutoff = self._max_ts - self.window_sec
+        old = [d for d, w in self._windows.items() if not w.buf or w.buf[-1][0] <= cutoff]
+        for d in old:
+            # 'in': dokunmayan üyelik testi (read slot açar / 'seen'i tazeler → TTL işlemez)
+            if d not in self._last:
+                del self._windows[d]
 
     def add_and_features(
-        self, device_id: str, ts: datetime, lat: float, lon: float, speed: float
-    ) -> list[float] | None:
-        prev = self._last.get(device_id)
-        brg = None
-        if prev is not None:
-            dt = (ts - prev.ts).total_seconds()
-            if dt <= 0:
-                # zaman geri gitmiş; sadece state'i güncelle
-                brg = _bearing_deg(prev.lat, prev.lon, lat, lon)
-                self._last[device_id] = _Last(ts, lat, lon, speed, brg)
-                return None
-            brg = _bearing_deg(prev.lat, prev.lon, lat, lon)
-            accel = (speed - prev.speed) / dt
-            turn_rate = 0.0 if prev.bearing is None else abs(_ang_diff_deg(brg, prev.bearing)) / dt
-            dist_center = haversine_m(self._lat0, self._lon0, lat, lon)
-            feats = [speed, abs(accel), abs(turn_rate), dist_center]
-            self._last[device_id] = _Last(ts, lat, lon, speed, brg)
-            return feats
-        # ilk nokta → sadece state kur
-        self._last[device_id] = _Last(ts, lat, lon, speed, None)
-        return None
+        self, device_id: str, ts: datetime | float, lat: float, lon: float, speed: float
+    ) -> list[float]:
+        ts = ts.timestamp() if isinstance(ts, datetime) else float(ts)
+        return self._add(device_id, ts, lat, lon, speed)[0]
+
+    def add_and_step(
+        self, device_id: str, ts: datetime | float, lat: float, lon: float, speed: float
+    ) -> tuple[list[float], float, float]:
+        """
+        add_and_features + aynı state okumasıyla önceki noktaya adım (kural aşaması için):
+        (özellikler, sıçrama mesafesi m, zaman farkı s); cihazın ilk noktasında NaN.
+        """
+        ts = ts.timestamp() if isinstance(ts, datetime) else float(ts)
+        feats, prev = self._add(device_id, ts, lat, lon, speed)
+        return feats, haversine_m(prev[1], prev[2], lat, lon), ts - prev[0]
+
+    def _add(
+        self, device_id: str, ts: float, lat: float, lon: float, speed: float
+    ) -> tuple[list[float], tuple[float, ...]]:
+        prev = self._last.read(device_id, _LAST)
+        # backend'de cihaz yoksa (ilk nokta ya da TTL/LRU ile silinmiş) pencere de sıfırlanır
+        win = self._window(device_id, reset=prev[0] != prev[0])
+        feats, brg = self._step(prev, win, ts, lat, lon, float(speed))
+        self._last.write(device_id, ts=ts, lat=lat, lon=lon, speed=feats[0], bearing=brg)
+        if win is not None:
+            self._max_ts = max(self._max_ts, ts)
+            self._ops += 1
+            if self._ops >= self._sweep_every:
+                self._ops = 0
+                self._sweep()
+        return feats, prev
+
+
+# -------------------- Toplu (vektörel) motor --------------------
+# build_features, OnlineFeatureState._step'in dizi karşılığıdır: veri (device_id, ts)
+# sırasıyla bir kez sıralanır, cihaz segmentlerinin sınırları bulunur ve tüm gecikmeli
+# değerler / farklar / pencereli ortalamalar bitişik diziler üzerinde NumPy ile hesaplanır.
+# Segment başında önceki değer NaN'dır (cihazlar arası sızıntı yok).
+
+
+def _shift(a: np.ndarray, first: np.ndarray) -> np.ndarray:
+    """Segment içi bir önceki değer; segment başlarında NaN."""
+    out = np.empty_like(a)
+    out[:1] = np.nan
+    out[1:] = a[:-1]
+    out[first] = np.nan
+    return out
+
+
+def _window_left(codes: np.ndarray, ts: np.ndarray, first: np.ndarray, window_sec: float):
+    """
+    Her satırın penceresinin (ts - window_sec, ts] ilk satırı. (cihaz, ts) sıralı veride
+    iki anahtarlı searchsorted: ts, benzersiz zamanlar içindeki sırasına çevrilip cihaz
+    koduyla tek bir monoton tamsayı anahtarda birleştirilir (kayan nokta toplamı yok,
+    kesmeye eşit zaman pencere dışıdır). Sonuç segment başı ile satırın kendisi arasına
+    kırpılır.
+    """
+    uts, rank = np.unique(ts, return_inverse=True)
+    span = len(uts) + 1
+    key = codes * span + rank
+    key += 1
+    del rank
+    cut = np.searchsorted(uts, ts - window_sec, side="right")
+    cut += codes * span
+    left = np.searchsorted(key, cut, side="right")
+    idx = np.arange(len(ts))
+    seg_start = np.maximum.accumulate(np.where(first, idx, 0))
+    return np.clip(left, seg_start, idx, out=left)
+
+
+def _rolling_mean(v: np.ndarray, left: np.ndarray) -> np.ndarray:
+    """
+    v[left[i] .. i] ortalaması (kümülatif toplam farkıyla; left segment başından önce
+    olamaz). Sonlu olmayan değerler (NaN/inf) toplama 0 olarak girer ve yalnız kendilerini
+    içeren pencereleri NaN yapar; kümülatif toplam üzerinden sonraki cihazlara sızmaz.
+    |değer| > _SUM_MAX olanlar da kümülatif toplama girmez, içeren pencerelere ayrıca eklenir.
+    """
+    bad = ~np.isfinite(v)
+    big = ~bad & (np.abs(v) > _SUM_MAX)
+    cs = np.zeros(len(v) + 1)
+    np.cumsum(np.where(bad | big, 0.0, v), out=cs[1:])
+    idx = np.arange(len(v))
+    out = cs[1:] - cs[left]
+    if big.any():
+        # left sıralı veride azalmaz: p'yi içeren pencereler [p, ilk left > p) aralığıdır
+        bs = np.zeros(len(v))
+        for p in np.flatnonzero(big).tolist():
+            bs[p : np.searchsorted(left, p, side="right")] += v[p]
+        out += bs
+    out /= idx + 1 - left
+    if bad.any():
+        nb = np.zeros(len(v) + 1, dtype="int64")
+        np.cumsum(bad, out=nb[1:])
+        out[nb[1:] - nb[left] > 0] = np.nan
+    return out
+
+
+def _carry_in(
+    carry: dict,
+    uniq: np.ndarray,
+    codes: np.ndarray,
+    starts: np.ndarray,
+    prev: tuple[np.ndarray, ...],
+    window_sec: float,
+) -> list[tuple[int, tuple[float, float, float, float]]]:
+    """
+    Önceki parçadan taşınan cihaz state'i: segment başlarının önceki nokta alanlarını
+    (prev = ts, lat, lon, speed, bearing dizileri) doldurur ve pencere tamponlarını
+    (segment başına eklenecek (satır, (ts, speed, accel, radial))) döndürür.
+    """
+    last = carry.get("last", {})
+    wins = carry.get("wins", {})
+    ghosts = []
+    for s in starts.tolist():
+        d = uniq[codes[s]]
+        st = last.get(d)
+        if st is None:
+            continue
+        for a, v in zip(prev, st, strict=True):
+            a[s] = v
+        win = wins.get(d)
+        if window_sec > 0 and win is not None:
+            ghosts.extend((s, e) for e in win.buf)
+    return ghosts
+
+
+def _carry_out(
+    carry: dict,
+    uniq: np.ndarray,
+    codes: np.ndarray,
+    ends: np.ndarray,
+    cols: tuple[np.ndarray, ...],
+    win: tuple[np.ndarray, ...] | None,
+    win_ends: np.ndarray | None,
+    left: np.ndarray | None,
+) -> None:
+    """Cihaz başına son nokta ve (window_sec > 0 ise) pencere tamponunu carry'e yazar."""
+    last = carry.setdefault("last", {})
+    wins = carry.setdefault("wins", {})
+    ts, lat, lon, speed, brg = (c.tolist() for c in cols)
+    for k, e in enumerate(ends.tolist()):
+        d = uniq[codes[e]]
+        last[d] = (ts[e], lat[e], lon[e], speed[e], brg[e])
+        if win is None:
+            continue
+        we = int(win_ends[k])
+        w = wins[d] = _Window()
+        rows = slice(int(left[we]), we + 1)
+        w.buf.extend(zip(*(a[rows].tolist() for a in win), strict=True))
+        for j, a in enumerate(win[1:]):
+            v = a[rows]
+            ok = np.isfinite(v)
+            small = ok & (np.abs(v) <= _SUM_MAX)
+            w.sums[j] = float(v[small].sum())
+            w.bad[j] = int(len(v) - ok.sum())
+            w.big[j] = int(ok.sum() - small.sum())
+        w.odd = int((~np.all([np.abs(a[rows]) <= _SUM_MAX for a in win[1:]], axis=0)).sum())
+
+
+def build_features(
+    df: pd.DataFrame,
+    lat0: float,
+    lon0: float,
+    window_sec: float | None = 5,
+    carry: dict | None = None,
+    dtype: str = "float32",
+) -> pd.DataFrame:
+    """
+    Giriş beklenen kolonlar: device_id, timestamp(ISO8601), lat, lon, speed(m/s).
+    Çıkış: (device_id, timestamp) sıralı, FEATURE_NAMES kolonlu DataFrame (indeks giriş
+    indeksidir). Tanımlar OnlineFeatureState ile birebir aynıdır (bkz.
+    scripts/check_feature_parity.py); hesap groupby'sız, vektörel.
+    dtype: hesap float64'tür; çıktı varsayılan olarak float32'ye indirilir (eğitim belleği).
+    API ile aynı değerler gerekiyorsa (scripts/eval) "float64".
+    carry: parça parça okumada cihaz state'ini (son nokta + pencere tamponu) parçalar
+    arasında taşır; bir cihazın sonraki parçadaki noktaları öncekilerden eski olmamalı.
+    """
+    if not {"device_id", "timestamp", "lat", "lon"}.issubset(df.columns):
+        raise ValueError("Eksik zorunlu kolon(lar): device_id/timestamp/lat/lon")
+    window_sec = float(window_sec or 0)
+
+    dev = df["device_id"]
+    # kimlikler str olarak sıralanır/saklanır (object kolonda kopyasız)
+    codes, uniq = pd.factorize(dev if dev.dtype == object else dev.astype(str), sort=True)
+    uniq = uniq.astype(str)
+    t = pd.to_datetime(df["timestamp"], utc=True)
+    ts = (t - pd.Timestamp(0, tz="UTC")).dt.total_seconds().to_numpy(dtype="float64")
+    order = np.lexsort((ts, codes))
+    codes, ts = codes[order], ts[order]
+    lat = df["lat"].to_numpy(dtype="float64")[order]
+    lon = df["lon"].to_numpy(dtype="float64")[order]
+    # 'speed' yoksa gözlenen hız (d/dt) kullanılır
+    if "speed" in df.columns:
+        speed = df["speed"].to_numpy(dtype="float64")[order]
+    else:
+        speed = np.full(len(ts), np.nan)
+    index = df.index[order]
+    del order
+    n = len(ts)
+    out = np.zeros((n, len(FEATURE_NAMES)), dtype=dtype)
+    if n == 0:
+        return pd.DataFrame(out, columns=FEATURE_NAMES, index=index)
+
+    first = np.empty(n, dtype=bool)
+    first[0] = True
+    np.not_equal(codes[1:], codes[:-1], out=first[1:])
+    starts = np.flatnonzero(first)
+
+    p_ts, p_lat, p_lon = _shift(ts, first), _shift(lat, first), _shift(lon, first)
+    # önceki noktanın (doldurulmuş) hızı ve yönü; parça başında carry'den
+    p_speed = np.full(n, np.nan)
+    p_brg = np.full(n, np.nan)
+    ghosts = []
+    if carry is not None:
+        ghosts = _carry_in(
+            carry, uniq, codes, starts, (p_ts, p_lat, p_lon, p_speed, p_brg), window_sec
+        )
+
+    has_prev = p_ts == p_ts
+    dt = ts - p_ts
+    del p_ts
+    pos = has_prev & (dt > 0)  # dt <= 0: zaman geri gitmiş/tekrar; türevler 0
+    with np.errstate(invalid="ignore", divide="ignore"):
+        brg = _bearing_deg_vec(p_lat, p_lon, lat, lon)
+        miss = np.isnan(speed)
+        if miss.any():
+            step = haversine_m_vec(p_lat, p_lon, lat, lon)
+            speed = np.where(miss, np.where(pos, step / dt, 0.0), speed)
+            del step
+        out[:, 0] = speed
+
+        fill = np.flatnonzero(~first)
+        p_speed[fill] = speed[fill - 1]
+        p_brg[fill] = brg[fill - 1]
+        accel = np.where(pos & (p_speed == p_speed), (speed - p_speed) / dt, 0.0)
+        out[:, 1] = accel
+        del p_speed
+        turn = (brg - p_brg + 180.0) % 360.0 - 180.0  # _ang_diff_deg
+        out[:, 2] = np.where(pos & (p_brg == p_brg), turn / dt, 0.0)
+        del turn, p_brg
+
+        dist_center = haversine_m_vec(lat0, lon0, lat, lon)
+        out[:, 3] = dist_center
+        # önceki noktanın merkez mesafesi: segment içinde kaydırma, parça başında carry'den
+        p_dc = _shift(dist_center, first)
+        carried = starts[has_prev[starts]]
+        p_dc[carried] = haversine_m_vec(lat0, lon0, p_lat[carried], p_lon[carried])
+        radial = np.where(pos, (dist_center - p_dc) / dt, 0.0)
+        out[:, 4] = radial
+        del dist_center, p_dc, p_lat, p_lon, has_prev, pos, dt
+    win = left = win_ends = None
+    if window_sec <= 0:
+        out[:, 5], out[:, 6], out[:, 7] = speed, accel, radial
+    else:
+        w_codes, w_first, win = codes, first, (ts, speed, accel, radial)
+        real = np.arange(n)
+        if ghosts:
+            # taşınan tampon satırları cihaz segmentinin başına eklenir (yalnız ortalamalara girer)
+            at = np.array([g[0] for g in ghosts])
+            vals = np.array([g[1] for g in ghosts], dtype="float64")
+            win = tuple(np.insert(a, at, vals[:, j]) for j, a in enumerate(win))
+            w_codes = np.insert(codes, at, codes[at])
+            w_first = np.empty(len(w_codes), dtype=bool)
+            w_first[0] = True
+            np.not_equal(w_codes[1:], w_codes[:-1], out=w_first[1:])
+            real = real + np.searchsorted(at, real, side="right")
+        left = _window_left(w_codes, win[0], w_first, window_sec)
+        for j, v in enumerate(win[1:], start=5):
+            out[:, j] = _rolling_mean(v, left)[real]
+        win_ends = real[np.r_[starts[1:] - 1, n - 1]]
+    if carry is not None:
+        ends = np.r_[starts[1:] - 1, n - 1]
+        _carry_out(carry, uniq, codes, ends, (ts, lat, lon, speed, brg), win, win_ends, left)
+    return pd.DataFrame(out, columns=FEATURE_NAMES, index=index)
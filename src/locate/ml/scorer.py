@@ -0,0 +1,364 @@
+# src/locate/ml/scorer.py
+from __future__ import annotations
+
+import json
+import logging
+import os
+import shutil
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+__all__ = [
+    "ARTIFACT_VERSION",
+    "CompiledForest",
+    "ModelScorer",
+    "export_artifact",
+    "load_artifact",
+    "load_scorer",
+    "resolve_model_path",
+]
+
+log = logging.getLogger(__name__)
+
+_EULER_GAMMA = 0.5772156649015329
+
+# Bu satır sayısının üstünde (sklearn modeli varsa) decision_function daha hızlı:
+# düz gezinme, büyük tablolarda rastgele gather maliyetine takılır.
+FLAT_MAX_ROWS = 128
+# sklearn modeli yoksa (düz artefakt) büyük toplu skorlama bu boyutta parçalara bölünür
+# (ara diziler satır x ağaç boyutunda)
+FLAT_CHUNK_ROWS = 4096
+
+# Düz model artefaktı: <dizin>/meta.json + dizi başına .npy (mmap ile okunur)
+ARTIFACT_FORMAT = "geosentinel-isoforest-flat"
+ARTIFACT_VERSION = 1
+_FOREST_ARRAYS = ("left", "right", "feature", "threshold", "value", "roots")
+
+# Ağaçlar girdiyi float32'de karşılaştırır; sklearn bu aralığın dışını (ve NaN'ı) reddeder
+_F32_MAX = float(np.finfo("float32").max)
+
+
+def _avg_path_length(n: np.ndarray | float) -> np.ndarray:
+    """
+    Başarısız BST aramasının ortalama yol uzunluğu c(n) (Liu vd., 2008).
+    sklearn.ensemble._iforest._average_path_length ile aynı tanım.
+    """
+    n = np.asarray(n, dtype="float64")
+    out = np.zeros_like(n)
+    out[n == 2] = 1.0
+    m = n > 2
+    out[m] = 2.0 * (np.log(n[m] - 1.0) + _EULER_GAMMA) - 2.0 * (n[m] - 1.0) / n[m]
+    return out
+
+
+class CompiledForest:
+    """
+    IsolationForest ağaçlarını tek bir düz (flat) düğüm dizisine derler.
+
+    Tüm ağaçlar aynı anda, seviye seviye gezilir: her adımda T ağacın bulunduğu
+    düğümler tek bir NumPy gather ile ilerletilir. Yapraklar kendilerine döner
+    (threshold=+inf), bu yüzden max_depth adım sonunda her ağaç yaprağındadır.
+    sklearn decision_function'ın çağrı başına sabit maliyeti (doğrulama, ağaç başına
+    apply) olmadan tek satır ~onlarca mikrosaniyede skorlanır.
+
+    raw = -decision_function(x)  (pozitif → anomali)
+    """
+
+    def __init__(
+        self,
+        left: np.ndarray,
+        right: np.ndarray,
+        feature: np.ndarray,
+        threshold: np.ndarray,
+        value: np.ndarray,
+        roots: np.ndarray,
+        max_depth: int,
+        denominator: float,
+        offset: float,
+    ):
+        self.left = left  # (n_nodes,) yaprakta kendisi
+        self.right = right  # (n_nodes,) yaprakta kendisi
+        self.feature = feature  # (n_nodes,)
+        self.threshold = threshold  # (n_nodes,)
+        self.value = value  # yaprakta: derinlik + c(n_node_samples)
+        self.roots = roots  # (n_trees,)
+        self.max_depth = int(max_depth)
+        self.denominator = float(denominator)  # n_trees * c(max_samples)
+        self.offset = float(offset)  # sklearn offset_
+
+    @classmethod
+    def from_sklearn(cls, model: Any) -> CompiledForest:
+        subsample = getattr(model, "_max_features", model.n_features_in_) != model.n_features_in_
+        lefts, rights, feature, threshold, value, roots = [], [], [], [], [], []
+        base = 0
+        max_depth = 0
+        for est, feats in zip(model.estimators_, model.estimators_features_, strict=True):
+            t = est.tree_
+            n = t.node_count
+            left = t.children_left.astype("int64")
+            right = t.children_right.astype("int64")
+            is_leaf = left == -1
+
+            # düğüm derinlikleri (sklearn'de ebeveyn indeksi her zaman çocuktan küçük)
+            depth = np.zeros(n, dtype="int64")
+            for i in range(n):
+                if not is_leaf[i]:
+                    depth[left[i]] = depth[i] + 1
+                    depth[right[i]] = depth[i] + 1
+            max_depth = max(max_depth, int(depth.max()))
+
+            idx = np.arange(n, dtype="int64")
+            f = np.where(is_leaf, 0, t.feature).astype("int64")
+            if subsample:
+                f = np.asarray(feats, dtype="int64")[f]
+            lefts.append(np.where(is_leaf, idx, left) + base)
+            rights.append(np.where(is_leaf, idx, right) + base)
+            feature.append(f)
+            threshold.append(np.where(is_leaf, np.inf, t.threshold))
+            # sklearn: decision_path_length (depth+1) + c(n_node_samples) - 1
+            value.append(
+                np.where(is_leaf, depth + _avg_path_length(t.n_node_samples), 0.0).astype("float64")
+            )
+            roots.append(base)
+            base += n
+
+        n_trees = len(roots)
+        return cls(
+            left=np.concatenate(lefts),
+            right=np.concatenate(rights),
+            feature=np.concatenate(feature),
+            threshold=np.concatenate(threshold),
+            value=np.concatenate(value),
+            roots=np.asarray(roots, dtype="int64"),
+            max_depth=max_depth,
+            denominator=n_trees * float(_avg_path_length([model._max_samples])[0]),
+            offset=model.offset_,
+        )
+
+    def _raw_from_depths(self, depths: np.ndarray) -> np.ndarray:
+        # score_samples = -2^(-E[h(x)] / c(max_samples));  raw = -(score_samples - offset)
+        return 2.0 ** (-depths / self.denominator) + self.offset
+
+    def raw_one(self, x: np.ndarray) -> float:
+        # sklearn ağaçları float32 girdiyle karşılaştırır; birebir aynı yaprağa inmek için
+        x = np.asarray(x, dtype="float32").astype("float64")
+        node = self.roots
+        for _ in range(self.max_depth):
+            go_right = x[self.feature[node]] > self.threshold[node]
+            node = np.where(go_right, self.right[node], self.left[node])
+        return float(self._raw_from_depths(self.value[node].sum()))
+
+    def raw_many(self, X: np.ndarray) -> np.ndarray:
+        X = np.asarray(X, dtype="float32").astype("float64")
+        rows = np.arange(X.shape[0])[:, None]
+        node = np.broadcast_to(self.roots, (X.shape[0], len(self.roots)))
+        for _ in range(self.max_depth):
+            go_right = X[rows, self.feature[node]] > self.threshold[node]
+            node = np.where(go_right, self.right[node], self.left[node])
+        return self._raw_from_depths(self.value[node].sum(axis=1))
+
+
+class ModelScorer:
+    """
+    Kaydedilmiş model paketi ({"model","scaler","features",...}) üzerinden skor üretir.
+
+    Dokümantasyon 5.2 ölçeği:
+      raw = -decision_function(x);  score = (raw - min) / (max - min)  ∈ [0, 1]
+      threshold = raw=0 (sklearn karar sınırı) noktasının aynı ölçekteki karşılığı
+    min/max eğitim dağılımından gelir (train_isoforest.py 'raw_min/raw_max' yazar);
+    yoksa Isolation Forest'ın teorik aralığı [offset, 1 + offset] kullanılır.
+    """
+
+    def __init__(
+        self,
+        forest: CompiledForest,
+        features: list[str],
+        mean: np.ndarray | None = None,
+        scale: np.ndarray | None = None,
+        raw_min: float | None = None,
+        raw_max: float | None = None,
+        model: Any | None = None,
+    ):
+        self.forest = forest
+        self.model = model  # opsiyonel sklearn modeli (büyük toplu skorlama için)
+        self.features = list(features)
+        self._mean = mean
+        self._scale = scale
+        self.raw_min = forest.offset if raw_min is None else float(raw_min)
+        self.raw_max = forest.offset + 1.0 if raw_max is None else float(raw_max)
+        span = self.raw_max - self.raw_min
+        self._span = span if span > 0 else 1.0
+        self.threshold = float(self.normalize(0.0))
+
+    @classmethod
+    def from_bundle(cls, bundle: dict[str, Any]) -> ModelScorer:
+        scaler = bundle.get("scaler")
+        mean = scale = None
+        if scaler is not None:
+            mean = getattr(scaler, "mean_", None)
+            scale = getattr(scaler, "scale_", None)
+        return cls(
+            CompiledForest.from_sklearn(bundle["model"]),
+            features=bundle["features"],
+            mean=None if mean is None else np.asarray(mean, dtype="float64"),
+            scale=None if scale is None else np.asarray(scale, dtype="float64"),
+            raw_min=bundle.get("raw_min"),
+            raw_max=bundle.get("raw_max"),
+            model=bundle["model"],
+        )
+
+    def _transform(self, X: np.ndarray) -> np.ndarray:
+        if self._mean is not None:
+            X = X - self._mean
+        if self._scale is not None:
+            X = X / self._scale
+        # sonlu olmayan özellik (ör. pencerede inf hız → NaN ortalama): düz orman ve sklearn
+        # yolu aynı sonlu girdiyi görür; NaN → 0 (ölçekli uzayda ortalama), taşan → float32 sınırı
+        if X.size and not np.abs(X).max() <= _F32_MAX:
+            X = np.clip(np.nan_to_num(X, nan=0.0), -_F32_MAX, _F32_MAX)
+        return X
+
+    def normalize(self, raw):
+        return np.clip((np.asarray(raw) - self.raw_min) / self._span, 0.0, 1.0)
+
+    def score_one(self, feats: list[float]) -> tuple[float, bool]:
+        """Tek satır → (score[0-1], anomaly?)"""
+        raw = self.forest.raw_one(self._transform(np.asarray(feats, dtype="float64")))
+        score = min(max((raw - self.raw_min) / self._span, 0.0), 1.0)
+        return score, raw > 0.0
+
+    def score_many(self, X: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Çok satır → (score[0-1] dizisi, anomaly? dizisi)"""
+        X = self._transform(np.asarray(X, dtype="float64"))
+        if self.model is not None and len(X) > FLAT_MAX_ROWS:
+            raw = -self.model.decision_function(X)
+        elif len(X) > FLAT_CHUNK_ROWS:
+            raw = np.concatenate(
+                [
+                    self.forest.raw_many(X[i : i + FLAT_CHUNK_ROWS])
+                    for i in range(0, len(X), FLAT_CHUNK_ROWS)
+                ]
+            )
+        else:
+            raw = self.forest.raw_many(X)
+        return self.normalize(raw), raw > 0.0
+
+
+def export_artifact(scorer: ModelScorer, out: str | Path) -> Path:
+    """
+    Skorlayıcıyı sürümlü, düz bir artefakta yazar: ağaç dizileri, scaler parametreleri
+    (mean/scale) ayrı .npy dosyaları; özellik şeması ve skaler alanlar meta.json'da.
+    Düğüm indeksleri int32'ye sığarsa int32 yazılır. Yazım geçici dizine yapılıp
+    yeniden adlandırılır (yarım artefakt okunmaz).
+    """
+    out = Path(out)
+    f = scorer.forest
+    arrays = {k: getattr(f, k) for k in _FOREST_ARRAYS}
+    if len(f.left) < 2**31:
+        for k in ("left", "right", "feature", "roots"):
+            arrays[k] = arrays[k].astype("int32")
+    if scorer._mean is not None:
+        arrays["mean"] = scorer._mean
+    if scorer._scale is not None:
+        arrays["scale"] = scorer._scale
+
+    tmp = out.with_name(out.name + f".tmp{os.getpid()}")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+    for k, a in arrays.items():
+        np.save(tmp / f"{k}.npy", np.ascontiguousarray(a))
+    meta = {
+        "format": ARTIFACT_FORMAT,
+        "version": ARTIFACT_VERSION,
+        "features": scorer.features,
+        "n_trees": int(len(f.roots)),
+        "n_nodes": int(len(f.left)),
+        "max_depth": f.max_depth,
+        "denominator": f.denominator,
+        "offset": f.offset,
+        "raw_min": scorer.raw_min,
+        "raw_max": scorer.raw_max,
+        "arrays": {k: {"dtype": str(a.dtype), "shape": list(a.shape)} for k, a in arrays.items()},
+    }
+    (tmp / "meta.json").write_text(json.dumps(meta, ensure_ascii=False, indent=2), "utf-8")
+    # eski artefakt silinmeden önce kenara alınır: yol yalnız iki rename arasında boştur
+    # (açık mmap'ler eski dizinden okumaya devam eder); yeni ad başarısızsa geri konur
+    old = None
+    if out.is_dir():
+        old = out.with_name(out.name + f".old{os.getpid()}")
+        shutil.rmtree(old, ignore_errors=True)
+        os.replace(out, old)
+    try:
+        os.replace(tmp, out)
+    except OSError:
+        if old is not None:
+            os.replace(old, out)
+        raise
+    if old is not None:
+        shutil.rmtree(old, ignore_errors=True)
+    return out
+
+
+def load_artifact(path: str | Path, mmap: bool = True) -> ModelScorer:
+    """
+    Düz artefaktı salt okunur mmap ile açar: diziler kopyalanmaz, aynı dosyayı açan tüm
+    worker'lar sayfa önbelleğini paylaşır; açılış maliyeti meta.json + .npy başlıklarıdır.
+    Biçim/sürüm ve dizi şekilleri meta.json'a karşı doğrulanır.
+    """
+    path = Path(path)
+    meta = json.loads((path / "meta.json").read_text(encoding="utf-8"))
+    if meta.get("format") != ARTIFACT_FORMAT or meta.get("version") != ARTIFACT_VERSION:
+        raise ValueError(
+            f"Desteklenmeyen model artefaktı: {meta.get('format')} v{meta.get('version')} "
+            f"(beklenen {ARTIFACT_FORMAT} v{ARTIFACT_VERSION})"
+        )
+    arrays = {}
+    for k, spec in meta["arrays"].items():
+        a = np.load(path / f"{k}.npy", mmap_mode="r" if mmap else None)
+        if str(a.dtype) != spec["dtype"] or list(a.shape) != spec["shape"]:
+            raise ValueError(f"Artefakt dizisi bozuk: {k} {a.dtype}{a.shape} != {spec}")
+        arrays[k] = a
+    n_feat = len(meta["features"])
+    for k in ("mean", "scale"):
+        if k in arrays and arrays[k].shape != (n_feat,):
+            raise ValueError(f"Artefakt {k} boyu özellik sayısıyla uyuşmuyor: {arrays[k].shape}")
+    forest = CompiledForest(
+        **{k: arrays[k] for k in _FOREST_ARRAYS},
+        max_depth=meta["max_depth"],
+        denominator=meta["denominator"],
+        offset=meta["offset"],
+    )
+    return ModelScorer(
+        forest,
+        features=meta["features"],
+        mean=arrays.get("mean"),
+        scale=arrays.get("scale"),
+        raw_min=meta["raw_min"],
+        raw_max=meta["raw_max"],
+    )
+
+
+def load_scorer(path: str | Path) -> ModelScorer:
+    """Dizin → düz artefakt (mmap); dosya → joblib model paketi."""
+    if Path(path).is_dir():
+        return load_artifact(path)
+
+    from joblib import load
+
+    return ModelScorer.from_bundle(load(Path(path)))
+
+
+def resolve_model_path(path: str | Path) -> Path:
+    """
+    Düz artefakt (.flat) yoksa yanındaki joblib paketi (isoforest.joblib) uyarıyla seçilir;
+    ikisi de yoksa verilen yol döner (varlığını çağıran denetler). API ve scripts/eval aynı
+    kuralı kullanır.
+    """
+    path = Path(path)
+    alt = path.with_suffix(".joblib")
+    if not path.exists() and alt.is_file():
+        log.warning("Model artefaktı bulunamadı (%s); %s kullanılıyor.", path, alt)
+        return alt
+    return path
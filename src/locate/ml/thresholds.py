@@ -0,0 +1,111 @@
+# src/locate/ml/thresholds.py
+"""
+Tek geçişli eşik taraması (architecture.md §4.2–4.3).
+
+Skorlar bir kez hesaplanır ve azalan sırada sıralanır; etiketlerin kümülatif toplamlarıyla
+her aday eşik için confusion matrix O(1)'de okunur (toplam O(n log n)). Isolation Forest'ta
+'contamination' yalnız eşiği (offset_) belirler, ağaçları değiştirmez; bu yüzden
+contamination ızgarası tek skorlama üzerinden değerlendirilebilir.
+"""
+
+from __future__ import annotations
+
+from dataclasses import asdict, dataclass
+from typing import Any
+
+import numpy as np
+
+__all__ = ["Confusion", "ThresholdSweep", "select_threshold"]
+
+
+@dataclass
+class Confusion:
+    threshold: float
+    tp: int
+    fp: int
+    fn: int
+    tn: int
+
+    @property
+    def recall(self) -> float:
+        return self.tp / (self.tp + self.fn) if self.tp + self.fn else 0.0
+
+    @property
+    def far(self) -> float:
+        return self.fp / (self.fp + self.tn) if self.fp + self.tn else 0.0
+
+    @property
+    def precision(self) -> float:
+        return self.tp / (self.tp + self.fp) if self.tp + self.fp else 0.0
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            **asdict(self),
+            "recall": self.recall,
+            "far": self.far,
+            "precision": self.precision,
+        }
+
+
+class ThresholdSweep:
+    """
+    scores: yüksek = daha anomal; y: 1/True = anomali. Kural: score > threshold → alarm.
+    """
+
+    def __init__(self, scores: np.ndarray, y: np.ndarray):
+        scores = np.asarray(scores, dtype="float64")
+        y = np.asarray(y, dtype=bool)
+        if scores.shape != y.shape:
+            raise ValueError("scores ve y aynı uzunlukta olmalı")
+        order = np.argsort(-scores, kind="stable")
+        self._neg_sorted = -scores[order]  # artan; searchsorted için
+        self._tp = np.concatenate(([0], np.cumsum(y[order])))
+        self.n = int(len(scores))
+        self.positives = int(self._tp[-1])
+        self.negatives = self.n - self.positives
+
+    def at(self, threshold: float) -> Confusion:
+        """score > threshold olanlar pozitif tahmin; O(log n)."""
+        k = int(np.searchsorted(self._neg_sorted, -threshold, side="left"))
+        tp = int(self._tp[k])
+        fp = k - tp
+        return Confusion(float(threshold), tp, fp, self.positives - tp, self.negatives - fp)
+
+    def _curve(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        neg = self._neg_sorted
+        # eşit skorların son indeksi: o skor ve üstü pozitif (eşik = skorun hemen altı)
+        last = np.flatnonzero(np.diff(neg, append=np.inf) != 0)
+        k = last + 1
+        tp = self._tp[k]
+        return np.nextafter(-neg[last], -np.inf), tp, k - tp
+
+    def _confusion(self, thr: float, tp: int, fp: int) -> Confusion:
+        tp, fp = int(tp), int(fp)
+        return Confusion(float(thr), tp, fp, self.positives - tp, self.negatives - fp)
+
+    def curve(self, max_points: int | None = None) -> list[Confusion]:
+        """Her farklı skor değeri için bir nokta; max_points verilirse eşit aralıklı seyreltilir."""
+        thr, tp, fp = self._curve()
+        idx = np.arange(len(thr))
+        if max_points is not None and len(idx) > max_points:
+            idx = np.unique(np.linspace(0, len(idx) - 1, max_points).round().astype(int))
+        return [self._confusion(thr[i], tp[i], fp[i]) for i in idx.tolist()]
+
+    def best(self, max_far: float = 0.10) -> Confusion | None:
+        """Tüm aday eşikler üzerinde select_threshold'un vektörel karşılığı."""
+        thr, tp, fp = self._curve()
+        far = fp / self.negatives if self.negatives else np.zeros(len(fp))
+        ok = np.flatnonzero(far <= max_far)
+        if not len(ok):
+            return None
+        # öncelik: recall (tp) maks, sonra FAR (fp) min, sonra eşik maks
+        i = ok[np.lexsort((thr[ok], -fp[ok], tp[ok]))[-1]]
+        return self._confusion(thr[i], tp[i], fp[i])
+
+
+def select_threshold(candidates: list[Confusion], max_far: float = 0.10) -> Confusion | None:
+    """Önce FAR ≤ max_far olanları süz, sonra Recall'ı maksimize et (eşitlikte düşük FAR)."""
+    ok = [c for c in candidates if c.far <= max_far]
+    if not ok:
+        return None
+    return max(ok, key=lambda c: (c.recall, -c.far, c.threshold))
@@ -1,12 +1,85 @@
-from math import asin, cos, radians, sin, sqrt
+from math import asin, atan2, cos, degrees, radians, sin, sqrt
 
+import numpy as np
 
-def haversine_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
-    """İki GPS noktası arası Haversine mesafesi (metre)."""
-    R = 6371000.0
-    la1, lo1, la2, lo2 = map(radians, [lat1, lon1, lat2, lon2])
+R_EARTH_M = 6371000.0
+
+_SCALARS = (int, float)
+
+
+def haversine_m(lat1, lon1, lat2, lon2):
+    """
+    İki GPS noktası arası Haversine mesafesi (metre).
+    Skaler girişte `math` yolu (istek başına sıcak yol); dizi/Series girişte
+    haversine_m_vec'e yönlenir (Series index'i korunur).
+    """
+    if (
+        isinstance(lat1, _SCALARS)
+        and isinstance(lon1, _SCALARS)
+        and isinstance(lat2, _SCALARS)
+        and isinstance(lon2, _SCALARS)
+    ):
+        R = R_EARTH_M
+        la1, lo1, la2, lo2 = map(radians, [lat1, lon1, lat2, lon2])
+        dlat = la2 - la1
+        dlon = lo2 - lo1
+        a = sin(dlat / 2) ** 2 + cos(la1) * cos(la2) * sin(dlon / 2) ** 2
+        c = 2 * asin(sqrt(a))
+        return R * c
+    return haversine_m_vec(lat1, lon1, lat2, lon2)
+
+
+def bearing_deg(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Büyük daire başlangıç yönü (derece, [0, 360)); skaler sürüm."""
+    φ1, φ2 = radians(lat1), radians(lat2)
+    dλ = radians(lon2 - lon1)
+    y = sin(dλ) * cos(φ2)
+    x = cos(φ1) * sin(φ2) - sin(φ1) * cos(φ2) * cos(dλ)
+    return degrees(atan2(y, x)) % 360.0
+
+
+# -------------------- NumPy çekirdekleri --------------------
+# Hepsi skaler, ndarray veya pandas Series kabul eder ve broadcast eder
+# (örn. tek merkez vs. çok nokta). dtype verilirse (örn. np.float32) girişler o tipe
+# çevrilip ndarray döner; float32 yolu büyük dizilerde bellek/bant genişliği kazandırır,
+# ancak birkaç metrelik mesafelerde hassasiyet düşer.
+
+
+def _cast(dtype, *xs):
+    if dtype is None:
+        return xs
+    return tuple(np.asarray(x, dtype=dtype) for x in xs)
+
+
+def haversine_m_vec(lat1, lon1, lat2, lon2, dtype=None):
+    """Haversine mesafesinin (metre) NumPy sürümü."""
+    lat1, lon1, lat2, lon2 = _cast(dtype, lat1, lon1, lat2, lon2)
+    la1 = np.radians(lat1)
+    la2 = np.radians(lat2)
     dlat = la2 - la1
-    dlon = lo2 - lo1
-    a = sin(dlat / 2) ** 2 + cos(la1) * cos(la2) * sin(dlon / 2) ** 2
-    c = 2 * asin(sqrt(a))
-    return R * c
+    dlon = np.radians(np.subtract(lon2, lon1))
+    a = np.sin(dlat / 2) ** 2 + np.cos(la1) * np.cos(la2) * np.sin(dlon / 2) ** 2
+    return R_EARTH_M * 2 * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def bearing_deg_vec(lat1, lon1, lat2, lon2, dtype=None):
+    """Büyük daire başlangıç yönünün (derece, [0, 360)) NumPy sürümü."""
+    lat1, lon1, lat2, lon2 = _cast(dtype, lat1, lon1, lat2, lon2)
+    φ1 = np.radians(lat1)
+    φ2 = np.radians(lat2)
+    dλ = np.radians(np.subtract(lon2, lon1))
+    y = np.sin(dλ) * np.cos(φ2)
+    x = np.cos(φ1) * np.sin(φ2) - np.sin(φ1) * np.cos(φ2) * np.cos(dλ)
+    return np.degrees(np.arctan2(y, x)) % 360.0
+
+
+def equirect_m_vec(lat1, lon1, lat2, lon2, dtype=None):
+    """
+    Eşdikdörtgen (equirectangular) yaklaşık mesafe (metre).
+    Trigonometri tek cos'a iner; birkaç on km altındaki mesafelerde Haversine'e
+    göre hata ihmal edilebilir düzeydedir (ön eleme / hızlı yol için).
+    """
+    lat1, lon1, lat2, lon2 = _cast(dtype, lat1, lon1, lat2, lon2)
+    x = np.radians(np.subtract(lon2, lon1)) * np.cos(np.radians(np.add(lat1, lat2) / 2))
+    y = np.radians(np.subtract(lat2, lat1))
+    return R_EARTH_M * np.sqrt(x * x + y * y)
@@ -0,0 +1,200 @@
+# src/locate/utils/io.py
+from __future__ import annotations
+
+from collections.abc import Iterable, Iterator, Sequence
+from datetime import UTC, datetime
+from pathlib import Path
+
+import pandas as pd
+
+__all__ = ["LABEL_COLUMNS", "dataset_format", "iter_dataset", "read_dataset", "write_columnar"]
+
+# Hazırlanmış veri seti kolonları (architecture.md §1); etiketler opsiyonel
+LABEL_COLUMNS = ("label_geofence", "label_route", "label_event")
+_SUFFIX_FORMAT = {".parquet": "parquet", ".arrow": "ipc", ".feather": "ipc", ".ipc": "ipc"}
+
+
+def dataset_format(path: str | Path) -> str:
+    """'jsonl' | 'parquet' | 'ipc' (dizinse içindeki dosyalara bakılır)."""
+    p = Path(path)
+    if p.is_dir():
+        for f in p.rglob("*"):
+            if f.suffix.lower() in _SUFFIX_FORMAT:
+                return _SUFFIX_FORMAT[f.suffix.lower()]
+        raise ValueError(f"Dizinde Parquet/Arrow dosyası yok: {p}")
+    return _SUFFIX_FORMAT.get(p.suffix.lower(), "jsonl")
+
+
+def _schema(label_cols: Sequence[str]):
+    import pyarrow as pa
+
+    fields = [
+        ("device_id", pa.string()),
+        ("timestamp", pa.int64()),  # epoch saniye (UTC)
+        ("lat", pa.float32()),
+        ("lon", pa.float32()),
+        ("speed", pa.float32()),
+    ]
+    fields += [(c, pa.bool_()) for c in label_cols]
+    return pa.schema(fields)
+
+
+def _epoch(ts: str) -> int:
+    # hazırlanmış kayıtlar her zaman 'YYYY-MM-DDTHH:MM:SSZ'
+    return int(datetime.strptime(ts, "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=UTC).timestamp())
+
+
+def write_columnar(
+    records: Iterable[dict],
+    out: str | Path,
+    fmt: str = "parquet",
+    partition_by: str | None = None,
+    batch_rows: int = 65536,
+) -> int:
+    """
+    Hazırlanmış kayıtları tipli kolonlu formatta yazar (akış halinde, batch_rows'luk parçalar).
+      - fmt: "parquet" | "ipc" (Arrow IPC/Feather v2, memory-map ile okunabilir)
+      - partition_by: None (tek dosya) | "device_id" | "date" (hive dizinleri: date=YYYY-MM-DD)
+    Koordinatlar/hız float32, timestamp int64 epoch saniyedir. Yazılan kayıt sayısını döndürür.
+    """
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    it = iter(records)
+    first = next(it, None)
+    label_cols = [c for c in LABEL_COLUMNS if first is not None and c in first]
+    schema = _schema(label_cols)
+    if partition_by == "date":
+        schema = schema.append(pa.field("date", pa.string()))
+    n = 0
+
+    def batches() -> Iterator[pa.RecordBatch]:
+        nonlocal n
+        rec = first
+        while rec is not None:
+            cols: dict[str, list] = {name: [] for name in schema.names}
+            for _ in range(batch_rows):
+                if rec is None:
+                    break
+                cols["device_id"].append(rec["device_id"])
+                cols["timestamp"].append(_epoch(rec["timestamp"]))
+                cols["lat"].append(rec["lat"])
+                cols["lon"].append(rec["lon"])
+                cols["speed"].append(rec["speed"])
+                for c in label_cols:
+                    cols[c].append(rec[c])
+                if partition_by == "date":
+                    cols["date"].append(rec["timestamp"][:10])
+                rec = next(it, None)
+            n += len(cols["device_id"])
+            yield pa.RecordBatch.from_pydict(cols, schema=schema)
+
+    out = Path(out)
+    if partition_by is None:
+        out.parent.mkdir(parents=True, exist_ok=True)
+        if fmt == "parquet":
+            import pyarrow.parquet as pq
+
+            with pq.ParquetWriter(out, schema) as w:
+                for b in batches():
+                    w.write_batch(b)
+        elif fmt == "ipc":
+            with pa.OSFile(str(out), "wb") as sink, pa.ipc.new_file(sink, schema) as w:
+                for b in batches():
+                    w.write_batch(b)
+        else:
+            raise ValueError(f"Bilinmeyen format: {fmt}")
+        return n
+
+    if partition_by not in ("device_id", "date"):
+        raise ValueError(f"Bilinmeyen bölümleme: {partition_by}")
+    ds.write_dataset(
+        batches(),
+        out,
+        schema=schema,
+        format=fmt,
+        partitioning=ds.partitioning(pa.schema([schema.field(partition_by)]), flavor="hive"),
+        existing_data_behavior="delete_matching",
+        # bir batch en çok batch_rows bölüme düşer (varsayılan 1024 sınırı cihaz başına
+        # bölümlemede aşılır); açık dosya sınırı varsayılanda kalır, fazlası LRU ile kapanır
+        max_partitions=max(1024, batch_rows),
+    )
+    return n
+
+
+def _arrow_dataset(p: Path, fmt: str):
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    part = None
+    if p.is_dir():
+        part = ds.partitioning(
+            pa.schema([("device_id", pa.string()), ("date", pa.string())]), flavor="hive"
+        )
+    return ds.dataset(p, format=fmt, partitioning=part)
+
+
+def _project(names: Sequence[str], columns: Sequence[str] | None) -> list[str]:
+    # 'date' yalnız bölümleme anahtarıdır; veri kolonu değil
+    names = [n for n in names if n != "date"]
+    return names if columns is None else [c for c in columns if c in names]
+
+
+def _finish(df: pd.DataFrame) -> pd.DataFrame:
+    if "device_id" in df.columns and df.columns[0] != "device_id":
+        # device_id bölümlemesinde kolon sona eklenir; JSONL sırasına getir
+        df = df[["device_id", *(c for c in df.columns if c != "device_id")]]
+    if "timestamp" in df.columns and pd.api.types.is_integer_dtype(df["timestamp"]):
+        df["timestamp"] = pd.to_datetime(df["timestamp"], unit="s", utc=True)
+    return df
+
+
+def read_dataset(path: str | Path, columns: Sequence[str] | None = None) -> pd.DataFrame:
+    """
+    JSONL, Parquet veya Arrow IPC (tek dosya ya da bölümlenmiş dizin) hazırlanmış veri setini
+    okur. Kolonlu formatlarda yalnız istenen kolonlar okunur (projection) ve dosyalar
+    memory-map ile açılır; int64 epoch timestamp, UTC datetime'a çevrilir.
+    """
+    p = Path(path)
+    fmt = dataset_format(p)
+    if fmt == "jsonl":
+        df = pd.read_json(p, lines=True)
+        return df if columns is None else df[[c for c in columns if c in df.columns]]
+
+    import pyarrow as pa
+
+    if p.is_dir():
+        dset = _arrow_dataset(p, fmt)
+        table = dset.to_table(columns=_project(dset.schema.names, columns))
+    elif fmt == "parquet":
+        import pyarrow.parquet as pq
+
+        if columns is not None:
+            columns = _project(pq.read_schema(p, memory_map=True).names, columns)
+        table = pq.read_table(p, columns=columns, memory_map=True)
+    else:
+        with pa.memory_map(str(p), "r") as src:
+            table = pa.ipc.open_file(src).read_all()
+        if columns is not None:
+            table = table.select([c for c in columns if c in table.column_names])
+    return _finish(table.to_pandas())
+
+
+def iter_dataset(
+    path: str | Path, columns: Sequence[str] | None = None, chunksize: int = 100_000
+) -> Iterator[pd.DataFrame]:
+    """
+    read_dataset'in parça parça (sınırlı bellekli) karşılığı; dosya sırası korunur
+    (prepare çıktısında cihaz içi zaman sırası parçalar arasında da geçerlidir).
+    """
+    p = Path(path)
+    fmt = dataset_format(p)
+    if fmt == "jsonl":
+        for df in pd.read_json(p, lines=True, chunksize=chunksize):
+            yield df if columns is None else df[[c for c in columns if c in df.columns]]
+        return
+    dset = _arrow_dataset(p, fmt)
+    cols = _project(dset.schema.names, columns)
+    for batch in dset.to_batches(columns=cols, batch_size=chunksize):
+        if batch.num_rows:
+            yield _finish(batch.to_pandas())
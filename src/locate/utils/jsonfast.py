@@ -0,0 +1,20 @@
+# src/locate/utils/jsonfast.py
+from __future__ import annotations
+
+import json
+
+__all__ = ["dumps"]
+
+# orjson opsiyonel hızlandırmadır; yoksa stdlib json aynı kompakt biçimi üretir
+# (ayraçlarda boşluk yok, ASCII dışı karakterler kaçışsız). Çıktı her iki yolda bytes.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if orjson is not None:
+    dumps = orjson.dumps
+else:
+
+    def dumps(obj) -> bytes:
+        return json.dumps(obj, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode()